@@ -1,10 +1,11 @@
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin as BaseUserAdmin
+from blood_management.admin_performance import LargeTableAdmin, TextInputFilter
 from .models import User, DonorProfile
 
 
 @admin.register(User)
-class UserAdmin(BaseUserAdmin):
+class UserAdmin(LargeTableAdmin, BaseUserAdmin):
     list_display = ('username', 'email', 'role', 'phone', 'is_active', 'date_joined')
     list_filter = ('role', 'is_active', 'is_staff', 'is_superuser')
     fieldsets = BaseUserAdmin.fieldsets + (
@@ -13,8 +14,10 @@ class UserAdmin(BaseUserAdmin):
 
 
 @admin.register(DonorProfile)
-class DonorProfileAdmin(admin.ModelAdmin):
+class DonorProfileAdmin(LargeTableAdmin):
     list_display = ('user', 'blood_group', 'city', 'is_available', 'last_donation_date')
-    list_filter = ('blood_group', 'is_available', 'city')
+    list_filter = ('blood_group', 'is_available', ('city', TextInputFilter))
     search_fields = ('user__username', 'user__email', 'city', 'blood_group')
-
+    list_select_related = ('user',)
+    list_only = ('user__username', 'user__role', 'blood_group', 'city', 'is_available', 'last_donation_date')
+    autocomplete_fields = ('user',)
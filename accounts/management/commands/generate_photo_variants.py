@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from accounts.models import DonorProfile
+from accounts.photos import generate_variants
+
+
+class Command(BaseCommand):
+    help = 'Generate thumbnails and WebP copies for donor photos that do not have them yet.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Regenerate variants for every photo')
+
+    def handle(self, *args, **options):
+        queryset = DonorProfile.objects.exclude(profile_photo='').exclude(profile_photo__isnull=True)
+        if not options['all']:
+            queryset = queryset.filter(photo_thumbnail__isnull=True)
+
+        done = failed = 0
+        for profile_id in queryset.order_by('pk').values_list('pk', flat=True).iterator():
+            try:
+                generate_variants(profile_id)
+                done += 1
+            except Exception as exc:
+                failed += 1
+                self.stderr.write(f'Donor profile {profile_id}: {exc}')
+        self.stdout.write(self.style.SUCCESS(f'Generated variants for {done} photos ({failed} failed)'))
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='donorprofile',
+            index=models.Index(fields=['blood_group', 'is_available', 'city'], name='donor_search_idx'),
+        ),
+    ]
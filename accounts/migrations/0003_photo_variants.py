@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0002_donor_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='donorprofile',
+            name='photo_thumbnail',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='donor_photos/variants/'),
+        ),
+        migrations.AddField(
+            model_name='donorprofile',
+            name='photo_thumbnail_webp',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='donor_photos/variants/'),
+        ),
+        migrations.AddField(
+            model_name='donorprofile',
+            name='photo_webp',
+            field=models.ImageField(blank=True, editable=False, null=True, upload_to='donor_photos/variants/'),
+        ),
+    ]
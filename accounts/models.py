@@ -39,9 +39,18 @@ class DonorProfile(models.Model):
     is_available = models.BooleanField(default=True)
     last_donation_date = models.DateField(null=True, blank=True)
     profile_photo = models.ImageField(upload_to='donor_photos/', null=True, blank=True)
+    # Resized copies of profile_photo, written by accounts.photos in the background
+    photo_thumbnail = models.ImageField(upload_to='donor_photos/variants/', null=True, blank=True, editable=False)
+    photo_thumbnail_webp = models.ImageField(upload_to='donor_photos/variants/', null=True, blank=True, editable=False)
+    photo_webp = models.ImageField(upload_to='donor_photos/variants/', null=True, blank=True, editable=False)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['blood_group', 'is_available', 'city'], name='donor_search_idx'),
+        ]
+
     def __str__(self):
         return f"{self.user.username} - {self.blood_group}"
 
@@ -0,0 +1,207 @@
+"""
+Donor profile photo uploads and their resized variants.
+
+Uploads are validated, then written under a name derived from a SHA-256 of
+their content, so a URL never changes meaning and can be cached forever.
+Thumbnails and WebP copies are generated after the transaction commits, on
+a small thread pool, and stored the same way.
+"""
+import hashlib
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from .models import DonorProfile
+
+
+logger = logging.getLogger(__name__)
+
+PHOTO_DIR = 'donor_photos'
+VARIANT_DIR = 'donor_photos/variants'
+EXTENSIONS = {'JPEG': '.jpg', 'PNG': '.png', 'WEBP': '.webp'}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_photo_setting(name, default=None):
+    return getattr(settings, 'PROFILE_PHOTOS', {}).get(name, default)
+
+
+def get_variants():
+    """
+    ``(field, size, format, crop)`` for every generated variant.
+    """
+    thumbnail = tuple(get_photo_setting('THUMBNAIL_SIZE', (160, 160)))
+    display = tuple(get_photo_setting('DISPLAY_SIZE', (1024, 1024)))
+    return [
+        ('photo_thumbnail', thumbnail, 'JPEG', True),
+        ('photo_thumbnail_webp', thumbnail, 'WEBP', True),
+        ('photo_webp', display, 'WEBP', False),
+    ]
+
+
+def content_hash(chunks):
+    digest = hashlib.sha256()
+    for chunk in chunks:
+        digest.update(chunk)
+    return digest.hexdigest()[:20]
+
+
+def validate_photo(upload):
+    """
+    Reject files that are too large, not an allowed format or too many pixels.
+
+    Only the image header is decoded, so oversized images are refused before
+    their pixel data is read into memory.
+    """
+    from PIL import Image
+
+    max_size = get_photo_setting('MAX_UPLOAD_SIZE', 5 * 1024 * 1024)
+    if upload.size > max_size:
+        raise ValidationError(f'Photo must be at most {max_size // (1024 * 1024)} MB.')
+
+    allowed = get_photo_setting('ALLOWED_FORMATS', ('JPEG', 'PNG', 'WEBP'))
+    upload.seek(0)
+    try:
+        with Image.open(upload) as image:
+            image_format = image.format
+            width, height = image.size
+            image.verify()
+    except Exception:
+        raise ValidationError('Upload a valid image.')
+    finally:
+        upload.seek(0)
+
+    if image_format not in allowed:
+        raise ValidationError(f'Photo must be one of: {", ".join(allowed)}.')
+    if width * height > get_photo_setting('MAX_PIXELS', 40_000_000):
+        raise ValidationError('Photo dimensions are too large.')
+    return image_format
+
+
+def store_photo(upload, image_format):
+    """
+    Write ``upload`` under its content hash and return the storage name.
+
+    The file is hashed and then copied chunk by chunk, never held in memory
+    as a whole; an identical photo that is already stored is reused.
+    """
+    storage = DonorProfile._meta.get_field('profile_photo').storage
+    upload.seek(0)
+    digest = content_hash(upload.chunks())
+    name = f'{PHOTO_DIR}/{digest}{EXTENSIONS[image_format]}'
+    if not storage.exists(name):
+        upload.seek(0)
+        name = storage.save(name, upload)
+    return name
+
+
+def render_variant(image, size, image_format, crop):
+    from PIL import Image, ImageOps
+
+    if crop:
+        variant = ImageOps.fit(image, size, Image.LANCZOS)
+    else:
+        variant = image.copy()
+        variant.thumbnail(size, Image.LANCZOS)
+
+    if image_format == 'JPEG' and variant.mode != 'RGB':
+        background = Image.new('RGB', variant.size, (255, 255, 255))
+        rgba = variant.convert('RGBA')
+        background.paste(rgba, mask=rgba.getchannel('A'))
+        variant = background
+    elif image_format == 'WEBP' and variant.mode not in ('RGB', 'RGBA'):
+        variant = variant.convert('RGBA')
+
+    buffer = BytesIO()
+    if image_format == 'JPEG':
+        variant.save(buffer, 'JPEG', quality=get_photo_setting('JPEG_QUALITY', 85), optimize=True, progressive=True)
+    else:
+        variant.save(buffer, 'WEBP', quality=get_photo_setting('WEBP_QUALITY', 80), method=4)
+    return buffer.getvalue()
+
+
+def generate_variants(profile_id):
+    """
+    Create every variant of the profile's current photo and record them.
+
+    Does nothing if the photo was replaced or removed in the meantime.
+    """
+    from PIL import Image, ImageOps
+
+    source = DonorProfile.objects.filter(pk=profile_id).values_list('profile_photo', flat=True).first()
+    if not source:
+        return None
+
+    storage = DonorProfile._meta.get_field('profile_photo').storage
+    with storage.open(source, 'rb') as photo:
+        with Image.open(photo) as image:
+            image = ImageOps.exif_transpose(image)
+            image.load()
+
+    names = {}
+    for field, size, image_format, crop in get_variants():
+        data = render_variant(image, size, image_format, crop)
+        name = f'{VARIANT_DIR}/{content_hash([data])}{EXTENSIONS[image_format]}'
+        if not storage.exists(name):
+            name = storage.save(name, ContentFile(data))
+        names[field] = name
+
+    # update() skips auto_now; the sync feed goes by updated_at
+    DonorProfile.objects.filter(pk=profile_id, profile_photo=source).update(**names, updated_at=timezone.now())
+    return names
+
+
+def _generate_in_worker(profile_id):
+    close_old_connections()
+    try:
+        generate_variants(profile_id)
+    except Exception:
+        logger.exception('Could not generate photo variants for donor profile %s', profile_id)
+    finally:
+        # Pool threads outlive the task; don't leave their connections open
+        connections.close_all()
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_photo_setting('WORKERS', 2), thread_name_prefix='photo-variants',
+            )
+    return _executor
+
+
+def schedule_variants(profile_id):
+    """
+    Generate variants once the current transaction commits.
+    """
+    if get_photo_setting('BACKGROUND', True):
+        transaction.on_commit(lambda: get_executor().submit(_generate_in_worker, profile_id))
+    else:
+        transaction.on_commit(lambda: generate_variants(profile_id))
+
+
+def variant_field_names():
+    return [field for field, _, _, _ in get_variants()]
+
+
+def is_content_hashed(path):
+    """
+    True for names written by this module, which are safe to cache forever.
+    """
+    stem, extension = os.path.splitext(os.path.basename(path))
+    return (
+        path.startswith(f'{PHOTO_DIR}/') and extension in EXTENSIONS.values()
+        and len(stem) == 20 and all(char in '0123456789abcdef' for char in stem)
+    )
@@ -0,0 +1,33 @@
+from blood_management.projections import Projection
+from .models import DonorProfile
+
+
+USER_PROJECTION = Projection([
+    ('id', 'id', None),
+    ('username', 'username', None),
+    ('email', 'email', None),
+    ('first_name', 'first_name', None),
+    ('last_name', 'last_name', None),
+    ('role', 'role', None),
+    ('phone', 'phone', None),
+])
+
+# Mirrors DonorProfileSerializer
+DONOR_PROFILE_PROJECTION = Projection([
+    ('id', 'id', None),
+    ('user', 'user', USER_PROJECTION),
+    ('blood_group', 'blood_group', None),
+    ('date_of_birth', 'date_of_birth', 'date'),
+    ('address', 'address', None),
+    ('city', 'city', None),
+    ('state', 'state', None),
+    ('zip_code', 'zip_code', None),
+    ('is_available', 'is_available', None),
+    ('last_donation_date', 'last_donation_date', 'date'),
+    ('profile_photo', 'profile_photo', DonorProfile._meta.get_field('profile_photo').storage),
+    ('photo_thumbnail', 'photo_thumbnail', DonorProfile._meta.get_field('photo_thumbnail').storage),
+    ('photo_thumbnail_webp', 'photo_thumbnail_webp', DonorProfile._meta.get_field('photo_thumbnail_webp').storage),
+    ('photo_webp', 'photo_webp', DonorProfile._meta.get_field('photo_webp').storage),
+    ('created_at', 'created_at', 'datetime'),
+    ('updated_at', 'updated_at', 'datetime'),
+])
@@ -1,16 +1,19 @@
 from rest_framework import serializers
 from django.contrib.auth.password_validation import validate_password
+from blood_management.fieldsets import SparseFieldsetMixin
+from blood_management.sharding import shard_for_state
 from .models import User, DonorProfile
+from .photos import schedule_variants, store_photo, validate_photo, variant_field_names
 
 
-class UserSerializer(serializers.ModelSerializer):
+class UserSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = User
         fields = ('id', 'username', 'email', 'first_name', 'last_name', 'role', 'phone')
         read_only_fields = ('id', 'role')
 
 
-class DonorProfileSerializer(serializers.ModelSerializer):
+class DonorProfileSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     user = UserSerializer(read_only=True)
     
     class Meta:
@@ -76,3 +79,28 @@ class DonorProfileUpdateSerializer(serializers.ModelSerializer):
                   'zip_code', 'is_available', 'profile_photo')
         read_only_fields = ('user', 'created_at', 'updated_at')
 
+    def validate_state(self, value):
+        # The donor's requests and donations live on their region's shard and don't move with them
+        if self.instance is not None and shard_for_state(value) != shard_for_state(self.instance.state):
+            raise serializers.ValidationError('Moving to a state in another region is not supported')
+        return value
+
+    def validate_profile_photo(self, value):
+        if value:
+            self._photo_format = validate_photo(value)
+        return value
+
+    def update(self, instance, validated_data):
+        replace_photo = 'profile_photo' in validated_data
+        photo = validated_data.pop('profile_photo', None)
+        if replace_photo:
+            # Stored under a content hash instead of the client's file name
+            instance.profile_photo = store_photo(photo, self._photo_format) if photo else None
+            for field in variant_field_names():
+                setattr(instance, field, None)
+
+        instance = super().update(instance, validated_data)
+        if replace_photo and photo:
+            schedule_variants(instance.pk)
+        return instance
+
@@ -1,15 +1,14 @@
 from django.urls import path
-from rest_framework_simplejwt.views import TokenRefreshView
 from .views import (
     RegisterView, login_view, logout_view, 
-    current_user_view, DonorProfileView
+    current_user_view, DonorProfileView, token_refresh_view
 )
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', login_view, name='login'),
     path('logout/', logout_view, name='logout'),
-    path('token/refresh/', TokenRefreshView.as_view(), name='token_refresh'),
+    path('token/refresh/', token_refresh_view, name='token_refresh'),
     path('me/', current_user_view, name='current_user'),
     path('donor-profile/', DonorProfileView.as_view(), name='donor_profile'),
 ]
@@ -1,9 +1,12 @@
 from rest_framework import status, generics, permissions
 from rest_framework.decorators import api_view, permission_classes
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
+from django.views.decorators.csrf import csrf_exempt
+from blood_management.authentication import token_pair
+from blood_management.fieldsets import get_fieldset, restrict_queryset
 from .models import User, DonorProfile
+from .projections import DONOR_PROFILE_PROJECTION
 from .serializers import (
     UserSerializer, RegisterSerializer, DonorProfileSerializer, 
     DonorProfileUpdateSerializer
@@ -20,11 +23,9 @@ class RegisterView(generics.CreateAPIView):
         serializer.is_valid(raise_exception=True)
         user = serializer.save()
         
-        refresh = RefreshToken.for_user(user)
         return Response({
             'user': UserSerializer(user).data,
-            'refresh': str(refresh),
-            'access': str(refresh.access_token),
+            **token_pair(user),
         }, status=status.HTTP_201_CREATED)
 
 
@@ -48,12 +49,9 @@ def login_view(request):
             status=status.HTTP_401_UNAUTHORIZED
         )
     
-    refresh = RefreshToken.for_user(user)
-    
     response_data = {
         'user': UserSerializer(user).data,
-        'refresh': str(refresh),
-        'access': str(refresh.access_token),
+        **token_pair(user),
     }
     
     # Include donor profile if exists
@@ -63,9 +61,24 @@ def login_view(request):
     return Response(response_data, status=status.HTTP_200_OK)
 
 
+_token_refresh_view = None
+
+
+@csrf_exempt
+def token_refresh_view(request, *args, **kwargs):
+    # Built on first use so simplejwt isn't imported while loading the URLconf
+    global _token_refresh_view
+    if _token_refresh_view is None:
+        from rest_framework_simplejwt.views import TokenRefreshView
+        _token_refresh_view = TokenRefreshView.as_view()
+    return _token_refresh_view(request, *args, **kwargs)
+
+
 @api_view(['POST'])
 @permission_classes([permissions.IsAuthenticated])
 def logout_view(request):
+    from rest_framework_simplejwt.tokens import RefreshToken
+
     try:
         refresh_token = request.data.get('refresh')
         token = RefreshToken(refresh_token)
@@ -78,10 +91,11 @@ def logout_view(request):
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
 def current_user_view(request):
-    serializer = UserSerializer(request.user)
+    serializer = UserSerializer(request.user, context={'request': request})
     response_data = serializer.data
+    fields, expand = get_fieldset(request)
     
-    if hasattr(request.user, 'donor_profile'):
+    if (fields is None or 'donor_profile' in fields) and hasattr(request.user, 'donor_profile'):
         response_data['donor_profile'] = DonorProfileSerializer(request.user.donor_profile).data
     
     return Response(response_data)
@@ -92,7 +106,11 @@ class DonorProfileView(generics.RetrieveUpdateAPIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get_object(self):
-        profile, created = DonorProfile.objects.get_or_create(user=self.request.user)
+        queryset = DonorProfile.objects.all()
+        if self.request.method == 'GET':
+            projection = DONOR_PROFILE_PROJECTION.restrict(*get_fieldset(self.request))
+            queryset = restrict_queryset(queryset, projection)
+        profile, created = queryset.get_or_create(user=self.request.user)
         return profile
 
     def get_serializer_class(self):
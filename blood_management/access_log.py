@@ -0,0 +1,152 @@
+"""
+Structured access log: one JSON line per API request.
+
+``AccessLogMiddleware`` hands each record to ``writer()``, which only
+appends it to an in-memory buffer. A daemon thread serializes the buffer
+and appends it to ``ACCESS_LOG['PATH']`` every ``FLUSH_INTERVAL`` seconds,
+or sooner once ``FLUSH_SIZE`` records are waiting, rotating the file at
+``MAX_BYTES`` like ``logging.handlers.RotatingFileHandler``. Request
+threads never touch the disk. A full buffer drops records rather than
+block, and the next flush writes a ``{"dropped": n}`` line in their place.
+
+``{worker}`` in the path gives each worker process its own file, since
+processes forked from one master must not rotate the same file. It is the
+worker's slot number when the launcher sets ``writer().worker`` (see
+``post_fork`` in ``gunicorn.conf.py``), so a recycled worker's replacement
+carries on with its file, and the process ID otherwise. ``{pid}`` is
+always the process ID.
+"""
+import atexit
+import json
+import logging
+import os
+import threading
+from collections import deque
+
+from django.conf import settings
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+
+def get_access_log_setting(name, default=None):
+    return getattr(settings, 'ACCESS_LOG', {}).get(name, default)
+
+
+def backups(path, backup_count):
+    """
+    Rotated copies of ``path``, oldest first.
+    """
+    return [f'{path}.{index}' for index in range(backup_count, 0, -1)]
+
+
+class AccessLogWriter:
+    def __init__(self, path, max_bytes=0, backup_count=0, buffer_size=10000, flush_interval=1.0, flush_size=500):
+        self.path_template = str(path)
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self.buffer_size = buffer_size
+        self.flush_interval = flush_interval
+        self.flush_size = flush_size
+        self.dropped = 0
+        self._buffer = deque()
+        self._lock = threading.Lock()
+        self._file_lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.worker = None
+
+    @property
+    def path(self):
+        pid = os.getpid()
+        return self.path_template.format(pid=pid, worker=pid if self.worker is None else self.worker)
+
+    def write(self, record):
+        """
+        Queue ``record`` for the flusher; never blocks on I/O.
+        """
+        with self._lock:
+            if len(self._buffer) >= self.buffer_size:
+                self.dropped += 1
+                return
+            self._buffer.append(record)
+            waiting = len(self._buffer)
+        if self._pid != os.getpid():
+            self._start()
+        if waiting >= self.flush_size:
+            self._wake.set()
+
+    def _start(self):
+        with self._lock:
+            # A forked child inherits the flag but not the thread
+            if self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name='access-log-flusher', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            records, self._buffer = self._buffer, deque()
+            dropped, self.dropped = self.dropped, 0
+        if dropped:
+            records.append({'ts': timezone.now().isoformat(), 'dropped': dropped})
+        if not records:
+            return
+        data = ''.join(json.dumps(record, separators=(',', ':')) + '\n' for record in records).encode()
+        try:
+            with self._file_lock:
+                path = self.path
+                self._rotate(path, len(data))
+                with open(path, 'ab') as handle:
+                    handle.write(data)
+        except OSError:
+            logger.exception('Could not write %d access log records', len(records))
+
+    def _rotate(self, path, incoming):
+        try:
+            size = os.path.getsize(path)
+        except FileNotFoundError:
+            os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+            return
+        if not self.max_bytes or size + incoming <= self.max_bytes:
+            return
+        if not self.backup_count:
+            os.remove(path)
+            return
+        names = [*backups(path, self.backup_count), path]
+        for older, newer in zip(names, names[1:]):
+            if os.path.exists(newer):
+                os.replace(newer, older)
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def writer():
+    """
+    The process-wide writer configured from ``ACCESS_LOG``.
+    """
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = AccessLogWriter(
+                    get_access_log_setting('PATH'),
+                    max_bytes=get_access_log_setting('MAX_BYTES', 50 * 1024 * 1024),
+                    backup_count=get_access_log_setting('BACKUP_COUNT', 5),
+                    buffer_size=get_access_log_setting('BUFFER_SIZE', 10000),
+                    flush_interval=get_access_log_setting('FLUSH_INTERVAL', 1.0),
+                    flush_size=get_access_log_setting('FLUSH_SIZE', 500),
+                )
+                atexit.register(_writer.flush)
+    return _writer
@@ -3,6 +3,14 @@ ASGI config for blood_management project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
 
+Serve it with an ASGI server (for example gunicorn with
+``GUNICORN_APP=blood_management.asgi:application`` and the uvicorn worker,
+see gunicorn.conf.py). The access log, performance and profiling middleware
+are sync-only, because their query counters hook the per-thread database
+connections, so Django adapts the middleware chain to a thread for every
+request. The async views, such as ``/api/dashboard/admin/async/``, still
+fetch their sections concurrently, but no request runs purely on the event loop.
+
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 """
@@ -0,0 +1,59 @@
+"""
+DRF's request policy for plain Django async views.
+
+DRF 3.14 views are synchronous only. ``async_api_view`` runs an APIView's
+``initial()`` (authentication, permissions, throttling and content
+negotiation, all as configured in REST_FRAMEWORK) in a worker thread, then
+awaits the coroutine view and renders whatever it returns as a DRF
+``Response``. Errors come back in the same shape as from any other API view.
+"""
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from rest_framework import exceptions
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+
+def _prepare(api_view, request, args, kwargs):
+    drf_request = api_view.initialize_request(request, *args, **kwargs)
+    api_view.request = drf_request
+    try:
+        if request.method.lower() not in api_view.http_method_names:
+            raise exceptions.MethodNotAllowed(request.method)
+        api_view.initial(drf_request, *args, **kwargs)
+    except Exception as exc:
+        return drf_request, api_view.handle_exception(exc)
+    return drf_request, None
+
+
+def async_api_view(http_method_names=('get',), permission_classes=None):
+    """
+    Decorate ``async def view(request, *args, **kwargs)`` returning response
+    data. ``request`` is the authenticated DRF request.
+    """
+    def decorator(func):
+        attrs = {'http_method_names': list(http_method_names)}
+        if permission_classes is not None:
+            attrs['permission_classes'] = permission_classes
+        policy = type(f'{func.__name__}_policy', (APIView,), attrs)
+
+        @wraps(func)
+        async def view(request, *args, **kwargs):
+            api_view = policy()
+            api_view.args = args
+            api_view.kwargs = kwargs
+            api_view.headers = api_view.default_response_headers
+
+            drf_request, response = await sync_to_async(_prepare)(api_view, request, args, kwargs)
+            if response is None:
+                try:
+                    response = Response(await func(drf_request, *args, **kwargs))
+                except Exception as exc:
+                    response = await sync_to_async(api_view.handle_exception)(exc)
+            return api_view.finalize_response(drf_request, response, *args, **kwargs)
+
+        # Token-authenticated like the sync API views, which DRF exempts too
+        view.csrf_exempt = True
+        return view
+    return decorator
@@ -0,0 +1,40 @@
+"""
+JWT authentication that loads ``rest_framework_simplejwt`` on first use.
+
+DRF imports the default authentication classes as soon as
+``rest_framework.views`` is imported, and simplejwt pulls in
+``pkg_resources`` and ``django.test`` at import time. Going through this
+proxy keeps that cost out of process start-up (management commands, the dev
+server, workers that are not preloaded); preloaded servers import it up
+front in ``blood_management.startup.warm_up``.
+"""
+from rest_framework.authentication import BaseAuthentication
+
+
+_backend = None
+
+
+def get_backend():
+    global _backend
+    if _backend is None:
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+        _backend = JWTAuthentication
+    return _backend
+
+
+class LazyJWTAuthentication(BaseAuthentication):
+    def authenticate(self, request):
+        return get_backend()().authenticate(request)
+
+    def authenticate_header(self, request):
+        return get_backend()().authenticate_header(request)
+
+
+def token_pair(user):
+    """
+    ``{'refresh': ..., 'access': ...}`` for a freshly authenticated user.
+    """
+    from rest_framework_simplejwt.tokens import RefreshToken
+
+    refresh = RefreshToken.for_user(user)
+    return {'refresh': str(refresh), 'access': str(refresh.access_token)}
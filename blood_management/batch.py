@@ -0,0 +1,150 @@
+"""
+Several GET requests served in one round trip by ``POST /api/batch/``.
+
+The batch request is authenticated once; each sub-request is resolved with
+the URL resolver and its view called in-process with that user forced on
+it, the way ``APIClient.force_authenticate`` does, so the JWT isn't decoded
+again and the middleware stack runs once for the whole batch. Views still
+apply their own permissions and throttles, so a batch can't reach anything
+its caller couldn't fetch one request at a time.
+
+With ``parallel`` the sub-requests run on a small thread pool, each thread
+with its own database connection, like the async dashboards' sections.
+"""
+import asyncio
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpRequest, QueryDict
+from django.urls import Resolver404, resolve
+
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+# Headers that describe the batch POST itself rather than what a sub-request asks for
+_BATCH_ONLY_META = {
+    'CONTENT_LENGTH', 'CONTENT_TYPE', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE',
+    'HTTP_IDEMPOTENCY_KEY', 'HTTP_X_PROFILE',
+}
+
+
+def get_batch_setting(name, default=None):
+    return getattr(settings, 'BATCH', {}).get(name, default)
+
+
+class BatchError(Exception):
+    pass
+
+
+def parse_paths(items):
+    """
+    Sub-request paths from a list of ``"/api/..."`` strings or
+    ``{"path": "/api/..."}`` objects.
+    """
+    if not isinstance(items, list) or not items:
+        raise BatchError('requests must be a non-empty list')
+    limit = get_batch_setting('MAX_REQUESTS', 20)
+    if len(items) > limit:
+        raise BatchError(f'At most {limit} requests per batch')
+
+    paths = []
+    for item in items:
+        path = item.get('path') if isinstance(item, dict) else item
+        if not isinstance(path, str) or not path:
+            raise BatchError('Each request must be a path or an object with a "path"')
+        paths.append(path)
+    return paths
+
+
+def build_request(request, path, match):
+    """
+    A GET for ``path`` carrying the batch caller's identity and headers.
+    """
+    parts = urlsplit(path)
+    sub = HttpRequest()
+    sub.method = 'GET'
+    sub.path = sub.path_info = parts.path
+    sub.META = {key: value for key, value in request.META.items() if key not in _BATCH_ONLY_META}
+    sub.META.update(REQUEST_METHOD='GET', PATH_INFO=parts.path, QUERY_STRING=parts.query)
+    sub.GET = QueryDict(parts.query)
+    sub.COOKIES = request.COOKIES
+    sub.resolver_match = match
+    sub.user = request.user
+    # Picked up by DRF's Request in place of the authentication classes
+    sub._force_auth_user = request.user
+    sub._force_auth_token = request.auth
+    return sub
+
+
+def body_of(response):
+    data = getattr(response, 'data', None)
+    if data is not None:
+        # DRF response; its data is embedded as-is and rendered once with the batch
+        return data
+    if response.streaming:
+        return None
+    if response.get('Content-Type', '').startswith('application/json'):
+        return json.loads(response.content)
+    return response.content.decode(response.charset or 'utf-8', 'replace')
+
+
+def dispatch(request, path):
+    """
+    Serve ``path`` for the batch ``request``; ``{"path", "status", "body"}``.
+    """
+    parts = urlsplit(path)
+    if parts.scheme or parts.netloc or not parts.path.startswith('/api/'):
+        return {'path': path, 'status': 400, 'body': {'error': 'Only /api/ paths can be batched'}}
+    try:
+        match = resolve(parts.path)
+    except Resolver404:
+        return {'path': path, 'status': 404, 'body': {'error': 'Not found'}}
+    if match.url_name == 'batch':
+        return {'path': path, 'status': 400, 'body': {'error': 'Batches cannot be nested'}}
+
+    view = match.func
+    if asyncio.iscoroutinefunction(view):
+        view = async_to_sync(view)
+    try:
+        response = view(build_request(request, path, match), *match.args, **match.kwargs)
+        return {'path': path, 'status': response.status_code, 'body': body_of(response)}
+    except Exception:
+        logger.exception('Batched request for %s failed', path)
+        return {'path': path, 'status': 500, 'body': {'error': 'Internal server error'}}
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_batch_setting('WORKERS', 4), thread_name_prefix='batch',
+            )
+    return _executor
+
+
+def _dispatch_in_thread(request, path):
+    close_old_connections()
+    try:
+        return dispatch(request, path)
+    finally:
+        close_old_connections()
+
+
+def run(request, paths, parallel=False):
+    """
+    Results for ``paths`` in the order given.
+    """
+    if not parallel or len(paths) == 1:
+        return [dispatch(request, path) for path in paths]
+    futures = [get_executor().submit(_dispatch_in_thread, request, path) for path in paths]
+    return [future.result() for future in futures]
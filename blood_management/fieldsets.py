@@ -0,0 +1,66 @@
+"""
+Sparse fieldsets (``?fields=``) and opt-in expansion (``?expand=``).
+
+``?fields=id,status,blood_group`` limits a response to those keys and
+``?expand=blood_bank`` replaces a foreign key id with the related object.
+Unknown names are ignored. The same request parameters drive the
+serializers, the ``values()`` projections and the queryset, so fields a
+client leaves out are not joined or selected either.
+"""
+
+
+def parse_list(value):
+    if not value:
+        return None
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def get_fieldset(request):
+    """
+    Return ``(fields, expand)`` from the query string.
+
+    ``fields`` is ``None`` when the client did not restrict the response.
+    """
+    if request is None:
+        return None, set()
+    params = getattr(request, 'query_params', request.GET)
+    return parse_list(params.get('fields')), parse_list(params.get('expand')) or set()
+
+
+def restrict_queryset(queryset, projection):
+    """
+    Join and load only what ``projection`` reads from model instances.
+    """
+    related = projection.select_related()
+    if related:
+        queryset = queryset.select_related(*related)
+    return queryset.only(*projection.lookups())
+
+
+class SparseFieldsetMixin:
+    """
+    ``ModelSerializer`` mixin that honours ``?fields=`` and ``?expand=``.
+
+    Only the top-level serializer reads the request, so nested serializers
+    always render in full, and writes are never trimmed so every writable
+    field is still validated. ``expandable_fields`` maps a field name to the
+    serializer class used when that field is expanded.
+    """
+    expandable_fields = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        if request is None or request.method not in ('GET', 'HEAD'):
+            return
+        fields, expand = get_fieldset(request)
+
+        for name in expand & set(self.expandable_fields):
+            if name in self.fields:
+                self.fields[name] = self.expandable_fields[name](read_only=True)
+
+        if fields is not None:
+            keep = fields | expand
+            for name in list(self.fields):
+                if name not in keep:
+                    self.fields.pop(name)
@@ -0,0 +1,112 @@
+"""
+In-process metric aggregation rendered in the Prometheus text format.
+"""
+import math
+import threading
+from bisect import bisect_left
+
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+class Histogram:
+    def __init__(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help_text = help_text
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                # One slot per bucket plus +Inf, then the running sum
+                series = self._series[key] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def render(self):
+        lines = [
+            f'# HELP {self.name} {self.help_text}',
+            f'# TYPE {self.name} histogram',
+        ]
+        with self._lock:
+            snapshot = {key: list(series) for key, series in self._series.items()}
+
+        for key, series in sorted(snapshot.items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + ('+Inf',), series[:-1]):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{_format_labels(key, le=bound)} {cumulative}')
+            lines.append(f'{self.name}_sum{_format_labels(key)} {series[-1]:.6f}')
+            lines.append(f'{self.name}_count{_format_labels(key)} {cumulative}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def histogram(self, name, help_text, buckets=DEFAULT_BUCKETS):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = Histogram(name, help_text, buckets)
+            return metric
+
+    def reset(self):
+        for metric in list(self._metrics.values()):
+            metric.reset()
+
+    def render(self):
+        lines = []
+        for name in sorted(self._metrics):
+            lines.extend(self._metrics[name].render())
+        return '\n'.join(lines) + '\n'
+
+
+def percentile(values, fraction):
+    """
+    Nearest-rank percentile of ``values``, sorted ascending; ``fraction``
+    is e.g. 0.95. ``None`` for no values.
+    """
+    if not values:
+        return None
+    return values[max(math.ceil(fraction * len(values)) - 1, 0)]
+
+
+def _format_labels(key, **extra):
+    pairs = list(key) + [(k, v) for k, v in extra.items()]
+    if not pairs:
+        return ''
+    body = ','.join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return '{' + body + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+registry = Registry()
+
+request_duration = registry.histogram(
+    'http_request_duration_seconds', 'Wall time spent handling a request, by view.'
+)
+db_duration = registry.histogram(
+    'db_query_duration_seconds', 'Time spent in SQL per request, by view.'
+)
+db_queries = registry.histogram(
+    'db_queries_per_request', 'Number of SQL queries issued per request, by view.', COUNT_BUCKETS
+)
+render_duration = registry.histogram(
+    'response_render_duration_seconds', 'Time spent rendering the response body, by view.'
+)
@@ -0,0 +1,310 @@
+import random
+import re
+import secrets
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from django.middleware.gzip import GZipMiddleware
+from django.utils import timezone
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+from . import access_log, metrics, profiling
+
+
+def get_perf_setting(name, default=None):
+    return getattr(settings, 'PERF_METRICS', {}).get(name, default)
+
+
+class RequestStats:
+    """
+    Timings collected for a single sampled request.
+    """
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.query_count = 0
+        self.query_time = 0.0
+        self.render_started = None
+        self.render_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.query_time += time.perf_counter() - start
+            self.query_count += 1
+
+    def start_render(self):
+        self.render_started = time.perf_counter()
+
+    def finish_render(self, response):
+        if self.render_started is not None:
+            self.render_time = time.perf_counter() - self.render_started
+
+    def server_timing(self, total):
+        app_time = max(total - self.query_time - self.render_time, 0.0)
+        return ', '.join([
+            f'db;dur={self.query_time * 1000:.2f};desc="{self.query_count} queries"',
+            f'app;dur={app_time * 1000:.2f}',
+            f'render;dur={self.render_time * 1000:.2f}',
+            f'total;dur={total * 1000:.2f}',
+        ])
+
+
+def get_view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unresolved'
+    return match.view_name or match._func_path
+
+
+class PerformanceMiddleware:
+    """
+    Records wall, SQL and render time for a sample of requests.
+
+    Sampled requests get a ``Server-Timing`` header and feed the histograms
+    exposed at ``/metrics``. Unsampled requests pay for a single random draw.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.sample_rate = get_perf_setting('SAMPLE_RATE', 0.0)
+        self.server_timing = get_perf_setting('SERVER_TIMING', True)
+
+    def __call__(self, request):
+        if not self.sample_rate or random.random() >= self.sample_rate:
+            return self.get_response(request)
+
+        stats = request._perf_stats = RequestStats()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        total = time.perf_counter() - stats.started
+
+        view = get_view_name(request)
+        metrics.request_duration.observe(total, view=view)
+        metrics.db_duration.observe(stats.query_time, view=view)
+        metrics.db_queries.observe(stats.query_count, view=view)
+        metrics.render_duration.observe(stats.render_time, view=view)
+
+        if self.server_timing:
+            response['Server-Timing'] = stats.server_timing(total)
+        return response
+
+    def process_template_response(self, request, response):
+        stats = getattr(request, '_perf_stats', None)
+        if stats is not None:
+            stats.start_render()
+            response.add_post_render_callback(stats.finish_render)
+        return response
+
+
+class AccessLogMiddleware:
+    """
+    One structured record per API request, written by ``access_log``.
+
+    The record carries the URL name, the caller's role, status, wall time,
+    SQL query count and body size. Writing it only appends to a buffer, so
+    a slow or full disk never holds up the response.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.enabled = access_log.get_access_log_setting('ENABLED', False)
+        self.prefixes = tuple(access_log.get_access_log_setting('PATH_PREFIXES', ('/api/',)))
+
+    def __call__(self, request):
+        if not self.enabled or not request.path.startswith(self.prefixes):
+            return self.get_response(request)
+
+        stats = RequestStats()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        duration = time.perf_counter() - stats.started
+
+        match = getattr(request, 'resolver_match', None)
+        route = (match.url_name or match.view_name) if match is not None else 'unresolved'
+        # DRF copies the JWT user it authenticated back onto the Django request
+        user = getattr(request, 'user', None)
+        if user is None or not user.is_authenticated:
+            role = 'anonymous'
+        else:
+            role = getattr(user, 'role', None) or 'unknown'
+        access_log.writer().write({
+            'ts': timezone.now().isoformat(),
+            'method': request.method,
+            'route': route,
+            'role': role,
+            'status': response.status_code,
+            'duration_ms': round(duration * 1000, 3),
+            'queries': stats.query_count,
+            'bytes': None if response.streaming else len(response.content),
+        })
+        return response
+
+
+def is_admin_request(request):
+    user = getattr(request, 'user', None)
+    if user is None or not user.is_authenticated:
+        # API clients authenticate with JWT inside the view, so check the token here
+        from rest_framework_simplejwt.authentication import JWTAuthentication
+        from rest_framework_simplejwt.exceptions import InvalidToken, TokenError
+
+        try:
+            result = JWTAuthentication().authenticate(request)
+        except (InvalidToken, TokenError):
+            return False
+        user = result[0] if result else None
+    return bool(user and user.is_authenticated and (user.role == 'admin' or user.is_superuser))
+
+
+class ProfilingMiddleware:
+    """
+    Slow-query capture for every request, plus cProfile runs on demand.
+
+    Admins request a profile with the ``X-Profile: 1`` header or ``?_profile=1``.
+    The hot functions are stored for ``/api/perf/profiles/`` and the response
+    carries an ``X-Profile-Id`` header pointing at them.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.slow_query_ms = profiling.get_profiling_setting('SLOW_QUERY_MS', 100)
+
+    def __call__(self, request):
+        if self.slow_query_ms is None:
+            return self.handle(request)
+
+        recorder = profiling.SlowQueryRecorder(lambda: get_view_name(request), self.slow_query_ms)
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            return self.handle(request)
+
+    def handle(self, request):
+        wants_profile = request.headers.get('X-Profile') == '1' or request.GET.get('_profile') == '1'
+        if not wants_profile or not is_admin_request(request):
+            return self.get_response(request)
+
+        started = time.perf_counter()
+        response, hot = profiling.run_profiled(lambda: self.get_response(request))
+        if hot is None:
+            response['X-Profile'] = 'busy'
+            return response
+
+        profile_id = profiling.profiles.append({
+            'view': get_view_name(request),
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - started) * 1000, 3),
+            'recorded_at': timezone.now().isoformat(),
+            'functions': hot,
+        })
+        response['X-Profile-Id'] = str(profile_id)
+        return response
+
+
+def get_compression_setting(name, default=None):
+    return getattr(settings, 'COMPRESSION', {}).get(name, default)
+
+
+_accept_encoding_re = re.compile(r'\s*([^\s;,]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?')
+
+
+def accepted_encodings(header):
+    """
+    Encodings from an ``Accept-Encoding`` header, minus any refused with ``q=0``.
+    """
+    encodings = set()
+    for part in header.split(','):
+        match = _accept_encoding_re.match(part)
+        if not match:
+            continue
+        coding, quality = match.groups()
+        try:
+            if quality is not None and float(quality) == 0:
+                continue
+        except ValueError:
+            continue
+        encodings.add(coding.lower())
+    return encodings
+
+
+def compress_brotli(content, quality, padding=0):
+    """
+    Brotli-compress ``content`` with ``padding`` junk bytes in a metadata
+    block, which decoders skip. The compressor is flushed first so the block
+    lands on the byte boundary the format requires.
+    """
+    compressor = brotli.Compressor(quality=quality)
+    head = compressor.process(b'') + compressor.flush()
+    if padding:
+        # ISLAST=0, MNIBBLES=0 (coded as 3), reserved=0, MSKIPBYTES=1, then MSKIPLEN-1
+        head += ((3 << 1) | (1 << 4) | ((padding - 1) << 6)).to_bytes(2, 'little') + b'a' * padding
+    return head + compressor.process(content) + compressor.finish()
+
+
+class CompressionMiddleware(GZipMiddleware):
+    """
+    Django's ``GZipMiddleware`` plus brotli, for responses above a size threshold.
+
+    Brotli is used when the ``brotli`` package is installed and the client
+    accepts it. Small bodies are sent as-is since compressing them costs more
+    CPU than it saves on the wire.
+
+    Both encodings keep GZipMiddleware's BREACH mitigation: a random number of
+    padding bytes, up to ``max_random_bytes``, so the compressed length doesn't
+    show how well reflected input matched a secret. Routes that return tokens
+    (``COMPRESSION['EXCLUDE_ROUTES']``) are never compressed at all.
+    """
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_size = get_compression_setting('MIN_SIZE', 1024)
+        self.brotli_quality = get_compression_setting('BROTLI_QUALITY', 4)
+        self.exclude_routes = set(get_compression_setting('EXCLUDE_ROUTES', ()))
+
+    def process_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding'):
+            return response
+        if len(response.content) < self.min_size:
+            return response
+        match = getattr(request, 'resolver_match', None)
+        if match is not None and match.url_name in self.exclude_routes:
+            return response
+
+        encodings = accepted_encodings(request.META.get('HTTP_ACCEPT_ENCODING', ''))
+        if brotli is None or 'br' not in encodings:
+            if 'gzip' not in encodings:
+                patch_vary_headers(response, ('Accept-Encoding',))
+                return response
+            return super().process_response(request, response)
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        compressed = compress_brotli(
+            response.content, self.brotli_quality, secrets.randbelow(self.max_random_bytes + 1),
+        )
+        if len(compressed) >= len(response.content):
+            return response
+
+        response.content = compressed
+        response['Content-Length'] = str(len(compressed))
+        response['Content-Encoding'] = 'br'
+
+        # The compressed body is a different representation, so strong ETags no longer apply
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
@@ -0,0 +1,172 @@
+"""
+On-demand cProfile runs and slow-query capture, kept in bounded in-memory buffers.
+"""
+import cProfile
+import itertools
+import threading
+import time
+import traceback
+from collections import deque
+from pathlib import Path
+
+from django.conf import settings
+from django.utils import timezone
+
+
+PROJECT_ROOT = str(Path(settings.BASE_DIR))
+# Frames from the instrumentation itself are noise in stack snippets
+INTERNAL_FILES = {__file__, str(Path(__file__).with_name('middleware.py'))}
+
+
+def get_profiling_setting(name, default=None):
+    return getattr(settings, 'PROFILING', {}).get(name, default)
+
+
+class RingBuffer:
+    """
+    Thread-safe, fixed-size buffer of dict entries with increasing ids.
+    """
+
+    def __init__(self, size):
+        self._entries = deque(maxlen=size)
+        self._ids = itertools.count(1)
+        self._lock = threading.Lock()
+
+    def append(self, entry):
+        with self._lock:
+            entry['id'] = next(self._ids)
+            self._entries.append(entry)
+        return entry['id']
+
+    def list(self, limit=None):
+        with self._lock:
+            entries = list(self._entries)
+        entries.reverse()
+        return entries[:limit] if limit else entries
+
+    def get(self, entry_id):
+        with self._lock:
+            for entry in self._entries:
+                if entry['id'] == entry_id:
+                    return entry
+        return None
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+slow_queries = RingBuffer(get_profiling_setting('BUFFER_SIZE', 200))
+profiles = RingBuffer(get_profiling_setting('PROFILE_BUFFER_SIZE', 50))
+
+# cProfile cannot run two profilers at once, so profiled requests take turns.
+_profiler_lock = threading.Lock()
+
+
+def stack_snippet(depth=6):
+    frames = [
+        frame for frame in traceback.extract_stack()[:-2]
+        if frame.filename.startswith(PROJECT_ROOT)
+        and 'site-packages' not in frame.filename
+        and frame.filename not in INTERNAL_FILES
+    ]
+    return [
+        f'{Path(frame.filename).relative_to(PROJECT_ROOT)}:{frame.lineno} in {frame.name}'
+        for frame in frames[-depth:]
+    ]
+
+
+def explain(connection, sql, params):
+    if not sql.lstrip().upper().startswith('SELECT'):
+        return None
+    prefix = connection.ops.explain_query_prefix()
+    try:
+        with connection.cursor() as cursor:
+            cursor.execute(f'{prefix} {sql}', params)
+            return [' '.join(str(col) for col in row) for row in cursor.fetchall()]
+    except Exception as exc:
+        return [f'EXPLAIN failed: {exc}']
+
+
+class SlowQueryRecorder:
+    """
+    ``execute_wrapper`` that records queries slower than the threshold.
+    """
+
+    def __init__(self, view_name_getter, threshold_ms):
+        self.view_name_getter = view_name_getter
+        self.threshold = threshold_ms / 1000
+        self.explain = get_profiling_setting('EXPLAIN', True)
+        self._explaining = False
+
+    def __call__(self, execute, sql, params, many, context):
+        if self._explaining:
+            return execute(sql, params, many, context)
+
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = time.perf_counter() - start
+            if duration >= self.threshold:
+                self.record(sql, params, many, context['connection'], duration)
+
+    def record(self, sql, params, many, connection, duration):
+        plan = None
+        if self.explain and not many:
+            self._explaining = True
+            try:
+                plan = explain(connection, sql, params)
+            finally:
+                self._explaining = False
+
+        slow_queries.append({
+            'sql': sql,
+            'params': [str(param) for param in params] if params and not many else [],
+            'duration_ms': round(duration * 1000, 3),
+            'database': connection.alias,
+            'view': self.view_name_getter(),
+            'explain': plan,
+            'stack': stack_snippet(),
+            'recorded_at': timezone.now().isoformat(),
+        })
+
+
+def run_profiled(func, top_n=None):
+    """
+    Run ``func`` under cProfile and return ``(result, hot_functions)``.
+
+    Returns ``(result, None)`` without profiling when another profile is running.
+    """
+    if not _profiler_lock.acquire(blocking=False):
+        return func(), None
+
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+        try:
+            result = func()
+        finally:
+            profiler.disable()
+    finally:
+        _profiler_lock.release()
+
+    return result, hot_functions(profiler, top_n or get_profiling_setting('TOP_N', 30))
+
+
+def hot_functions(profiler, top_n):
+    profiler.create_stats()
+    rows = []
+    for (filename, lineno, name), (_, ncalls, tottime, cumtime, _) in profiler.stats.items():
+        if 'site-packages' in filename:
+            filename = filename.split('site-packages/', 1)[1]
+        elif filename.startswith(PROJECT_ROOT):
+            filename = str(Path(filename).relative_to(PROJECT_ROOT))
+        rows.append({
+            'function': f'{filename}:{lineno}({name})',
+            'ncalls': ncalls,
+            'tottime_ms': round(tottime * 1000, 3),
+            'cumtime_ms': round(cumtime * 1000, 3),
+        })
+    rows.sort(key=lambda row: row['tottime_ms'], reverse=True)
+    return rows[:top_n]
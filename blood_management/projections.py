@@ -0,0 +1,126 @@
+"""
+Read-only serialization straight from ``values()`` rows.
+
+A ``Projection`` mirrors the JSON produced by a DRF ``ModelSerializer`` without
+building model instances or a field tree for every row. Columns are
+``(key, lookup, kind)`` where ``kind`` is ``None`` for values passed through
+as-is, ``'datetime'``, ``'date'``, a file storage for file/image fields, or a
+nested ``Projection`` whose lookups are prefixed with ``lookup + '__'``.
+Run ``manage.py check_serializer_parity`` after changing a serializer.
+
+``expandable`` maps a foreign-key column to the projection used when a client
+asks for it with ``?expand=``; see ``blood_management.fieldsets``.
+"""
+from django.core.files.storage import Storage
+from django.utils import timezone
+
+
+def format_datetime(value, tz):
+    # Same output as DRF's DateTimeField with the default ISO 8601 format
+    if value is None:
+        return None
+    value = value.astimezone(tz).isoformat()
+    if value.endswith('+00:00'):
+        value = value[:-6] + 'Z'
+    return value
+
+
+def format_date(value):
+    return value.isoformat() if value is not None else None
+
+
+class Projection:
+    def __init__(self, columns, expandable=None):
+        self.columns = tuple(columns)
+        self.expandable = expandable or {}
+
+    def restrict(self, fields=None, expand=()):
+        """
+        Projection limited to ``fields`` (all when ``None``) with ``expand``
+        columns swapped for their nested projection.
+        """
+        if fields is None and not expand:
+            return self
+
+        columns = []
+        for key, lookup, kind in self.columns:
+            if fields is not None and key not in fields and key not in expand:
+                continue
+            if key in expand and key in self.expandable:
+                kind = self.expandable[key]
+            columns.append((key, lookup, kind))
+        return Projection(columns, self.expandable)
+
+    def select_related(self):
+        """
+        Relations needed to build this projection from model instances.
+        """
+        return sorted({lookup.rsplit('__', 1)[0] for lookup in self.lookups() if '__' in lookup})
+
+    def lookups(self, prefix=''):
+        for key, lookup, kind in self.columns:
+            if isinstance(kind, Projection):
+                yield from kind.lookups(f'{prefix}{lookup}__')
+            else:
+                yield prefix + lookup
+
+    def values(self, queryset):
+        return queryset.values(*self.lookups())
+
+    def bind(self, request=None, prefix=''):
+        """
+        Resolve each column to ``(key, row_key, converter)`` for one response.
+        """
+        tz = timezone.get_current_timezone()
+        bound = []
+        for key, lookup, kind in self.columns:
+            row_key = prefix + lookup
+            if kind is None:
+                converter = None
+            elif isinstance(kind, Projection):
+                nested = kind.bind(request, f'{row_key}__')
+                # A null foreign key renders as null, not a dict of nulls
+                converter = ('nested', nested, nested[0][1])
+            elif kind == 'datetime':
+                converter = lambda value, tz=tz: format_datetime(value, tz)
+            elif kind == 'date':
+                converter = format_date
+            elif isinstance(kind, Storage):
+                converter = _file_url(kind, request)
+            else:
+                raise ValueError(f'Unknown projection kind {kind!r} for {key}')
+            bound.append((key, row_key, converter))
+        return bound
+
+    def to_dicts(self, rows, request=None):
+        bound = self.bind(request)
+        return [_build(bound, row) for row in rows]
+
+    def to_dict(self, row, request=None):
+        return _build(self.bind(request), row)
+
+    def serialize(self, queryset, request=None):
+        return self.to_dicts(self.values(queryset), request)
+
+
+def _build(bound, row):
+    data = {}
+    for key, row_key, converter in bound:
+        if converter is None:
+            data[key] = row[row_key]
+        elif type(converter) is tuple:
+            data[key] = _build(converter[1], row) if row[converter[2]] is not None else None
+        else:
+            data[key] = converter(row[row_key])
+    return data
+
+
+def _file_url(storage, request):
+    def convert(name):
+        if not name:
+            return None
+        url = storage.url(name)
+        if request is not None:
+            return request.build_absolute_uri(url)
+        return url
+    return convert
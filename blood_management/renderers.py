@@ -0,0 +1,78 @@
+"""
+JSON renderer and parser backed by orjson or msgspec when either is installed.
+
+Both fall back to the stock DRF classes otherwise, and produce the same bytes
+DRF's ``JSONRenderer`` would for the compact (non-indented) case.
+"""
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgspec
+except ImportError:
+    msgspec = None
+
+
+_drf_encoder = JSONEncoder()
+
+
+def _default(obj):
+    # Defer to DRF's encoder so dates, decimals, lazy strings etc. match exactly
+    return _drf_encoder.default(obj)
+
+
+if orjson is not None:
+    BACKEND = 'orjson'
+    _ORJSON_OPTIONS = orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS
+
+    def dumps(data):
+        return orjson.dumps(data, default=_default, option=_ORJSON_OPTIONS)
+
+    loads = orjson.loads
+    DecodeError = orjson.JSONDecodeError
+elif msgspec is not None:
+    BACKEND = 'msgspec'
+    _encoder = msgspec.json.Encoder(enc_hook=_default)
+    _decoder = msgspec.json.Decoder()
+
+    dumps = _encoder.encode
+    loads = _decoder.decode
+    DecodeError = msgspec.DecodeError
+else:
+    BACKEND = None
+
+
+class FastJSONRenderer(JSONRenderer):
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if BACKEND is None or data is None:
+            return super().render(data, accepted_media_type, renderer_context)
+
+        renderer_context = renderer_context or {}
+        if self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type, renderer_context)
+
+        ret = dumps(data)
+        # Match DRF, which escapes these so the output is also valid JavaScript
+        if b'\xe2\x80\xa8' in ret or b'\xe2\x80\xa9' in ret:
+            ret = ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+        return ret
+
+
+class FastJSONParser(JSONParser):
+    renderer_class = FastJSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if BACKEND is None:
+            return super().parse(stream, media_type, parser_context)
+
+        try:
+            return loads(stream.read())
+        except (DecodeError, ValueError) as exc:
+            raise ParseError('JSON parse error - %s' % str(exc))
@@ -32,14 +32,16 @@ INSTALLED_APPS = [
     'django.contrib.messages',
     'django.contrib.staticfiles',
     'rest_framework',
-    'rest_framework_simplejwt',
     'corsheaders',
     'accounts',
     'bloodbank',
 ]
 
 MIDDLEWARE = [
+    'blood_management.middleware.AccessLogMiddleware',
+    'blood_management.middleware.PerformanceMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'blood_management.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -47,6 +49,7 @@ MIDDLEWARE = [
     'django.contrib.auth.middleware.AuthenticationMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
+    'blood_management.middleware.ProfilingMiddleware',
 ]
 
 ROOT_URLCONF = 'blood_management.urls'
@@ -54,7 +57,7 @@ ROOT_URLCONF = 'blood_management.urls'
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
-        'DIRS': [],
+        'DIRS': [BASE_DIR / 'blood_management' / 'templates'],
         'APP_DIRS': True,
         'OPTIONS': {
             'context_processors': [
@@ -80,6 +83,39 @@ DATABASES = {
     }
 }
 
+# Regional shards; see blood_management.sharding. SHARDS maps further aliases
+# in DATABASES to the states whose banks, stock, requests and donations they
+# hold; other states stay on DEFAULT. Only ever append shards, as each one's
+# position fixes its id block. settings_sharded runs three local SQLite shards.
+DATABASE_ROUTERS = ['blood_management.sharding.ShardRouter']
+
+SHARDING = {
+    'DEFAULT': 'default',
+    'SHARDS': {},
+    'ID_BLOCK': 10 ** 12,
+    # Threads for cross-region reads, each with its own connection per shard
+    'WORKERS': 8,
+}
+
+
+# Cache
+# Per-process memory cache for development; settings_production switches
+# every alias to the shared cache in DJANGO_CACHE_URL so inventory version
+# bumps and throttle buckets are seen by all worker processes.
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'blood-management',
+    },
+    # Rate limit counters; point at a shared cache (Redis, Memcached) when
+    # running more than one process so every worker sees the same buckets
+    'throttle': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'blood-management-throttle',
+    },
+}
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.2/ref/settings/#auth-password-validators
@@ -132,13 +168,58 @@ AUTH_USER_MODEL = 'accounts.User'
 # REST Framework settings
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
-        'rest_framework_simplejwt.authentication.JWTAuthentication',
+        # simplejwt is imported on the first authenticated request
+        'blood_management.authentication.LazyJWTAuthentication',
     ),
     'DEFAULT_PERMISSION_CLASSES': (
         'rest_framework.permissions.IsAuthenticated',
     ),
+    # orjson/msgspec when installed, stdlib json otherwise
+    'DEFAULT_RENDERER_CLASSES': (
+        'blood_management.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'blood_management.renderers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.PageNumberPagination',
     'PAGE_SIZE': 10,
+    # Per-user, per-IP (anonymous only) and per-endpoint buckets, checked together
+    'DEFAULT_THROTTLE_CLASSES': (
+        'blood_management.throttling.CombinedBucketThrottle',
+    ),
+}
+
+# Token budgets for the throttles above. RATES apply per user and, for
+# anonymous clients only, per client IP; each call spends COSTS[url_name]
+# tokens there (default 1), or the view's ``throttle_cost``. ENDPOINT_RATES
+# cap calls per URL name across all clients at one token per call; keep
+# login and register out of them, or one client could lock everyone out of
+# authentication. A refused call spends nothing.
+THROTTLING = {
+    'CACHE': 'throttle',
+    'RATES': {
+        'user': '600/min',
+        'ip': '300/min',
+    },
+    'ENDPOINT_RATES': {
+        'search_donors': '1200/min',
+    },
+    'COSTS': {
+        'search_donors': 5,
+        'login': 10,
+        'register': 20,
+        'admin_dashboard': 3,
+        'donor_dashboard': 2,
+        'admin_dashboard_async': 3,
+        'donor_dashboard_async': 2,
+        'blood_inventory_matrix': 2,
+        'blood_inventory_compatible': 2,
+        'analytics_cube': 5,
+        'blood_request_triage': 2,
+    },
 }
 
 # JWT Settings
@@ -156,3 +237,155 @@ CORS_ALLOWED_ORIGINS = [
 
 CORS_ALLOW_CREDENTIALS = True
 
+
+# Performance instrumentation
+# SAMPLE_RATE is the fraction of requests timed (0, the default, disables it).
+# TOKEN is required as "Authorization: Bearer <token>" on /metrics; with
+# DEBUG off, /metrics is refused until it is set.
+PERF_METRICS = {
+    'SAMPLE_RATE': float(os.environ.get('PERF_SAMPLE_RATE', '0')),
+    'SERVER_TIMING': True,
+    'TOKEN': os.environ.get('PERF_METRICS_TOKEN', ''),
+}
+
+# On-demand profiling and slow-query capture (works with DEBUG off).
+# SLOW_QUERY_MS=None disables the slow-query recorder; so does setting the
+# SLOW_QUERY_MS environment variable to an empty string.
+slow_query_ms = os.environ.get('SLOW_QUERY_MS', '100').strip()
+PROFILING = {
+    'SLOW_QUERY_MS': float(slow_query_ms) if slow_query_ms else None,
+    'EXPLAIN': True,
+    'BUFFER_SIZE': 200,
+    'PROFILE_BUFFER_SIZE': 50,
+    'TOP_N': 30,
+}
+
+# JSONL access log of API requests, one record per call. Records are
+# buffered (at most BUFFER_SIZE, then dropped and counted) and a background
+# thread appends them to PATH every FLUSH_INTERVAL seconds or FLUSH_SIZE
+# records, rotating at MAX_BYTES with BACKUP_COUNT old files kept. "{worker}"
+# in PATH gives each worker process its own file, named by its Gunicorn slot.
+# "manage.py access_log_report" summarises the logs per route.
+ACCESS_LOG = {
+    'ENABLED': os.environ.get('ACCESS_LOG_ENABLED', '1') == '1',
+    'PATH': os.environ.get('ACCESS_LOG_PATH', str(BASE_DIR / 'logs' / 'access.jsonl')),
+    'PATH_PREFIXES': ('/api/',),
+    'MAX_BYTES': 50 * 1024 * 1024,
+    'BACKUP_COUNT': 5,
+    'BUFFER_SIZE': 10000,
+    'FLUSH_INTERVAL': 1.0,
+    'FLUSH_SIZE': 500,
+}
+
+# POST /api/batch/: at most MAX_REQUESTS GET sub-requests per call, run on
+# WORKERS threads when the body asks for "parallel" (PARALLEL is the default)
+BATCH = {
+    'MAX_REQUESTS': 20,
+    'WORKERS': 4,
+    'PARALLEL': False,
+}
+
+# Response compression (brotli when the package is installed, else gzip).
+# Routes in EXCLUDE_ROUTES return JWTs and are never compressed (BREACH)
+COMPRESSION = {
+    'MIN_SIZE': 1024,
+    'BROTLI_QUALITY': 4,
+    'EXCLUDE_ROUTES': ('login', 'register', 'token_refresh'),
+}
+
+# Multi-bank allocation when approving blood requests with "allocate": true.
+# DEFAULT_POLICY is one of 'fewest_banks', 'same_city' or 'largest_first'.
+BLOOD_ALLOCATION = {
+    'DEFAULT_POLICY': 'fewest_banks',
+    'ALLOW_COMPATIBLE_GROUPS': True,
+}
+
+# Async dashboards run their sections concurrently on this many threads,
+# each with its own database connection
+DASHBOARDS = {
+    'WORKERS': 8,
+}
+
+# Idempotency-Key support on create and approve endpoints
+IDEMPOTENCY = {
+    'TTL': timedelta(hours=24),
+}
+
+# Expiry-tracked lots behind BloodInventory.units_available. Completed
+# donations get an expiry of collection date + SHELF_LIFE[component];
+# "manage.py expire_blood_lots" retires expired lots SWEEP_BATCH_SIZE at a time
+BLOOD_LOTS = {
+    'DEFAULT_COMPONENT': 'whole_blood',
+    'SHELF_LIFE': {
+        'whole_blood': timedelta(days=35),
+        'red_cells': timedelta(days=42),
+        'platelets': timedelta(days=5),
+        'plasma': timedelta(days=365),
+    },
+    'SWEEP_BATCH_SIZE': 500,
+    # Window for "expiring_soon" on the admin dashboard
+    'EXPIRY_WARNING_DAYS': 7,
+}
+
+# Closed requests and donations older than CLOSED_AFTER (by updated_at) are
+# moved to archive tables by "manage.py archive_closed_records"
+ARCHIVAL = {
+    'CLOSED_AFTER': timedelta(days=180),
+    'BATCH_SIZE': 500,
+}
+
+# GET /api/sync/?since=<token> change feed. Cursors stay SETTLE behind now
+# so slow transactions aren't skipped; tombstones for API deletes are kept
+# TOMBSTONE_TTL ("manage.py purge_tombstones"), older tokens get a 410
+SYNC = {
+    'PAGE_SIZE': 500,
+    'SETTLE': timedelta(seconds=5),
+    'TOMBSTONE_TTL': timedelta(days=30),
+}
+
+# Triage queue of pending requests. Priority = URGENCY_WEIGHT x urgency rank
+# (low 1 .. critical 4) + AGE_WEIGHT per hour waited, up to MAX_AGE_HOURS,
+# + STOCK_WEIGHT x the share of the request compatible stock could cover.
+# Claims lease a request to one admin for LEASE.
+TRIAGE = {
+    'URGENCY_WEIGHT': 100,
+    'AGE_WEIGHT': 2,
+    'MAX_AGE_HOURS': 72,
+    'STOCK_WEIGHT': 25,
+    'CANDIDATES': 50,
+    'LEASE': timedelta(minutes=10),
+}
+
+# Inventory holds. A hold lasts DEFAULT_TTL unless asked for longer, up to
+# MAX_TTL; "manage.py expire_reservations" returns expired holds to stock
+# SWEEP_BATCH_SIZE at a time
+RESERVATIONS = {
+    'DEFAULT_TTL': timedelta(minutes=30),
+    'MAX_TTL': timedelta(hours=24),
+    'SWEEP_BATCH_SIZE': 500,
+}
+
+# GET /api/analytics/ cube queries: at most MAX_DIMENSIONS group-by columns
+# and MAX_CELLS result groups; results are cached for CACHE_TIMEOUT seconds
+ANALYTICS = {
+    'MAX_DIMENSIONS': 4,
+    'MAX_CELLS': 5000,
+    'CACHE_TIMEOUT': 300,
+}
+
+# Donor profile photo uploads and the resized variants generated from them
+PROFILE_PHOTOS = {
+    'MAX_UPLOAD_SIZE': 5 * 1024 * 1024,
+    'MAX_PIXELS': 40_000_000,
+    'ALLOWED_FORMATS': ('JPEG', 'PNG', 'WEBP'),
+    'THUMBNAIL_SIZE': (160, 160),
+    'DISPLAY_SIZE': (1024, 1024),
+    'JPEG_QUALITY': 85,
+    'WEBP_QUALITY': 80,
+    # Variants are generated on a thread pool after commit; False runs inline
+    'BACKGROUND': True,
+    'WORKERS': 2,
+    'CACHE_MAX_AGE': 365 * 24 * 60 * 60,
+    # Serve MEDIA_URL from Django outside DEBUG too (otherwise leave it to the web server)
+    'SERVE_MEDIA': False,
+}
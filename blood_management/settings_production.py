@@ -0,0 +1,104 @@
+"""
+Production settings for blood_management.
+
+Everything from ``settings`` with DEBUG off, secrets and hosts taken from the
+environment, and the development-only conveniences removed. Selected by the
+production launcher (``gunicorn.conf.py``) through DJANGO_SETTINGS_MODULE.
+"""
+
+import os
+
+from django.core.exceptions import ImproperlyConfigured
+
+from .settings import *  # noqa: F401,F403
+from .settings import ACCESS_LOG, BASE_DIR, REST_FRAMEWORK
+
+
+def env_list(name, default=''):
+    return [value.strip() for value in os.environ.get(name, default).split(',') if value.strip()]
+
+
+DEBUG = False
+
+SECRET_KEY = os.environ.get('DJANGO_SECRET_KEY', '')
+if not SECRET_KEY:
+    raise ImproperlyConfigured('Set DJANGO_SECRET_KEY to run with production settings.')
+
+ALLOWED_HOSTS = env_list('DJANGO_ALLOWED_HOSTS', 'localhost,127.0.0.1')
+CSRF_TRUSTED_ORIGINS = env_list('DJANGO_CSRF_TRUSTED_ORIGINS')
+CORS_ALLOWED_ORIGINS = env_list('DJANGO_CORS_ALLOWED_ORIGINS', 'http://localhost:3000')
+
+
+# Reuse database connections across requests within a worker
+CONN_MAX_AGE = int(os.environ.get('DJANGO_CONN_MAX_AGE', '60'))
+CONN_HEALTH_CHECKS = True
+for database in DATABASES.values():  # noqa: F405
+    database['CONN_MAX_AGE'] = CONN_MAX_AGE
+    database['CONN_HEALTH_CHECKS'] = CONN_HEALTH_CHECKS
+
+
+# Gunicorn forks several workers, and the inventory version, cached matrices,
+# throttle buckets and idempotency replays only work if every worker sees the
+# same cache. redis://host:6379/0 needs the "redis" package,
+# memcached://host:11211 needs "pymemcache". With GUNICORN_WORKERS=1 the
+# per-process memory cache is allowed.
+CACHE_URL = os.environ.get('DJANGO_CACHE_URL', '')
+CACHE_BACKENDS = {
+    'redis': 'django.core.cache.backends.redis.RedisCache',
+    'rediss': 'django.core.cache.backends.redis.RedisCache',
+    'memcached': 'django.core.cache.backends.memcached.PyMemcacheCache',
+}
+if CACHE_URL:
+    scheme, _, address = CACHE_URL.partition('://')
+    if scheme not in CACHE_BACKENDS:
+        raise ImproperlyConfigured(f'DJANGO_CACHE_URL must start with one of {", ".join(CACHE_BACKENDS)}://')
+    location = CACHE_URL if scheme.startswith('redis') else address
+    CACHES = {
+        alias: {'BACKEND': CACHE_BACKENDS[scheme], 'LOCATION': location, 'KEY_PREFIX': f'blood-management-{alias}'}
+        for alias in CACHES  # noqa: F405
+    }
+elif os.environ.get('GUNICORN_WORKERS') != '1':
+    raise ImproperlyConfigured(
+        'Set DJANGO_CACHE_URL to a Redis or Memcached server shared by all workers, '
+        'or run a single worker with GUNICORN_WORKERS=1.'
+    )
+
+
+# Behind a TLS-terminating proxy; set DJANGO_SECURE_SSL_REDIRECT=0 for plain HTTP
+SECURE_PROXY_SSL_HEADER = ('HTTP_X_FORWARDED_PROTO', 'https')
+SECURE_SSL_REDIRECT = os.environ.get('DJANGO_SECURE_SSL_REDIRECT', '1') == '1'
+SESSION_COOKIE_SECURE = SECURE_SSL_REDIRECT
+CSRF_COOKIE_SECURE = SECURE_SSL_REDIRECT
+SECURE_HSTS_SECONDS = int(os.environ.get('DJANGO_HSTS_SECONDS', '0'))
+SECURE_CONTENT_TYPE_NOSNIFF = True
+
+
+# JSON-only API responses (no browsable API); templates are already cached with DEBUG off
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_RENDERER_CLASSES': ('blood_management.renderers.FastJSONRenderer',),
+}
+
+
+# Gunicorn forks several workers; each writes and rotates its own access log
+ACCESS_LOG = {
+    **ACCESS_LOG,
+    'PATH': os.environ.get('ACCESS_LOG_PATH', str(BASE_DIR / 'logs' / 'access-{worker}.jsonl')),
+}
+
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'root': {
+        'handlers': ['console'],
+        'level': os.environ.get('DJANGO_LOG_LEVEL', 'WARNING'),
+    },
+    'loggers': {
+        # Never log every SQL statement in production
+        'django.db.backends': {'level': 'WARNING', 'propagate': True},
+    },
+}
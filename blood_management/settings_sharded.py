@@ -0,0 +1,41 @@
+"""
+Development settings with the network split over three local SQLite
+databases, for trying out regional sharding:
+
+    export DJANGO_SETTINGS_MODULE=blood_management.settings_sharded
+    python manage.py migrate_shards
+    python manage.py benchmark_shards
+
+North and south Indian states get a shard each; every other state stays in
+``default`` together with the users.
+"""
+
+from .settings import *  # noqa: F401,F403
+from .settings import BASE_DIR, DATABASES, SHARDING
+
+
+DATABASES = {
+    **DATABASES,
+    'north': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_north.sqlite3',
+    },
+    'south': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'db_south.sqlite3',
+    },
+}
+
+SHARDING = {
+    **SHARDING,
+    'SHARDS': {
+        'north': [
+            'Delhi', 'DL', 'Haryana', 'HR', 'Punjab', 'PB', 'Rajasthan', 'RJ',
+            'Uttar Pradesh', 'UP', 'Uttarakhand', 'UK', 'Himachal Pradesh', 'HP',
+        ],
+        'south': [
+            'Karnataka', 'KA', 'Kerala', 'KL', 'Tamil Nadu', 'TN',
+            'Andhra Pradesh', 'AP', 'Telangana', 'TS',
+        ],
+    },
+}
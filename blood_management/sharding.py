@@ -0,0 +1,397 @@
+"""
+Regional sharding keyed on ``BloodBank.state``.
+
+Each shard is a database alias holding the banks of some states together
+with their stock, lots and allocations, and the requests and donations of
+donors whose profile is in one of those states. Users, donor profiles,
+idempotency records and Django's own tables stay in ``default``; every
+other shard keeps a copy of the user table, so foreign keys to users and
+joins such as ``requester__username`` work inside a shard.
+
+``ShardRouter`` sends the sharded models to the shard selected with
+``use_shard()``, or to the shard an instance was loaded from, falling back
+to ``SHARDING['DEFAULT']``. Each shard allocates primary keys from its own
+block of ``ID_BLOCK`` ids, so an id alone says which shard holds the row.
+``scatter()`` runs a read on every shard in parallel threads and leaves
+merging the results to the caller.
+
+With ``SHARDING['SHARDS']`` empty everything lives in one database and
+none of this changes behaviour.
+"""
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import cmp_to_key, partial, wraps
+from itertools import islice
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS, close_old_connections, connections
+from django.db.models import Max
+from rest_framework.exceptions import ValidationError
+from rest_framework.permissions import SAFE_METHODS
+
+
+ID_BLOCK = 10 ** 12
+
+# Models whose rows live in the shard of their region; everything else is global
+SHARDED_MODELS = {
+    'bloodbank.bloodbank',
+    'bloodbank.bloodinventory',
+    'bloodbank.bloodunitlot',
+    'bloodbank.bloodrequest',
+    'bloodbank.donation',
+    'bloodbank.bloodallocation',
+    'bloodbank.reservation',
+    'bloodbank.reservationlot',
+    'bloodbank.archivedbloodrequest',
+    'bloodbank.archiveddonation',
+    'bloodbank.tombstone',
+}
+
+GLOBAL_DB = DEFAULT_DB_ALIAS
+
+_current = ContextVar('shard', default=None)
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def get_sharding_setting(name, default=None):
+    return getattr(settings, 'SHARDING', {}).get(name, default)
+
+
+def shard_aliases():
+    """
+    Every shard, the default one first. The position of an alias fixes its
+    id block, so new shards must only ever be appended.
+    """
+    default = get_sharding_setting('DEFAULT', GLOBAL_DB)
+    return [default] + [alias for alias in get_sharding_setting('SHARDS', {}) if alias != default]
+
+
+def is_sharded():
+    return len(shard_aliases()) > 1
+
+
+def is_sharded_model(model):
+    return model._meta.label_lower in SHARDED_MODELS
+
+
+def shard_for_state(state):
+    key = (state or '').strip().casefold()
+    for alias, states in get_sharding_setting('SHARDS', {}).items():
+        if key in {name.strip().casefold() for name in states}:
+            return alias
+    return shard_aliases()[0]
+
+
+def shard_for_pk(pk):
+    aliases = shard_aliases()
+    index = int(pk) // get_sharding_setting('ID_BLOCK', ID_BLOCK)
+    # Ids from an unknown block can't match anything; let the lookup 404
+    return aliases[index] if 0 <= index < len(aliases) else aliases[0]
+
+
+def shard_for_user(user):
+    """
+    The shard holding ``user``'s requests and donations, by their donor
+    profile's state.
+    """
+    if not is_sharded() or not user.is_authenticated:
+        return shard_aliases()[0]
+    profile = getattr(user, 'donor_profile', None)
+    return shard_for_state(profile.state if profile is not None else '')
+
+
+def shard_for_request(request, pk=None):
+    """
+    The shard an API request works on, or ``None`` when a read should cover
+    every region.
+
+    An object id, in the URL or as ``?blood_bank=``, names its own shard.
+    Otherwise ``?region=`` picks a shard by alias and a ``state`` in the
+    query string or body picks the shard holding that state. Donors default
+    to their own region, and always write there; admins read every region.
+    """
+    if not is_sharded():
+        return shard_aliases()[0]
+    blood_bank = request.query_params.get('blood_bank')
+    if pk is None and blood_bank and blood_bank.isdigit():
+        pk = blood_bank
+    if pk is not None:
+        return shard_for_pk(pk)
+    # Donors file requests and donations in their own region only
+    if getattr(request.user, 'role', None) == 'donor' and request.method not in SAFE_METHODS:
+        return shard_for_user(request.user)
+
+    region = request.query_params.get('region')
+    if region:
+        if region not in shard_aliases():
+            raise ValidationError({'region': [f'Unknown region. Use one of: {", ".join(shard_aliases())}']})
+        return region
+
+    state = request.query_params.get('state')
+    if not state and hasattr(request.data, 'get'):
+        state = request.data.get('state')
+    if state:
+        return shard_for_state(state)
+
+    if getattr(request.user, 'role', None) == 'donor':
+        return shard_for_user(request.user)
+    return None
+
+
+def current_db():
+    """
+    The alias sharded models are routed to right now.
+    """
+    return _current.get() or shard_aliases()[0]
+
+
+@contextmanager
+def use_shard(alias):
+    """
+    Route sharded models to ``alias`` inside the block; ``None`` restores the
+    default shard.
+    """
+    token = _current.set(alias)
+    try:
+        yield alias
+    finally:
+        _current.reset(token)
+
+
+def select_shard(alias):
+    """
+    Route sharded models to ``alias`` for the rest of the current context,
+    normally the enclosing ``use_shard()`` block.
+    """
+    _current.set(alias)
+
+
+class ShardedViewMixin:
+    """
+    Route a DRF view's queries to the shard its request resolves to. After
+    authentication ``self.shard`` holds the alias, or ``None`` for reads
+    across every region; writes then go to the default shard.
+    """
+    shard = None
+
+    def dispatch(self, request, *args, **kwargs):
+        # Confines whatever initial() selects to this request
+        with use_shard(None):
+            return super().dispatch(request, *args, **kwargs)
+
+    def initial(self, request, *args, **kwargs):
+        super().initial(request, *args, **kwargs)
+        self.shard = shard_for_request(request, kwargs.get('pk'))
+        select_shard(self.shard)
+
+
+def sharded(view):
+    """
+    Run a function view against the shard its request resolves to. Goes
+    under ``@api_view`` so the request is already authenticated.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        with use_shard(shard_for_request(request, kwargs.get('pk'))):
+            return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ShardRouter:
+    def db_for_read(self, model, **hints):
+        if not is_sharded_model(model):
+            return GLOBAL_DB
+        # Keep related lookups in the shard the instance came from
+        instance = hints.get('instance')
+        if instance is not None and is_sharded_model(type(instance)) and instance._state.db:
+            return instance._state.db
+        return current_db()
+
+    db_for_write = db_for_read
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Users are replicated into every shard, so global rows relate to anything
+        if is_sharded_model(type(obj1)) and is_sharded_model(type(obj2)):
+            return obj1._state.db == obj2._state.db
+        return True
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_sharding_setting('WORKERS', 8), thread_name_prefix='shard',
+            )
+    return _executor
+
+
+def _run_on_shard(alias, func):
+    close_old_connections()
+    try:
+        with use_shard(alias):
+            return func()
+    finally:
+        close_old_connections()
+
+
+def scatter(func, aliases=None):
+    """
+    Call ``func()`` once per shard with that shard selected and return
+    ``{alias: result}``. Shards are read in parallel threads, each on its
+    own connection; a single shard is read inline.
+    """
+    aliases = list(aliases or shard_aliases())
+    if len(aliases) == 1:
+        with use_shard(aliases[0]):
+            return {aliases[0]: func()}
+    futures = {alias: get_executor().submit(_run_on_shard, alias, func) for alias in aliases}
+    return {alias: future.result() for alias, future in futures.items()}
+
+
+def _compare(ordering, a, b):
+    for name in ordering:
+        field = name.lstrip('-')
+        x, y = a[field], b[field]
+        if x == y:
+            continue
+        # NULLs first, as SQLite sorts them
+        result = -1 if x is None or (y is not None and x < y) else 1
+        return -result if name.startswith('-') else result
+    return 0
+
+
+def merge_rows(results, ordering, limit=None):
+    """
+    Merge per-shard lists of ``values()`` rows, each already sorted by
+    ``ordering``, into one list sorted the same way.
+    """
+    merged = heapq.merge(*results, key=cmp_to_key(partial(_compare, ordering)))
+    return list(islice(merged, limit))
+
+
+class ScatteredQuerySet:
+    """
+    The same ``values()`` queryset read from every shard and merged in its
+    ordering. Supports what Django's ``Paginator`` needs: ``count()`` sums
+    the shards and a slice ``[start:stop]`` reads ``stop`` rows from each.
+    """
+    def __init__(self, queryset, ordering):
+        self.queryset = queryset
+        self.ordering = ordering
+
+    def count(self):
+        return sum(scatter(lambda: self.queryset.all().count()).values())
+
+    def __getitem__(self, index):
+        if not isinstance(index, slice):
+            return self[index:index + 1][0]
+        if index.stop is None:
+            rows = scatter(lambda: list(self.queryset.all()))
+        else:
+            rows = scatter(lambda: list(self.queryset.all()[:index.stop]))
+        return merge_rows(rows.values(), self.ordering, index.stop)[index.start or 0:]
+
+    def __iter__(self):
+        return iter(self[:])
+
+    def __len__(self):
+        return self.count()
+
+
+def id_block_start(alias):
+    return shard_aliases().index(alias) * get_sharding_setting('ID_BLOCK', ID_BLOCK)
+
+
+def reserve_id_block(using, models):
+    """
+    Move the id sequences of ``models`` on the ``using`` shard to the start
+    of its block. Sequences already inside the block are left alone, so
+    this is safe to run after every migrate.
+    """
+    if using not in shard_aliases() or not id_block_start(using):
+        return
+    start = id_block_start(using)
+    connection = connections[using]
+    for model in models:
+        if not is_sharded_model(model) or model._meta.auto_field is None:
+            continue
+        highest = model._base_manager.using(using).aggregate(highest=Max('pk'))['highest']
+        if highest is not None and highest >= start:
+            continue
+        table = model._meta.db_table
+        with connection.cursor() as cursor:
+            if connection.vendor == 'sqlite':
+                cursor.execute('DELETE FROM sqlite_sequence WHERE name = %s', [table])
+                cursor.execute('INSERT INTO sqlite_sequence (name, seq) VALUES (%s, %s)', [table, start - 1])
+            elif connection.vendor == 'postgresql':
+                cursor.execute(
+                    'SELECT setval(pg_get_serial_sequence(%s, %s), %s, false)',
+                    [connection.ops.quote_name(table), model._meta.pk.column, start],
+                )
+            elif connection.vendor == 'mysql':
+                cursor.execute(f'ALTER TABLE {connection.ops.quote_name(table)} AUTO_INCREMENT = {start:d}')
+            else:
+                raise ImproperlyConfigured(f'Id blocks are not supported on {connection.vendor}')
+
+
+def _user_values(user):
+    return {field.attname: getattr(user, field.attname) for field in user._meta.concrete_fields}
+
+
+def replicate_user(user, using):
+    """
+    Copy a user just saved on the global database into every other shard.
+    """
+    if using != GLOBAL_DB:
+        return
+    values = _user_values(user)
+    for alias in shard_aliases():
+        if alias == GLOBAL_DB:
+            continue
+        manager = type(user)._base_manager.db_manager(alias)
+        if not manager.filter(pk=user.pk).update(**values):
+            manager.bulk_create([type(user)(**values)])
+
+
+def remove_user(user, using):
+    """
+    Delete a user's copies, and with them its sharded rows, from every
+    other shard.
+    """
+    if using != GLOBAL_DB:
+        return
+    for alias in shard_aliases():
+        if alias != GLOBAL_DB:
+            type(user)._base_manager.using(alias).filter(pk=user.pk).delete()
+
+
+def sync_users(alias, user_model, batch_size=500):
+    """
+    Bring the user copies on ``alias`` in line with the global table, for
+    users written without signals such as by ``bulk_create``. Returns the
+    number of users copied.
+    """
+    if alias == GLOBAL_DB:
+        return 0
+    fields = [field.attname for field in user_model._meta.concrete_fields if not field.primary_key]
+    copies = user_model._base_manager.using(alias)
+    copied = 0
+    users = user_model._base_manager.using(GLOBAL_DB).order_by('pk')
+    last_pk = 0
+    while True:
+        batch = list(users.filter(pk__gt=last_pk)[:batch_size])
+        if not batch:
+            return copied
+        last_pk = batch[-1].pk
+        existing = set(copies.filter(pk__in=[user.pk for user in batch]).values_list('pk', flat=True))
+        copies.bulk_create([
+            user_model(**_user_values(user)) for user in batch if user.pk not in existing
+        ])
+        copies.bulk_update([user for user in batch if user.pk in existing], fields)
+        copied += len(batch)
@@ -0,0 +1,51 @@
+"""
+Process start-up helpers for the production launcher.
+
+With ``preload_app`` the master imports the application once and forks
+workers from it, so work done here is paid once and shared copy-on-write
+instead of being repeated by every worker on its first request.
+"""
+import importlib
+import logging
+import time
+
+from django.db import connections
+
+
+logger = logging.getLogger(__name__)
+
+# Imported lazily by the request path; load them before forking instead
+DEFERRED_MODULES = (
+    'rest_framework_simplejwt.authentication',
+    'rest_framework_simplejwt.tokens',
+    'rest_framework_simplejwt.views',
+    'PIL.Image',
+    'PIL.ImageOps',
+)
+
+
+def warm_up():
+    """
+    Load the URLconf, DRF's configured classes and the lazily imported
+    modules, then close any database connection opened on the way so no
+    socket is shared between forked workers. Returns the time taken.
+    """
+    from django.urls import get_resolver
+    from rest_framework.settings import api_settings
+
+    start = time.perf_counter()
+    get_resolver().url_patterns
+    for name in ('DEFAULT_AUTHENTICATION_CLASSES', 'DEFAULT_PERMISSION_CLASSES',
+                 'DEFAULT_RENDERER_CLASSES', 'DEFAULT_PARSER_CLASSES', 'DEFAULT_THROTTLE_CLASSES'):
+        getattr(api_settings, name)
+    for module in DEFERRED_MODULES:
+        try:
+            importlib.import_module(module)
+        except ImportError:
+            logger.warning('Could not preload %s', module)
+
+    from blood_management.authentication import get_backend
+    get_backend()
+
+    connections.close_all()
+    return time.perf_counter() - start
@@ -0,0 +1,239 @@
+"""
+Cost-weighted rate limiting per user, per client IP and per endpoint.
+
+Each bucket allows ``rate`` tokens per period and refills continuously. The
+fill level is tracked as a sliding window over two fixed-window counters,
+updated with atomic ``cache.incr`` so concurrent requests can't race past
+the limit. Expensive views spend more than one token per call from the
+client's own bucket; see ``THROTTLING['COSTS']``. The shared endpoint
+buckets count calls, so a client can't spend them down any faster than
+its own budget lets it call.
+
+``CombinedBucketThrottle`` admits a request only when every bucket has room.
+A request refused by one bucket spends nothing from the others. The per-IP
+bucket only covers anonymous clients, so hospitals behind one NAT don't
+share a budget once they log in.
+"""
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from rest_framework.throttling import BaseThrottle
+
+
+PERIODS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+
+def get_throttle_setting(name, default=None):
+    return getattr(settings, 'THROTTLING', {}).get(name, default)
+
+
+def parse_rate(rate):
+    """
+    ``'300/min'`` -> ``(300, 60)``.
+    """
+    if not rate:
+        return None, None
+    count, period = rate.split('/')
+    return int(count), PERIODS[period[0]]
+
+
+def get_endpoint_name(request, view):
+    match = getattr(request, 'resolver_match', None)
+    if match is not None and match.url_name:
+        return match.url_name
+    return view.__class__.__name__
+
+
+def get_cost(request, view):
+    cost = getattr(view, 'throttle_cost', None)
+    if cost is None:
+        cost = get_throttle_setting('COSTS', {}).get(get_endpoint_name(request, view), 1)
+    return cost
+
+
+class SlidingWindowBucket:
+    def __init__(self, cache, key, limit, window):
+        self.cache = cache
+        self.key = key
+        self.limit = limit
+        self.window = window
+        self.taken = None
+
+    def _keys(self, now):
+        index, offset = divmod(now, self.window)
+        return f'{self.key}:{int(index)}', f'{self.key}:{int(index) - 1}', offset
+
+    def _wait(self, used, previous, offset):
+        weight = 1 - offset / self.window
+        # The previous window's share drains linearly until this window ends
+        overflow = used - self.limit
+        drain_rate = previous / self.window
+        if drain_rate and overflow <= previous * weight:
+            return overflow / drain_rate
+        return self.window - offset
+
+    def consume(self, cost, now=None):
+        """
+        Take ``cost`` tokens; return 0 on success or the seconds to wait.
+        """
+        now = time.time() if now is None else now
+        current_key, previous_key, offset = self._keys(now)
+
+        self.cache.add(current_key, 0, timeout=self.window * 2)
+        try:
+            current = self.cache.incr(current_key, cost)
+        except ValueError:
+            # Evicted between add() and incr(); start the window again
+            self.cache.set(current_key, cost, timeout=self.window * 2)
+            current = cost
+        previous = self.cache.get(previous_key, 0)
+
+        used = previous * (1 - offset / self.window) + current
+        if used <= self.limit:
+            self.taken = (current_key, cost)
+            return 0
+
+        self._decr(current_key, cost, current - cost)
+        return self._wait(used, previous, offset)
+
+    def peek(self, cost, now=None):
+        """
+        Seconds until ``cost`` tokens would be available, without taking them.
+        """
+        now = time.time() if now is None else now
+        current_key, previous_key, offset = self._keys(now)
+        values = self.cache.get_many([current_key, previous_key])
+        previous = values.get(previous_key, 0)
+        used = previous * (1 - offset / self.window) + values.get(current_key, 0) + cost
+        return 0 if used <= self.limit else self._wait(used, previous, offset)
+
+    def refund(self):
+        """
+        Give back what the last successful ``consume()`` took.
+        """
+        if self.taken is not None:
+            key, cost = self.taken
+            self._decr(key, cost, 0)
+            self.taken = None
+
+    def _decr(self, key, cost, fallback):
+        try:
+            self.cache.decr(key, cost)
+        except ValueError:
+            # Evicted or expired since incr(); re-seed with what it held before
+            self.cache.set(key, max(fallback, 0), timeout=self.window * 2)
+
+
+class BucketThrottle(BaseThrottle):
+    """
+    Base class; subclasses choose the scope, the rate and the client identity.
+    """
+    scope = None
+
+    def __init__(self):
+        self.cache = caches[get_throttle_setting('CACHE', 'default')]
+        self.wait_seconds = None
+
+    def get_rate(self, request, view):
+        return get_throttle_setting('RATES', {}).get(self.scope)
+
+    def get_ident_key(self, request, view):
+        raise NotImplementedError
+
+    def get_cost(self, request, view):
+        return get_cost(request, view)
+
+    def get_bucket(self, request, view):
+        """
+        ``(bucket, cost)`` for this request, or ``(None, 0)`` when unlimited.
+        """
+        limit, window = parse_rate(self.get_rate(request, view))
+        if limit is None:
+            return None, 0
+        ident = self.get_ident_key(request, view)
+        if ident is None:
+            return None, 0
+        cost = min(self.get_cost(request, view), limit)
+        return SlidingWindowBucket(self.cache, f'throttle:{self.scope}:{ident}', limit, window), cost
+
+    def allow_request(self, request, view):
+        bucket, cost = self.get_bucket(request, view)
+        if bucket is None:
+            return True
+        self.wait_seconds = bucket.consume(cost)
+        return not self.wait_seconds
+
+    def wait(self):
+        return self.wait_seconds
+
+
+class UserBucketThrottle(BucketThrottle):
+    scope = 'user'
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return request.user.pk
+        return None
+
+
+class IPBucketThrottle(BucketThrottle):
+    """
+    Anonymous clients only; logged-in users are limited by their own bucket.
+    """
+    scope = 'ip'
+
+    def get_ident_key(self, request, view):
+        if request.user and request.user.is_authenticated:
+            return None
+        return self.get_ident(request)
+
+
+class EndpointBucketThrottle(BucketThrottle):
+    """
+    Shared budget for one endpoint across all clients, for views that are
+    expensive no matter who calls them.
+    """
+    scope = 'endpoint'
+
+    def get_rate(self, request, view):
+        return get_throttle_setting('ENDPOINT_RATES', {}).get(get_endpoint_name(request, view))
+
+    def get_ident_key(self, request, view):
+        return get_endpoint_name(request, view)
+
+    def get_cost(self, request, view):
+        # Costs weigh a client's own budget; the shared one counts calls
+        return 1
+
+
+class CombinedBucketThrottle(BaseThrottle):
+    """
+    The user, IP and endpoint buckets checked together. Tokens taken from
+    earlier buckets are refunded when a later one refuses the request, and
+    the wait reported is the longest of all buckets that are short.
+    """
+    throttle_classes = (UserBucketThrottle, IPBucketThrottle, EndpointBucketThrottle)
+
+    def __init__(self):
+        self.wait_seconds = None
+
+    def allow_request(self, request, view):
+        self.wait_seconds = None
+        buckets = [throttle_class().get_bucket(request, view) for throttle_class in self.throttle_classes]
+        buckets = [(bucket, cost) for bucket, cost in buckets if bucket is not None]
+
+        taken = []
+        for index, (bucket, cost) in enumerate(buckets):
+            wait = bucket.consume(cost)
+            if wait:
+                for earlier in taken:
+                    earlier.refund()
+                later = [other.peek(other_cost) for other, other_cost in buckets[index + 1:]]
+                self.wait_seconds = max([wait, *later])
+                return False
+            taken.append(bucket)
+        return True
+
+    def wait(self):
+        return self.wait_seconds
@@ -2,19 +2,28 @@
 URL configuration for blood_management project.
 """
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
-from .views import api_root
+from .views import api_root, batch_view, metrics_view, slow_query_list, profile_list, profile_detail, serve_media
 
 urlpatterns = [
     path('', api_root, name='api_root'),
+    path('metrics', metrics_view, name='metrics'),
     path('admin/', admin.site.urls),
     path('api/auth/', include('accounts.urls')),
     path('api/', include('bloodbank.urls')),
+    path('api/batch/', batch_view, name='batch'),
+    path('api/perf/slow-queries/', slow_query_list, name='slow_query_list'),
+    path('api/perf/profiles/', profile_list, name='profile_list'),
+    path('api/perf/profiles/<int:pk>/', profile_detail, name='profile_detail'),
 ]
 
+if settings.DEBUG or settings.PROFILE_PHOTOS.get('SERVE_MEDIA'):
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), serve_media, name='media'),
+    ]
+
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
 
@@ -1,5 +1,13 @@
-from django.http import JsonResponse
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
 from django.views.decorators.csrf import csrf_exempt
+from django.views.static import serve
+from rest_framework import permissions, status
+from rest_framework.decorators import api_view, permission_classes
+from rest_framework.response import Response
+from accounts.photos import get_photo_setting, is_content_hashed
+from bloodbank.views import IsAdmin
+from . import batch, metrics, profiling
 
 @csrf_exempt
 def api_root(request):
@@ -26,27 +34,144 @@ def api_root(request):
             "blood_inventory": {
                 "list": "/api/blood-inventory/",
                 "update": "/api/blood-inventory/{id}/",
+                "matrix": "/api/blood-inventory/matrix/",
+                "compatible": "/api/blood-inventory/compatible/",
             },
             "blood_requests": {
                 "list_create": "/api/blood-requests/",
                 "detail": "/api/blood-requests/{id}/",
                 "approve_reject": "/api/blood-requests/{id}/approve-reject/",
+                "bulk_approve_reject": "/api/blood-requests/bulk-approve-reject/",
+                "triage": "/api/blood-requests/triage/",
+                "claim_next": "/api/blood-requests/triage/claim/",
+                "claim": "/api/blood-requests/{id}/claim/",
+            },
+            "reservations": {
+                "list_create": "/api/reservations/",
+                "detail": "/api/reservations/{id}/",
+                "fulfil": "/api/reservations/{id}/fulfil/",
+                "release": "/api/reservations/{id}/release/",
             },
             "donations": {
                 "list_create": "/api/donations/",
                 "detail": "/api/donations/{id}/",
                 "approve_reject": "/api/donations/{id}/approve-reject/",
+                "bulk_approve_reject": "/api/donations/bulk-approve-reject/",
             },
             "search": {
                 "donors": "/api/search-donors/",
             },
+            "sync": "/api/sync/",
+            "analytics": "/api/analytics/",
             "dashboards": {
                 "admin": "/api/dashboard/admin/",
                 "donor": "/api/dashboard/donor/",
-            }
+                "admin_async": "/api/dashboard/admin/async/",
+                "donor_async": "/api/dashboard/donor/async/",
+            },
+            "batch": "/api/batch/",
+            "metrics": "/metrics",
+            "performance": {
+                "slow_queries": "/api/perf/slow-queries/",
+                "profiles": "/api/perf/profiles/",
+                "profile_detail": "/api/perf/profiles/{id}/",
+            },
         },
         "frontend": "http://localhost:3000",
         "documentation": "API requires authentication. Use JWT tokens for authenticated requests."
     }
     return JsonResponse(api_info, json_dumps_params={'indent': 2})
 
+
+
+def metrics_view(request):
+    """
+    Prometheus text exposition of the in-process request histograms
+    """
+    token = getattr(settings, 'PERF_METRICS', {}).get('TOKEN')
+    if not token and not settings.DEBUG:
+        # Never expose the histograms unauthenticated outside development
+        return HttpResponse(status=403)
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponse(status=401)
+    return HttpResponse(
+        metrics.registry.render(),
+        content_type='text/plain; version=0.0.4; charset=utf-8',
+    )
+
+
+@api_view(['GET', 'DELETE'])
+@permission_classes([IsAdmin])
+def slow_query_list(request):
+    if request.method == 'DELETE':
+        profiling.slow_queries.clear()
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+    min_ms = request.query_params.get('min_ms', None)
+    if min_ms:
+        try:
+            min_ms = float(min_ms)
+        except ValueError:
+            return Response({'error': 'min_ms must be a number'}, status=status.HTTP_400_BAD_REQUEST)
+
+    entries = profiling.slow_queries.list()
+    view = request.query_params.get('view', None)
+    if view:
+        entries = [entry for entry in entries if entry['view'] == view]
+    if min_ms:
+        entries = [entry for entry in entries if entry['duration_ms'] >= min_ms]
+    return Response(entries)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def profile_list(request):
+    # Listing omits the function tables; fetch a profile by id for those
+    summaries = [
+        {key: value for key, value in entry.items() if key != 'functions'}
+        for entry in profiling.profiles.list()
+    ]
+    return Response(summaries)
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def profile_detail(request, pk):
+    entry = profiling.profiles.get(pk)
+    if entry is None:
+        return Response({'error': 'Profile not found'}, status=status.HTTP_404_NOT_FOUND)
+    return Response(entry)
+
+
+@api_view(['POST'])
+@permission_classes([permissions.IsAuthenticated])
+def batch_view(request):
+    """
+    Run several GET requests in one round trip.
+
+    Body: ``{"requests": ["/api/auth/me/", "/api/blood-banks/?page=2"],
+    "parallel": true}``. Returns ``{"responses": [...]}`` in the same order,
+    each ``{"path", "status", "body"}``; one failing sub-request doesn't fail
+    the others.
+    """
+    if not isinstance(request.data, dict):
+        return Response({'error': 'Expected an object with "requests"'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        paths = batch.parse_paths(request.data.get('requests'))
+    except batch.BatchError as exc:
+        return Response({'error': str(exc)}, status=status.HTTP_400_BAD_REQUEST)
+    parallel = request.data.get('parallel', batch.get_batch_setting('PARALLEL', False))
+    parallel = str(parallel).lower() in ('1', 'true', 'yes')
+    return Response({'responses': batch.run(request, paths, parallel=parallel)})
+
+
+def serve_media(request, path):
+    """
+    Serve uploaded media. Content-hashed names never change, so they are
+    cached for a year and marked immutable.
+    """
+    response = serve(request, path, document_root=settings.MEDIA_ROOT)
+    if is_content_hashed(path):
+        max_age = get_photo_setting('CACHE_MAX_AGE', 365 * 24 * 60 * 60)
+        response['Cache-Control'] = f'public, max-age={max_age}, immutable'
+    return response
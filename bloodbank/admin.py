@@ -1,33 +1,137 @@
 from django.contrib import admin
-from .models import BloodBank, BloodInventory, BloodRequest, Donation
+from blood_management.admin_performance import LargeTableAdmin, AutocompleteFilter, TextInputFilter
+from .models import (
+    ArchivedBloodRequest, ArchivedDonation, BloodAllocation, BloodBank, BloodInventory, BloodRequest,
+    BloodUnitLot, Donation, Reservation,
+)
 
 
 @admin.register(BloodBank)
-class BloodBankAdmin(admin.ModelAdmin):
+class BloodBankAdmin(LargeTableAdmin):
     list_display = ('name', 'city', 'state', 'phone', 'is_active', 'created_at')
-    list_filter = ('is_active', 'city', 'state')
+    list_filter = ('is_active', ('city', TextInputFilter), ('state', TextInputFilter))
     search_fields = ('name', 'city', 'phone', 'email')
 
 
 @admin.register(BloodInventory)
-class BloodInventoryAdmin(admin.ModelAdmin):
-    list_display = ('blood_bank', 'blood_group', 'units_available', 'last_updated')
-    list_filter = ('blood_group', 'blood_bank')
+class BloodInventoryAdmin(LargeTableAdmin):
+    list_display = ('blood_bank', 'blood_group', 'units_available', 'units_reserved', 'last_updated')
+    list_filter = ('blood_group', ('blood_bank', AutocompleteFilter))
     search_fields = ('blood_bank__name', 'blood_group')
+    readonly_fields = ('units_reserved',)
+    list_select_related = ('blood_bank',)
+    list_only = ('blood_bank__name', 'blood_group', 'units_available', 'units_reserved', 'last_updated')
+    autocomplete_fields = ('blood_bank',)
+
+
+class BloodAllocationInline(admin.TabularInline):
+    model = BloodAllocation
+    extra = 0
+    can_delete = False
+    readonly_fields = ('blood_bank', 'blood_group', 'units', 'created_at')
+
+    def has_add_permission(self, request, obj=None):
+        return False
 
 
 @admin.register(BloodRequest)
-class BloodRequestAdmin(admin.ModelAdmin):
+class BloodRequestAdmin(LargeTableAdmin):
     list_display = ('requester', 'blood_group', 'units_required', 'urgency', 'status', 'created_at')
     list_filter = ('status', 'urgency', 'blood_group', 'created_at')
     search_fields = ('requester__username', 'blood_group', 'reason')
     readonly_fields = ('created_at', 'updated_at')
+    list_select_related = ('requester',)
+    list_only = (
+        'requester__username', 'requester__role', 'blood_group',
+        'units_required', 'urgency', 'status', 'created_at',
+    )
+    date_hierarchy = 'created_at'
+    autocomplete_fields = ('requester', 'blood_bank')
+    inlines = (BloodAllocationInline,)
 
 
 @admin.register(Donation)
-class DonationAdmin(admin.ModelAdmin):
+class DonationAdmin(LargeTableAdmin):
     list_display = ('donor', 'blood_group', 'units_donated', 'status', 'donation_date', 'created_at')
     list_filter = ('status', 'blood_group', 'donation_date')
     search_fields = ('donor__username', 'blood_group')
     readonly_fields = ('created_at', 'updated_at')
+    list_select_related = ('donor',)
+    list_only = (
+        'donor__username', 'donor__role', 'blood_group',
+        'units_donated', 'status', 'donation_date', 'created_at',
+    )
+    date_hierarchy = 'created_at'
+    autocomplete_fields = ('donor', 'blood_bank')
+
+
+class ArchiveAdmin(LargeTableAdmin):
+    """
+    Read-only view of archived rows; they are only written by ``archive_closed_records``.
+    """
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(ArchivedBloodRequest)
+class ArchivedBloodRequestAdmin(ArchiveAdmin):
+    list_display = ('id', 'requester', 'blood_group', 'units_required', 'status', 'created_at', 'archived_at')
+    list_filter = ('status', 'blood_group')
+    search_fields = ('requester__username',)
+    list_select_related = ('requester',)
+    list_only = ('requester__username', 'requester__role', 'blood_group', 'units_required', 'status', 'created_at', 'archived_at')
+    date_hierarchy = 'created_at'
+
+
+@admin.register(ArchivedDonation)
+class ArchivedDonationAdmin(ArchiveAdmin):
+    list_display = ('id', 'donor', 'blood_group', 'units_donated', 'status', 'donation_date', 'archived_at')
+    list_filter = ('status', 'blood_group')
+    search_fields = ('donor__username',)
+    list_select_related = ('donor',)
+    list_only = ('donor__username', 'donor__role', 'blood_group', 'units_donated', 'status', 'donation_date', 'archived_at')
+    date_hierarchy = 'created_at'
+
+
+@admin.register(BloodUnitLot)
+class BloodUnitLotAdmin(LargeTableAdmin):
+    """
+    Lots are written by donation approvals and drawn down by request
+    approvals, which keep the inventory totals in step; no manual edits.
+    """
+    list_display = ('blood_bank', 'blood_group', 'component', 'units_remaining', 'units_received', 'expiry_date', 'retired_at')
+    list_filter = ('blood_group', 'component', ('blood_bank', AutocompleteFilter))
+    search_fields = ('blood_bank__name',)
+    list_select_related = ('blood_bank',)
+    list_only = ('blood_bank__name', 'blood_group', 'component', 'units_remaining', 'units_received', 'expiry_date', 'retired_at')
+    date_hierarchy = 'expiry_date'
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+
+@admin.register(Reservation)
+class ReservationAdmin(LargeTableAdmin):
+    """
+    Holds move units in and out of the inventory totals as they open and
+    close; they are only changed through the API.
+    """
+    list_display = ('blood_bank', 'blood_group', 'units', 'status', 'blood_request', 'expires_at', 'created_at')
+    list_filter = ('status', 'blood_group', ('blood_bank', AutocompleteFilter))
+    search_fields = ('blood_bank__name', 'notes')
+    list_select_related = ('blood_bank',)
+    list_only = ('blood_bank__name', 'blood_group', 'units', 'status', 'blood_request', 'expires_at', 'created_at')
+    date_hierarchy = 'created_at'
+
+    def has_add_permission(self, request):
+        return False
 
+    def has_change_permission(self, request, obj=None):
+        return False
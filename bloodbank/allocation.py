@@ -0,0 +1,252 @@
+"""
+Split a blood request across several banks and compatible blood groups.
+
+``plan_allocation`` works from a single inventory snapshot and returns the
+lines to debit; ``apply_allocation`` debits them all in one transaction,
+failing as a whole if any row changed underneath it. Both stay within the
+request's own shard; ``compatible_stock`` reads every region.
+"""
+from collections import defaultdict
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from blood_management.sharding import scatter
+from .cache import bump_inventory_version
+from .lots import draw_down
+from .models import BloodAllocation, BloodInventory
+
+
+# Red cell compatibility: recipient group -> donor groups, best match first
+COMPATIBLE_DONORS = {
+    'O-': ['O-'],
+    'O+': ['O+', 'O-'],
+    'A-': ['A-', 'O-'],
+    'A+': ['A+', 'A-', 'O+', 'O-'],
+    'B-': ['B-', 'O-'],
+    'B+': ['B+', 'B-', 'O+', 'O-'],
+    'AB-': ['AB-', 'A-', 'B-', 'O-'],
+    'AB+': ['AB+', 'AB-', 'A+', 'A-', 'B+', 'B-', 'O+', 'O-'],
+}
+
+POLICIES = ('fewest_banks', 'same_city', 'largest_first')
+
+
+def get_allocation_setting(name, default=None):
+    return getattr(settings, 'BLOOD_ALLOCATION', {}).get(name, default)
+
+
+class AllocationError(Exception):
+    pass
+
+
+class InsufficientStock(AllocationError):
+    def __init__(self, available, required):
+        self.available = available
+        self.required = required
+        super().__init__(f'Insufficient blood units. Available: {available}, Required: {required}')
+
+
+class StockChanged(AllocationError):
+    def __init__(self):
+        super().__init__('Inventory changed while allocating, please retry')
+
+
+@dataclass
+class AllocationLine:
+    inventory_id: int
+    blood_bank_id: int
+    blood_bank_name: str
+    blood_group: str
+    units: int
+
+    def as_dict(self):
+        return {
+            'blood_bank': self.blood_bank_id,
+            'blood_bank_name': self.blood_bank_name,
+            'blood_group': self.blood_group,
+            'units': self.units,
+        }
+
+
+def compatible_groups(blood_group, allow_substitutes=True):
+    if not allow_substitutes:
+        return [blood_group]
+    return COMPATIBLE_DONORS.get(blood_group, [blood_group])
+
+
+def inventory_snapshot(groups, blood_bank_ids=None):
+    queryset = BloodInventory.objects.filter(
+        blood_group__in=groups, units_available__gt=0, blood_bank__is_active=True,
+    )
+    if blood_bank_ids:
+        queryset = queryset.filter(blood_bank_id__in=blood_bank_ids)
+    return list(queryset.values(
+        'id', 'blood_bank_id', 'blood_bank__name', 'blood_bank__city', 'blood_group', 'units_available',
+    ))
+
+
+def plan_allocation(blood_group, units_required, policy=None, city=None,
+                    allow_substitutes=None, blood_bank_ids=None):
+    """
+    Choose inventory rows covering ``units_required`` under ``policy``.
+
+    The exact blood group is always preferred over compatible substitutes.
+    Raises ``InsufficientStock`` when the whole network can't cover it.
+    """
+    policy = policy or get_allocation_setting('DEFAULT_POLICY', 'fewest_banks')
+    if units_required < 1:
+        raise AllocationError('A blood request must be for at least one unit')
+    if policy not in POLICIES:
+        raise AllocationError(f'Unknown allocation policy "{policy}". Use one of: {", ".join(POLICIES)}')
+    if allow_substitutes is None:
+        allow_substitutes = get_allocation_setting('ALLOW_COMPATIBLE_GROUPS', True)
+
+    groups = compatible_groups(blood_group, allow_substitutes)
+    group_rank = {group: rank for rank, group in enumerate(groups)}
+    rows = inventory_snapshot(groups, blood_bank_ids)
+
+    available = sum(row['units_available'] for row in rows)
+    if available < units_required:
+        raise InsufficientStock(available, units_required)
+
+    city = (city or '').strip().lower()
+
+    if policy == 'fewest_banks':
+        ordered = _order_fewest_banks(rows, group_rank, units_required)
+    elif policy == 'same_city':
+        ordered = sorted(rows, key=lambda row: (
+            row['blood_bank__city'].strip().lower() != city,
+            group_rank[row['blood_group']],
+            -row['units_available'],
+        ))
+    else:
+        ordered = sorted(rows, key=lambda row: (group_rank[row['blood_group']], -row['units_available']))
+
+    lines = []
+    remaining = units_required
+    for row in ordered:
+        if remaining == 0:
+            break
+        units = min(remaining, row['units_available'])
+        lines.append(AllocationLine(
+            inventory_id=row['id'],
+            blood_bank_id=row['blood_bank_id'],
+            blood_bank_name=row['blood_bank__name'],
+            blood_group=row['blood_group'],
+            units=units,
+        ))
+        remaining -= units
+    return lines
+
+
+def _order_fewest_banks(rows, group_rank, units_required):
+    by_bank = defaultdict(list)
+    for row in rows:
+        by_bank[row['blood_bank_id']].append(row)
+    totals = {
+        bank_id: sum(row['units_available'] for row in bank_rows)
+        for bank_id, bank_rows in by_bank.items()
+    }
+
+    # A single bank that can cover everything wins; take the smallest such
+    # bank so the big stocks stay intact. Otherwise drain the largest first.
+    sufficient = [bank_id for bank_id, total in totals.items() if total >= units_required]
+    if sufficient:
+        bank_order = sorted(sufficient, key=lambda bank_id: (totals[bank_id], bank_id))
+    else:
+        bank_order = sorted(totals, key=lambda bank_id: (-totals[bank_id], bank_id))
+
+    ordered = []
+    for bank_id in bank_order:
+        ordered.extend(sorted(
+            by_bank[bank_id],
+            key=lambda row: (group_rank[row['blood_group']], -row['units_available']),
+        ))
+    return ordered
+
+
+def apply_allocation(blood_request, lines):
+    """
+    Debit every line and record it against ``blood_request`` atomically.
+
+    Each debit only succeeds if the row still holds enough units, so a
+    concurrent approval makes the whole allocation roll back with
+    ``StockChanged`` instead of driving a count negative. The bank's lots
+    are drawn down first-expiry-first-out alongside.
+    """
+    using = router.db_for_write(BloodInventory)
+    with transaction.atomic(using=using):
+        for line in lines:
+            updated = BloodInventory.objects.filter(
+                pk=line.inventory_id, units_available__gte=line.units,
+            ).update(units_available=F('units_available') - line.units, last_updated=timezone.now())
+            if not updated:
+                raise StockChanged()
+            draw_down(line.blood_bank_id, line.blood_group, line.units)
+
+        BloodAllocation.objects.bulk_create([
+            BloodAllocation(
+                blood_request=blood_request,
+                blood_bank_id=line.blood_bank_id,
+                blood_group=line.blood_group,
+                units=line.units,
+            )
+            for line in lines
+        ])
+        transaction.on_commit(bump_inventory_version, using=using)
+    return lines
+
+
+def compatible_stock(blood_group, units_required=1, city=None, allow_substitutes=None, limit=20):
+    """
+    Banks across every region holding stock ``blood_group`` can receive.
+
+    Each shard's snapshot is read in parallel and merged per bank. Banks
+    that can cover ``units_required`` on their own come first, then those
+    in ``city``, then those whose best group is the closest match, then the
+    largest stock.
+    """
+    if allow_substitutes is None:
+        allow_substitutes = get_allocation_setting('ALLOW_COMPATIBLE_GROUPS', True)
+    groups = compatible_groups(blood_group, allow_substitutes)
+    group_rank = {group: rank for rank, group in enumerate(groups)}
+    snapshots = scatter(lambda: inventory_snapshot(groups))
+
+    banks = {}
+    regions = {}
+    for region, rows in snapshots.items():
+        regions[region] = sum(row['units_available'] for row in rows)
+        for row in rows:
+            bank = banks.setdefault(row['blood_bank_id'], {
+                'blood_bank': row['blood_bank_id'],
+                'blood_bank_name': row['blood_bank__name'],
+                'city': row['blood_bank__city'],
+                'region': region,
+                'units': {},
+                'total': 0,
+            })
+            bank['units'][row['blood_group']] = row['units_available']
+            bank['total'] += row['units_available']
+
+    city = (city or '').strip().lower()
+    ordered = sorted(banks.values(), key=lambda bank: (
+        bank['total'] < units_required,
+        bool(city) and bank['city'].strip().lower() != city,
+        min(group_rank[group] for group in bank['units']),
+        -bank['total'],
+        bank['blood_bank'],
+    ))
+    for bank in ordered:
+        bank['units'] = {group: bank['units'][group] for group in groups if group in bank['units']}
+    return {
+        'blood_group': blood_group,
+        'units_required': units_required,
+        'compatible_groups': groups,
+        'total_available': sum(regions.values()),
+        'regions': regions,
+        'banks': ordered[:limit],
+    }
@@ -0,0 +1,253 @@
+"""
+Ad hoc breakdowns of blood requests and donations for the admin analytics
+endpoint.
+
+A cube query names a fact (``requests`` or ``donations``), up to
+``ANALYTICS['MAX_DIMENSIONS']`` dimensions to group by, one of which may be
+a time bucket on ``created_at``, and the measures to compute per group.
+Each shard answers it with one grouped SQL query over the hot and archive
+tables (``UNION ALL``); the groups are then summed across both and across
+shards. Results come back column by column, ready to hand to a chart.
+"""
+from dataclasses import dataclass
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.db.models import Count, DateField, Q, Sum
+from django.db.models.functions import Trunc
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from blood_management.sharding import scatter
+from .models import ArchivedBloodRequest, ArchivedDonation, BloodRequest, Donation
+
+
+# Dimension -> (column, lookup) pairs it adds to the result
+DIMENSIONS = {
+    'blood_group': [('blood_group', 'blood_group')],
+    'urgency': [('urgency', 'urgency')],
+    'status': [('status', 'status')],
+    'blood_bank': [('blood_bank', 'blood_bank'), ('blood_bank_name', 'blood_bank__name')],
+    'state': [('state', 'blood_bank__state')],
+}
+
+BUCKETS = ('day', 'week', 'month', 'quarter', 'year')
+
+MEASURES = ('count', 'units', 'approved', 'rejected', 'approval_rate')
+
+DEFAULT_MEASURES = ('count', 'units')
+
+
+def get_analytics_setting(name, default=None):
+    return getattr(settings, 'ANALYTICS', {}).get(name, default)
+
+
+class AnalyticsError(Exception):
+    pass
+
+
+@dataclass(frozen=True)
+class Fact:
+    models: tuple
+    units: str
+    dimensions: tuple
+    approved: tuple
+
+
+FACTS = {
+    'requests': Fact(
+        (BloodRequest, ArchivedBloodRequest), 'units_required',
+        ('blood_group', 'urgency', 'status', 'blood_bank', 'state'), ('approved', 'fulfilled'),
+    ),
+    'donations': Fact(
+        (Donation, ArchivedDonation), 'units_donated',
+        ('blood_group', 'status', 'blood_bank', 'state'), ('approved', 'completed'),
+    ),
+}
+
+
+@dataclass(frozen=True)
+class CubeQuery:
+    fact: str
+    dimensions: tuple
+    measures: tuple
+    filters: tuple
+    start: object = None
+    end: object = None
+
+    @property
+    def bucket(self):
+        return next((name for name in self.dimensions if name in BUCKETS), None)
+
+    def columns(self):
+        """
+        ``(column, lookup)`` pairs for the grouped dimensions, in order.
+        """
+        columns = []
+        for name in self.dimensions:
+            columns.extend([(name, name)] if name in BUCKETS else DIMENSIONS[name])
+        return columns
+
+    def cache_key(self):
+        parts = [self.fact, ','.join(self.dimensions), ','.join(self.measures), self.start, self.end]
+        parts.extend(f'{lookup}={value}' for lookup, value in self.filters)
+        return 'bloodbank:analytics:' + ':'.join(str(part) for part in parts)
+
+
+def _split(value):
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+
+def _parse_day(params, name):
+    value = params.get(name)
+    if not value:
+        return None
+    try:
+        day = parse_date(value)
+    except ValueError:
+        day = None
+    if day is None:
+        raise AnalyticsError(f'{name} must be YYYY-MM-DD')
+    return day
+
+
+def parse_query(params):
+    """
+    Validate query parameters into a ``CubeQuery``.
+    """
+    fact_name = params.get('fact', 'requests')
+    fact = FACTS.get(fact_name)
+    if fact is None:
+        raise AnalyticsError(f'Unknown fact. Use one of: {", ".join(FACTS)}')
+
+    dimensions = tuple(dict.fromkeys(_split(params.get('dimensions', ''))))
+    allowed = fact.dimensions + BUCKETS
+    unknown = [name for name in dimensions if name not in allowed]
+    if unknown:
+        raise AnalyticsError(f'Unknown dimension {unknown[0]!r}. Use any of: {", ".join(allowed)}')
+    if sum(name in BUCKETS for name in dimensions) > 1:
+        raise AnalyticsError('Group by at most one time bucket')
+    max_dimensions = get_analytics_setting('MAX_DIMENSIONS', 4)
+    if len(dimensions) > max_dimensions:
+        raise AnalyticsError(f'Group by at most {max_dimensions} dimensions')
+
+    measures = tuple(dict.fromkeys(_split(params.get('measures', '')))) or DEFAULT_MEASURES
+    unknown = [name for name in measures if name not in MEASURES]
+    if unknown:
+        raise AnalyticsError(f'Unknown measure {unknown[0]!r}. Use any of: {", ".join(MEASURES)}')
+
+    filters = []
+    for name in fact.dimensions:
+        value = params.get(name)
+        if not value:
+            continue
+        lookup = DIMENSIONS[name][-1][1]
+        if name == 'state':
+            lookup += '__iexact'
+        elif name == 'blood_bank':
+            if not value.isdigit():
+                raise AnalyticsError('blood_bank must be an id')
+            value = int(value)
+        filters.append((lookup, value))
+
+    start, end = _parse_day(params, 'from'), _parse_day(params, 'to')
+    if start and end and start > end:
+        raise AnalyticsError('from must not be after to')
+    return CubeQuery(fact_name, dimensions, measures, tuple(filters), start, end)
+
+
+def _aggregates(query, fact):
+    aggregates = {'count': Count('pk'), 'units': Sum(fact.units)}
+    if {'approved', 'approval_rate'} & set(query.measures):
+        aggregates['approved'] = Count('pk', filter=Q(status__in=fact.approved))
+    if {'rejected', 'approval_rate'} & set(query.measures):
+        aggregates['rejected'] = Count('pk', filter=Q(status='rejected'))
+    return aggregates
+
+
+def filtered_queryset(query, model):
+    """
+    One model's rows matching ``query``, with its time bucket annotated.
+    """
+    queryset = model.objects.filter(**dict(query.filters))
+    tz = timezone.get_current_timezone()
+    if query.start:
+        queryset = queryset.filter(created_at__gte=timezone.make_aware(datetime.combine(query.start, time.min), tz))
+    if query.end:
+        queryset = queryset.filter(
+            created_at__lt=timezone.make_aware(datetime.combine(query.end + timedelta(days=1), time.min), tz)
+        )
+    if query.bucket:
+        queryset = queryset.annotate(
+            **{query.bucket: Trunc('created_at', query.bucket, output_field=DateField(), tzinfo=tz)}
+        )
+    return queryset.order_by()
+
+
+def shard_cells(query, limit):
+    """
+    ``{group: {aggregate: value}}`` for the current shard, or ``None`` with
+    more than ``limit`` groups.
+    """
+    aggregates = _aggregates(query, FACTS[query.fact])
+    hot, archived = (filtered_queryset(query, model) for model in FACTS[query.fact].models)
+    lookups = [lookup for _, lookup in query.columns()]
+    if lookups:
+        grouped = [queryset.values(*lookups).annotate(**aggregates) for queryset in (hot, archived)]
+        # A group can come from both tables, so there are up to twice as many rows
+        rows = list(grouped[0].union(grouped[1], all=True)[:2 * limit + 1])
+    else:
+        rows = [hot.aggregate(**aggregates), archived.aggregate(**aggregates)]
+
+    cells = {}
+    for row in rows:
+        cell = cells.setdefault(tuple(row[lookup] for lookup in lookups), {})
+        for name in aggregates:
+            cell[name] = cell.get(name, 0) + (row[name] or 0)
+    return cells if len(rows) <= 2 * limit and len(cells) <= limit else None
+
+
+def _sort_key(key):
+    # NULLs (e.g. requests with no bank) first
+    return tuple((value is not None, value if value is not None else 0) for value in key)
+
+
+def evaluate(query, shards=None):
+    """
+    Evaluate ``query`` over ``shards`` (all by default) as columnar data.
+    """
+    limit = get_analytics_setting('MAX_CELLS', 5000)
+    cells = {}
+    for shard in scatter(lambda: shard_cells(query, limit), aliases=shards).values():
+        if shard is None:
+            cells = None
+            break
+        for key, values in shard.items():
+            cell = cells.setdefault(key, {})
+            for name, value in values.items():
+                cell[name] = cell.get(name, 0) + value
+    if cells is None or len(cells) > limit:
+        raise AnalyticsError(f'More than {limit} groups; add filters or use fewer or coarser dimensions')
+
+    keys = sorted(cells, key=_sort_key)
+    columns = {
+        column: [key[index] for key in keys] for index, (column, _) in enumerate(query.columns())
+    }
+    for name in query.measures:
+        if name == 'approval_rate':
+            columns[name] = [_approval_rate(cells[key]) for key in keys]
+        else:
+            columns[name] = [cells[key][name] for key in keys]
+    return {
+        'fact': query.fact,
+        'dimensions': list(query.dimensions),
+        'measures': list(query.measures),
+        'columns': columns,
+        'rows': len(keys),
+        'generated_at': timezone.now(),
+    }
+
+
+def _approval_rate(cell):
+    decided = cell['approved'] + cell['rejected']
+    return round(cell['approved'] / decided, 4) if decided else None
@@ -5,3 +5,5 @@ class BloodbankConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'bloodbank'
 
+    def ready(self):
+        from . import signals  # noqa: F401
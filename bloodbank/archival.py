@@ -0,0 +1,119 @@
+"""
+Move closed blood requests and donations into archive tables.
+
+Rows leave the hot tables in batches, each copied and deleted in its own
+transaction, so a run can be stopped at any point and simply started again.
+Archived rows keep their primary keys; ``include_archived`` list queries
+union both tables.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import router, transaction
+from django.utils import timezone
+
+from .models import ArchivedBloodRequest, ArchivedDonation, BloodAllocation, BloodRequest, Donation
+
+
+def get_archival_setting(name, default=None):
+    return getattr(settings, 'ARCHIVAL', {}).get(name, default)
+
+
+@dataclass(frozen=True)
+class ArchiveSpec:
+    model: type
+    archive_model: type
+    closed_statuses: tuple
+
+    @property
+    def label(self):
+        return self.model._meta.verbose_name_plural
+
+    def copy_fields(self):
+        archive_fields = {field.attname for field in self.archive_model._meta.concrete_fields}
+        return [field.attname for field in self.model._meta.concrete_fields if field.attname in archive_fields]
+
+
+SPECS = {
+    # Approval is where a request's workflow ends; nothing sets 'fulfilled' yet
+    BloodRequest: ArchiveSpec(BloodRequest, ArchivedBloodRequest, ('approved', 'fulfilled', 'rejected')),
+    Donation: ArchiveSpec(Donation, ArchivedDonation, ('completed', 'rejected')),
+}
+
+
+def get_cutoff(older_than=None):
+    return timezone.now() - (older_than or get_archival_setting('CLOSED_AFTER', timedelta(days=180)))
+
+
+def archivable(spec, cutoff):
+    # An id already in the archive is never moved, so its hot row can't be deleted unsaved
+    return spec.model.objects.filter(status__in=spec.closed_statuses, updated_at__lt=cutoff).exclude(
+        pk__in=spec.archive_model.objects.values('pk'),
+    )
+
+
+def conflicting(spec, cutoff):
+    """
+    Closed rows whose id is already taken in the archive table; these stay
+    in the hot table until someone resolves them by hand.
+    """
+    return spec.model.objects.filter(
+        status__in=spec.closed_statuses, updated_at__lt=cutoff,
+        pk__in=spec.archive_model.objects.values('pk'),
+    )
+
+
+def archive_batch(spec, cutoff, batch_size=None):
+    """
+    Archive up to ``batch_size`` closed rows, oldest ids first. Returns the
+    number of rows moved.
+    """
+    batch_size = batch_size or get_archival_setting('BATCH_SIZE', 500)
+    fields = spec.copy_fields()
+    with transaction.atomic(using=router.db_for_write(spec.model)):
+        rows = list(
+            archivable(spec, cutoff).select_for_update().order_by('pk').values(*fields)[:batch_size]
+        )
+        if not rows:
+            return 0
+        ids = [row['id'] for row in rows]
+
+        if spec.model is BloodRequest:
+            allocations = {}
+            for allocation in BloodAllocation.objects.filter(blood_request_id__in=ids).order_by('pk').values(
+                'blood_request_id', 'blood_bank_id', 'blood_group', 'units', 'created_at',
+            ):
+                allocations.setdefault(allocation.pop('blood_request_id'), []).append({
+                    'blood_bank': allocation['blood_bank_id'],
+                    'blood_group': allocation['blood_group'],
+                    'units': allocation['units'],
+                    'created_at': allocation['created_at'].isoformat(),
+                })
+            for row in rows:
+                row['allocations'] = allocations.get(row['id'], [])
+
+        # No ignore_conflicts: an id archived since the select fails the whole
+        # batch instead of silently keeping the old copy and deleting this one
+        spec.archive_model.objects.bulk_create([spec.archive_model(**row) for row in rows])
+        spec.model.objects.filter(pk__in=ids).delete()
+    return len(rows)
+
+
+def archive(spec, cutoff, batch_size=None, max_batches=None, on_batch=None):
+    """
+    Archive batches until nothing older than ``cutoff`` is left or
+    ``max_batches`` have run. Returns the total number of rows moved.
+    """
+    batch_size = batch_size or get_archival_setting('BATCH_SIZE', 500)
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        moved = archive_batch(spec, cutoff, batch_size)
+        total += moved
+        batches += 1
+        if on_batch is not None and moved:
+            on_batch(moved, total)
+        if moved < batch_size:
+            break
+    return total
@@ -0,0 +1,312 @@
+"""
+Approve or reject many blood requests or donations in one transaction.
+
+Items are validated one by one against a locked copy of the affected
+inventory rows; stock changes are then summed per (bank, blood group) and
+written with one UPDATE per row, and the reviewed rows are saved with
+``bulk_update``. Items that fail validation are reported and left
+untouched; the rest are applied together. Debits draw the banks' lots down
+first-expiry-first-out, and completed donations are recorded as new lots.
+With regional shards, ``review_by_shard`` gives each shard's items their
+own transaction.
+"""
+from collections import defaultdict
+
+from django.db import router, transaction
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from accounts.models import DonorProfile
+from blood_management.sharding import shard_for_pk, use_shard
+from .cache import bump_inventory_version
+from .lots import LotError, build_lot, draw_down, get_component, retire_expired
+from .models import BloodAllocation, BloodBank, BloodInventory, BloodRequest, BloodUnitLot, Donation
+
+
+MAX_ITEMS = 500
+ACTIONS = ('approve', 'reject')
+
+
+class BulkReviewError(Exception):
+    pass
+
+
+def normalize_items(data):
+    """
+    Return the list of items from the request body, each with the top-level
+    ``action``, ``blood_bank_id``, ``donation_date``, ``component`` and
+    ``admin_notes`` filled in where the item leaves them out.
+    """
+    if not isinstance(data, dict):
+        raise BulkReviewError('Expected an object with "items"')
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        raise BulkReviewError('"items" must be a non-empty list')
+    if len(items) > MAX_ITEMS:
+        raise BulkReviewError(f'At most {MAX_ITEMS} items per call')
+
+    defaults = {
+        key: data.get(key)
+        for key in ('action', 'blood_bank_id', 'donation_date', 'component', 'admin_notes')
+        if data.get(key) not in (None, '')
+    }
+    normalized = []
+    seen = set()
+    for item in items:
+        if not isinstance(item, dict):
+            item = {'id': item}
+        item = {**defaults, **item}
+        try:
+            item['id'] = int(item.get('id'))
+        except (TypeError, ValueError):
+            raise BulkReviewError(f'Invalid id: {item.get("id")!r}')
+        if item['id'] in seen:
+            raise BulkReviewError(f'Duplicate id: {item["id"]}')
+        seen.add(item['id'])
+        normalized.append(item)
+    return normalized
+
+
+def _bank_id(item):
+    value = item.get('blood_bank_id')
+    if value in (None, ''):
+        return None
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return False
+
+
+def _lock_inventory(keys):
+    """
+    Lock the inventory rows for the given (bank, group) pairs.
+    """
+    if not keys:
+        return {}
+    rows = BloodInventory.objects.select_for_update().filter(
+        blood_bank_id__in={bank_id for bank_id, _ in keys},
+        blood_group__in={group for _, group in keys},
+    ).order_by('pk')
+    return {(row.blood_bank_id, row.blood_group): row for row in rows}
+
+
+def _apply_deltas(inventory, deltas, now):
+    for key, delta in deltas.items():
+        if delta:
+            BloodInventory.objects.filter(pk=inventory[key].pk).update(
+                units_available=F('units_available') + delta, last_updated=now,
+            )
+        if delta < 0:
+            draw_down(*key, -delta)
+    if any(deltas.values()):
+        transaction.on_commit(bump_inventory_version, using=router.db_for_write(BloodInventory))
+    return [
+        {'blood_bank': bank_id, 'blood_group': group, 'units': delta}
+        for (bank_id, group), delta in sorted(deltas.items()) if delta
+    ]
+
+
+def _fail(item, error):
+    return {'id': item['id'], 'action': item.get('action'), 'ok': False, 'error': error}
+
+
+def _ok(item, obj):
+    return {'id': item['id'], 'action': item['action'], 'ok': True, 'status': obj.status}
+
+
+def review_blood_requests(items):
+    """
+    Approve or reject blood requests; approvals with ``blood_bank_id`` debit
+    that bank's stock of the requested group.
+    """
+    now = timezone.now()
+    with transaction.atomic(using=router.db_for_write(BloodRequest)):
+        requests = BloodRequest.objects.select_for_update().in_bulk([item['id'] for item in items])
+        bank_ids = {_bank_id(item) for item in items} - {None, False}
+        known_banks = set(BloodBank.objects.filter(pk__in=bank_ids).values_list('pk', flat=True))
+        if known_banks:
+            # Expired lots must not count towards what the banks can issue
+            retire_expired(
+                blood_bank_ids=known_banks,
+                blood_groups={blood_request.blood_group for blood_request in requests.values()},
+            )
+        inventory = _lock_inventory({
+            (_bank_id(item), requests[item['id']].blood_group)
+            for item in items
+            if item['id'] in requests and _bank_id(item) in known_banks
+        })
+        available = {key: row.units_available for key, row in inventory.items()}
+
+        results = []
+        changed = []
+        deltas = defaultdict(int)
+        allocations = []
+        for item in items:
+            blood_request = requests.get(item['id'])
+            action = item.get('action')
+            bank_id = _bank_id(item)
+            if blood_request is None:
+                results.append(_fail(item, 'Blood request not found'))
+                continue
+            if action not in ACTIONS:
+                results.append(_fail(item, 'Invalid action. Use "approve" or "reject"'))
+                continue
+            if blood_request.status != 'pending':
+                results.append(_fail(item, f'Blood request is already {blood_request.status}'))
+                continue
+
+            if action == 'approve':
+                if blood_request.units_required < 1:
+                    results.append(_fail(item, 'A blood request must be for at least one unit'))
+                    continue
+                if bank_id is False or (bank_id is not None and bank_id not in known_banks):
+                    results.append(_fail(item, 'Blood bank not found'))
+                    continue
+                if bank_id is not None:
+                    key = (bank_id, blood_request.blood_group)
+                    if key not in available:
+                        results.append(_fail(
+                            item, f'No inventory found for {blood_request.blood_group} in selected blood bank'
+                        ))
+                        continue
+                    if available[key] < blood_request.units_required:
+                        results.append(_fail(
+                            item,
+                            f'Insufficient blood units. Available: {available[key]}, '
+                            f'Required: {blood_request.units_required}',
+                        ))
+                        continue
+                    available[key] -= blood_request.units_required
+                    deltas[key] -= blood_request.units_required
+                    blood_request.blood_bank_id = bank_id
+                    allocations.append(BloodAllocation(
+                        blood_request=blood_request, blood_bank_id=bank_id,
+                        blood_group=blood_request.blood_group, units=blood_request.units_required,
+                    ))
+                blood_request.status = 'approved'
+            else:
+                blood_request.status = 'rejected'
+
+            if item.get('admin_notes'):
+                blood_request.admin_notes = item['admin_notes']
+            blood_request.updated_at = now
+            changed.append(blood_request)
+            results.append(_ok(item, blood_request))
+
+        inventory_changes = _apply_deltas(inventory, deltas, now)
+        BloodRequest.objects.bulk_update(changed, ['status', 'blood_bank', 'admin_notes', 'updated_at'])
+        BloodAllocation.objects.bulk_create(allocations)
+    return results, inventory_changes
+
+
+def review_donations(items):
+    """
+    Approve or reject donations. An approval with a ``donation_date``
+    completes the donation, credits ``blood_bank_id`` and updates the
+    donor's ``last_donation_date``, as the single-item endpoint does.
+    """
+    now = timezone.now()
+    with transaction.atomic(using=router.db_for_write(Donation)):
+        donations = Donation.objects.select_for_update().in_bulk([item['id'] for item in items])
+        bank_ids = {_bank_id(item) for item in items} - {None, False}
+        known_banks = set(BloodBank.objects.filter(pk__in=bank_ids).values_list('pk', flat=True))
+
+        results = []
+        changed = []
+        deltas = defaultdict(int)
+        lots = []
+        last_dates = {}
+        for item in items:
+            donation = donations.get(item['id'])
+            action = item.get('action')
+            bank_id = _bank_id(item)
+            if donation is None:
+                results.append(_fail(item, 'Donation not found'))
+                continue
+            if donation.status == 'completed':
+                results.append(_fail(item, 'Donation is already completed'))
+                continue
+            if action not in ACTIONS:
+                results.append(_fail(item, 'Invalid action. Use "approve" or "reject"'))
+                continue
+
+            if action == 'approve':
+                donation_date = None
+                if item.get('donation_date'):
+                    donation_date = parse_date(str(item['donation_date']))
+                    if donation_date is None:
+                        results.append(_fail(item, 'Invalid donation_date. Use YYYY-MM-DD'))
+                        continue
+                if bank_id is False or (bank_id is not None and bank_id not in known_banks):
+                    results.append(_fail(item, 'Blood bank not found'))
+                    continue
+                try:
+                    component = get_component(item.get('component'))
+                except LotError as e:
+                    results.append(_fail(item, str(e)))
+                    continue
+
+                donation.status = 'approved'
+                if bank_id is not None:
+                    donation.blood_bank_id = bank_id
+                if donation_date is not None:
+                    donation.donation_date = donation_date
+                    donation.status = 'completed'
+                    if bank_id is not None:
+                        deltas[(bank_id, donation.blood_group)] += donation.units_donated
+                        lots.append(build_lot(
+                            bank_id, donation.blood_group, donation.units_donated,
+                            donation_date, component=component, donation=donation,
+                        ))
+                    if donation_date > last_dates.get(donation.donor_id, donation_date.min):
+                        last_dates[donation.donor_id] = donation_date
+            else:
+                donation.status = 'rejected'
+
+            if item.get('admin_notes'):
+                donation.admin_notes = item['admin_notes']
+            donation.updated_at = now
+            changed.append(donation)
+            results.append(_ok(item, donation))
+
+        # Credits may target (bank, group) pairs that have no row yet
+        BloodInventory.objects.bulk_create(
+            [
+                BloodInventory(blood_bank_id=bank_id, blood_group=group, units_available=0)
+                for bank_id, group in deltas
+            ],
+            ignore_conflicts=True,
+        )
+        inventory = _lock_inventory(set(deltas))
+        inventory_changes = _apply_deltas(inventory, deltas, now)
+        BloodUnitLot.objects.bulk_create(lots)
+
+        Donation.objects.bulk_update(
+            changed, ['status', 'blood_bank', 'donation_date', 'admin_notes', 'updated_at'],
+        )
+        profiles = list(DonorProfile.objects.filter(user_id__in=last_dates))
+        for profile in profiles:
+            profile.last_donation_date = last_dates[profile.user_id]
+            profile.updated_at = now
+        DonorProfile.objects.bulk_update(profiles, ['last_donation_date', 'updated_at'])
+    return results, inventory_changes
+
+
+def review_by_shard(review, items):
+    """
+    Run ``review`` over the items of each shard in turn, by the shard their
+    ids belong to, and return the results in the original item order.
+    """
+    by_shard = defaultdict(list)
+    for item in items:
+        by_shard[shard_for_pk(item['id'])].append(item)
+
+    results = {}
+    inventory_changes = []
+    for alias, shard_items in by_shard.items():
+        with use_shard(alias):
+            shard_results, shard_changes = review(shard_items)
+        results.update((result['id'], result) for result in shard_results)
+        inventory_changes.extend(shard_changes)
+    return [results[item['id']] for item in items], inventory_changes
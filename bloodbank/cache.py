@@ -0,0 +1,34 @@
+"""
+Cache keys for data derived from blood inventory.
+
+Every change to ``BloodInventory`` or ``BloodBank`` bumps the inventory
+version, so cached entries keyed on it go stale without explicit deletes.
+Code that changes stock with ``QuerySet.update()`` skips the signals and
+must call ``bump_inventory_version()`` itself.
+"""
+from django.core.cache import cache
+
+
+INVENTORY_VERSION_KEY = 'bloodbank:inventory-version'
+
+
+def get_inventory_version():
+    version = cache.get(INVENTORY_VERSION_KEY)
+    if version is None:
+        cache.add(INVENTORY_VERSION_KEY, 1, timeout=None)
+        version = cache.get(INVENTORY_VERSION_KEY, 1)
+    return version
+
+
+def bump_inventory_version():
+    try:
+        return cache.incr(INVENTORY_VERSION_KEY)
+    except ValueError:
+        # Key evicted or never set; any fresh value invalidates the old entries
+        cache.add(INVENTORY_VERSION_KEY, 2, timeout=None)
+        return cache.get(INVENTORY_VERSION_KEY, 2)
+
+
+def inventory_cache_key(name, *parts):
+    suffix = ':'.join(str(part).lower() for part in parts)
+    return f'bloodbank:{name}:v{get_inventory_version()}:{suffix}'
@@ -0,0 +1,175 @@
+"""
+Dashboard payloads built from independent sections.
+
+Each section is a function that runs its own queries. The sync dashboard
+views call them one after another. The async views run them all at once on
+a small thread pool, each thread with its own database connection, so a
+dashboard takes about as long as its slowest section rather than the sum.
+
+With regional shards, sections over sharded tables read every shard in
+parallel through ``scatter()`` and merge the per-shard results; a donor's
+own requests and donations come from their region alone.
+"""
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.db.models import Sum
+
+from accounts.models import DonorProfile
+from accounts.projections import DONOR_PROFILE_PROJECTION
+from blood_management.sharding import merge_rows, scatter, shard_for_user, use_shard
+from .lots import expired_units_by_group, expiring_units_by_group
+from .models import ArchivedBloodRequest, ArchivedDonation, BloodInventory, BloodRequest, Donation
+from .projections import BLOOD_REQUEST_PROJECTION, DONATION_PROJECTION
+
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+BLOOD_GROUPS = ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']
+
+
+def get_dashboard_setting(name, default=None):
+    return getattr(settings, 'DASHBOARDS', {}).get(name, default)
+
+
+def sum_by_key(results):
+    totals = {}
+    for result in results:
+        for key, value in result.items():
+            totals[key] = totals.get(key, 0) + value
+    return totals
+
+
+def recent(projection, queryset, limit=5):
+    ordering = ['-created_at']
+    rows = scatter(lambda: list(projection.values(queryset.order_by(*ordering))[:limit]))
+    return projection.to_dicts(merge_rows(rows.values(), ordering, limit))
+
+
+def total_donors():
+    return DonorProfile.objects.count()
+
+
+def total_blood_requests():
+    # Archived ones included
+    return sum(scatter(lambda: BloodRequest.objects.count() + ArchivedBloodRequest.objects.count()).values())
+
+
+def pending_requests():
+    return sum(scatter(lambda: BloodRequest.objects.filter(status='pending').count()).values())
+
+
+def total_donations():
+    return sum(scatter(lambda: Donation.objects.count() + ArchivedDonation.objects.count()).values())
+
+
+def shard_availability():
+    expired = expired_units_by_group()
+    # One GROUP BY over inventory_group_units_idx instead of a SUM per group
+    totals = dict(
+        BloodInventory.objects.order_by().values('blood_group')
+        .annotate(total=Sum('units_available')).values_list('blood_group', 'total')
+    )
+    return {
+        blood_group: max((totals.get(blood_group) or 0) - expired.get(blood_group, 0), 0)
+        for blood_group in totals
+    }
+
+
+def blood_availability():
+    """
+    Units per blood group, minus expired lots not yet swept.
+    """
+    totals = sum_by_key(scatter(shard_availability).values())
+    return {blood_group: totals.get(blood_group, 0) for blood_group in BLOOD_GROUPS}
+
+
+def expiring_soon():
+    return sum_by_key(scatter(expiring_units_by_group).values())
+
+
+def recent_requests():
+    return recent(BLOOD_REQUEST_PROJECTION, BloodRequest.objects.all())
+
+
+def recent_donations():
+    return recent(DONATION_PROJECTION, Donation.objects.all())
+
+
+def donor_profile(user):
+    row = DONOR_PROFILE_PROJECTION.values(DonorProfile.objects.filter(user=user)).first()
+    return DONOR_PROFILE_PROJECTION.to_dict(row) if row is not None else None
+
+
+def my_requests(user):
+    with use_shard(shard_for_user(user)):
+        return BLOOD_REQUEST_PROJECTION.serialize(BloodRequest.objects.filter(requester=user).order_by('-created_at'))
+
+
+def my_donations(user):
+    with use_shard(shard_for_user(user)):
+        return DONATION_PROJECTION.serialize(Donation.objects.filter(donor=user).order_by('-created_at'))
+
+
+def admin_sections():
+    """
+    ``(key, section)`` pairs in response order.
+    """
+    return [
+        ('total_donors', total_donors),
+        ('total_blood_requests', total_blood_requests),
+        ('pending_requests', pending_requests),
+        ('total_donations', total_donations),
+        ('blood_availability', blood_availability),
+        ('expiring_soon', expiring_soon),
+        ('recent_requests', recent_requests),
+        ('recent_donations', recent_donations),
+    ]
+
+
+def donor_sections(user):
+    return [
+        ('donor_profile', partial(donor_profile, user)),
+        ('blood_availability', blood_availability),
+        ('my_requests', partial(my_requests, user)),
+        ('my_donations', partial(my_donations, user)),
+    ]
+
+
+def build(sections):
+    return {key: section() for key, section in sections}
+
+
+def get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=get_dashboard_setting('WORKERS', 8), thread_name_prefix='dashboard',
+            )
+    return _executor
+
+
+def _run_section(section):
+    # Pool threads keep their connection between requests, within CONN_MAX_AGE
+    close_old_connections()
+    try:
+        return section()
+    finally:
+        close_old_connections()
+
+
+async def abuild(sections):
+    """
+    Run every section concurrently and assemble the same dict as ``build``.
+    """
+    run = sync_to_async(_run_section, thread_sensitive=False, executor=get_executor())
+    results = await asyncio.gather(*(run(section) for _, section in sections))
+    return {key: result for (key, _), result in zip(sections, results)}
@@ -0,0 +1,118 @@
+"""
+``Idempotency-Key`` support for write endpoints.
+
+The first request with a key inserts a placeholder row, which doubles as a
+lock: concurrent duplicates hit the unique constraint and get a 409 straight
+away instead of running the view again. Completed responses are replayed
+until they expire. Server errors release the key so it can be retried.
+"""
+import functools
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.utils.encoders import JSONEncoder
+
+from .models import IdempotencyRecord
+
+
+HEADER = 'Idempotency-Key'
+
+# Inserts attempted when the key is released between our insert and lookup
+CLAIM_ATTEMPTS = 3
+
+
+def get_idempotency_setting(name, default=None):
+    return getattr(settings, 'IDEMPOTENCY', {}).get(name, default)
+
+
+def request_fingerprint(request):
+    if hasattr(request.data, 'lists'):
+        data = {key: values for key, values in request.data.lists()}
+    else:
+        data = request.data
+    payload = json.dumps([request.method, request.path, data], sort_keys=True, cls=JSONEncoder)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def claim(user, key, fingerprint):
+    """
+    Insert the placeholder row. Returns ``None`` if this request now owns the
+    key, otherwise the row already holding it.
+    """
+    now = timezone.now()
+    ttl = get_idempotency_setting('TTL', timedelta(hours=24))
+    IdempotencyRecord.objects.filter(user=user, key=key, expires_at__lte=now).delete()
+    for attempt in range(CLAIM_ATTEMPTS):
+        try:
+            with transaction.atomic():
+                IdempotencyRecord.objects.create(
+                    user=user, key=key, fingerprint=fingerprint, expires_at=now + ttl,
+                )
+            return None
+        except IntegrityError:
+            existing = IdempotencyRecord.objects.filter(user=user, key=key).first()
+            if existing is not None:
+                return existing
+            if attempt == CLAIM_ATTEMPTS - 1:
+                # Not the (user, key) constraint, or the key keeps being released
+                raise
+            # Released between our insert and the lookup; try to take it again
+
+
+def replay(record):
+    data = json.loads(record.response_body) if record.response_body else None
+    response = Response(data, status=record.status_code)
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def idempotent(view):
+    """
+    Make a DRF view or view method honour the ``Idempotency-Key`` header.
+
+    Requests without the header run normally.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        request = next(arg for arg in args if isinstance(arg, Request))
+        key = request.headers.get(HEADER)
+        if not key or not request.user.is_authenticated:
+            return view(*args, **kwargs)
+        if len(key) > 255:
+            return Response({'error': f'{HEADER} must be at most 255 characters'},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        fingerprint = request_fingerprint(request)
+        existing = claim(request.user, key, fingerprint)
+        if existing is not None:
+            if existing.fingerprint != fingerprint:
+                return Response({'error': f'{HEADER} was already used for a different request'},
+                                status=status.HTTP_422_UNPROCESSABLE_ENTITY)
+            if existing.status_code is None:
+                return Response({'error': f'A request with this {HEADER} is still being processed'},
+                                status=status.HTTP_409_CONFLICT)
+            return replay(existing)
+
+        try:
+            response = view(*args, **kwargs)
+        except Exception:
+            IdempotencyRecord.objects.filter(user=request.user, key=key).delete()
+            raise
+
+        if response.status_code >= 500:
+            IdempotencyRecord.objects.filter(user=request.user, key=key).delete()
+        else:
+            IdempotencyRecord.objects.filter(user=request.user, key=key).update(
+                status_code=response.status_code,
+                response_body=json.dumps(response.data, cls=JSONEncoder, separators=(',', ':')),
+            )
+        return response
+
+    return wrapper
@@ -0,0 +1,320 @@
+"""
+Expiry-tracked lots behind the per-group inventory totals.
+
+Completed donations become lots whose expiry follows from the component's
+shelf life; approvals draw lots down first-expiry-first-out; expired lots
+are retired in batches. Every change adjusts
+``BloodInventory.units_available`` with one UPDATE per (bank, group), so
+the totals are never recomputed from the lots.
+
+Holds pin units of specific lots (``units_reserved``), which approvals
+never draw and fulfilling the hold issues. When a lot expires, its pinned
+units come off the holds and ``units_reserved`` rather than off
+``units_available``.
+
+Locks are always taken holds first, then inventory rows, then lots, as the
+reservation and approval paths already do.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Greatest
+from django.utils import timezone
+
+from .cache import bump_inventory_version
+from .models import BloodInventory, BloodUnitLot, Reservation, ReservationLot
+
+
+COMPONENTS = [value for value, _ in BloodUnitLot.COMPONENT_CHOICES]
+
+DEFAULT_SHELF_LIFE = {
+    'whole_blood': timedelta(days=35),
+    'red_cells': timedelta(days=42),
+    'platelets': timedelta(days=5),
+    'plasma': timedelta(days=365),
+}
+
+
+class LotError(Exception):
+    pass
+
+
+def get_lot_setting(name, default=None):
+    return getattr(settings, 'BLOOD_LOTS', {}).get(name, default)
+
+
+def get_component(value=None):
+    component = value or get_lot_setting('DEFAULT_COMPONENT', 'whole_blood')
+    if component not in COMPONENTS:
+        raise LotError(f'Invalid component. Use one of: {", ".join(COMPONENTS)}')
+    return component
+
+
+def expiry_for(component, collection_date):
+    if collection_date is None:
+        return None
+    shelf_life = get_lot_setting('SHELF_LIFE', {}).get(component, DEFAULT_SHELF_LIFE[component])
+    return collection_date + shelf_life
+
+
+def build_lot(blood_bank_id, blood_group, units, collection_date, component=None, donation=None):
+    """
+    Unsaved lot for ``units`` collected on ``collection_date``. The caller
+    credits ``units_available`` as it always has.
+    """
+    component = get_component(component)
+    return BloodUnitLot(
+        blood_bank_id=blood_bank_id,
+        blood_group=blood_group,
+        component=component,
+        donation=donation,
+        collection_date=collection_date,
+        expiry_date=expiry_for(component, collection_date),
+        units_received=units,
+        units_remaining=units,
+    )
+
+
+def expired_lots(today=None):
+    # Matches lot_live_expiry_idx, so live stock is never scanned
+    return BloodUnitLot.objects.filter(units_remaining__gt=0, expiry_date__lt=today or timezone.localdate())
+
+
+def free_lots(blood_bank_id, blood_group, units, today=None):
+    """
+    The bank's unexpired lots of ``blood_group`` with unpinned units,
+    earliest expiry first, locked.
+    """
+    today = today or timezone.localdate()
+    # Every lot has at least one free unit, so no more than ``units`` lots are needed
+    return list(
+        BloodUnitLot.objects.select_for_update()
+        .filter(blood_bank_id=blood_bank_id, blood_group=blood_group, units_remaining__gt=F('units_reserved'))
+        .filter(Q(expiry_date__gte=today) | Q(expiry_date__isnull=True))
+        .order_by(F('expiry_date').asc(nulls_last=True), 'pk')[:units]
+    )
+
+
+def _take(lots, units):
+    taken = []
+    remaining = units
+    for lot in lots:
+        if remaining == 0:
+            break
+        take = min(remaining, lot.units_remaining - lot.units_reserved)
+        taken.append((lot, take))
+        remaining -= take
+    return taken
+
+
+def draw_down(blood_bank_id, blood_group, units, today=None):
+    """
+    Take ``units`` from the bank's unexpired, unpinned lots of
+    ``blood_group``, earliest expiry first, and return ``[(lot_id, units), ...]``.
+
+    Only lots change here; the caller has already debited
+    ``units_available``. Whatever the lots can't cover came from untracked
+    stock.
+    """
+    taken = _take(free_lots(blood_bank_id, blood_group, units, today), units)
+    for lot, take in taken:
+        lot.units_remaining -= take
+        if lot.units_remaining == 0:
+            lot.retired_at = timezone.now()
+    BloodUnitLot.objects.bulk_update([lot for lot, _ in taken], ['units_remaining', 'retired_at'])
+    return [(lot.pk, take) for lot, take in taken]
+
+
+def pin(reservation, today=None):
+    """
+    Pin ``reservation.units`` of the bank's free lots to the hold, earliest
+    expiry first, and return ``[(lot_id, units), ...]``. The caller has
+    already moved the units to ``units_reserved``.
+    """
+    taken = _take(free_lots(reservation.blood_bank_id, reservation.blood_group, reservation.units, today),
+                  reservation.units)
+    for lot, take in taken:
+        lot.units_reserved += take
+    BloodUnitLot.objects.bulk_update([lot for lot, _ in taken], ['units_reserved'])
+    ReservationLot.objects.bulk_create([
+        ReservationLot(reservation=reservation, lot=lot, units=take) for lot, take in taken
+    ])
+    return [(lot.pk, take) for lot, take in taken]
+
+
+def unpin(reservation_ids, issue=0):
+    """
+    Issue ``issue`` units from the lots pinned to the holds
+    ``reservation_ids`` and free the rest, closing their pins. Returns
+    ``[(lot_id, units issued), ...]``; units the pins can't cover came from
+    untracked stock.
+    """
+    pinned_to = ReservationLot.objects.filter(reservation_id__in=reservation_ids)
+    pins = defaultdict(int)
+    for lot_id, units in pinned_to.values_list('lot_id', 'units'):
+        pins[lot_id] += units
+    if not pins:
+        return []
+    lots = list(
+        BloodUnitLot.objects.select_for_update().filter(pk__in=pins)
+        .order_by(F('expiry_date').asc(nulls_last=True), 'pk')
+    )
+    now = timezone.now()
+    issued = []
+    remaining = issue
+    for lot in lots:
+        pinned = min(pins[lot.pk], lot.units_reserved)
+        take = min(remaining, pinned)
+        lot.units_reserved -= pinned
+        lot.units_remaining -= take
+        if take:
+            issued.append((lot.pk, take))
+            remaining -= take
+        if lot.units_remaining == 0:
+            lot.retired_at = now
+    BloodUnitLot.objects.bulk_update(lots, ['units_remaining', 'units_reserved', 'retired_at'])
+    pinned_to.delete()
+    return issued
+
+
+def retire_expired(today=None, batch_size=None, blood_bank_ids=None, blood_groups=None):
+    """
+    Retire one batch of expired lots, oldest expiry first, and debit their
+    units from the inventory totals. Returns ``{(bank_id, group): units}``.
+
+    ``blood_bank_ids`` and ``blood_groups`` narrow it to the stock an
+    approval is about to read; without ``batch_size`` every match goes.
+    """
+    now = timezone.now()
+    candidates = expired_lots(today)
+    if blood_bank_ids:
+        candidates = candidates.filter(blood_bank_id__in=blood_bank_ids)
+    if blood_groups:
+        candidates = candidates.filter(blood_group__in=blood_groups)
+    candidates = candidates.order_by('expiry_date', 'pk').values_list('pk', 'blood_bank_id', 'blood_group')
+    if batch_size:
+        candidates = candidates[:batch_size]
+
+    using = router.db_for_write(BloodUnitLot)
+    with transaction.atomic(using=using):
+        rows = list(candidates)
+        if not rows:
+            return {}
+        lot_ids = [pk for pk, _, _ in rows]
+        # The holds pinning these lots are locked before the inventory, as fulfil and release do
+        list(
+            Reservation.objects.select_for_update()
+            .filter(pk__in=ReservationLot.objects.filter(lot_id__in=lot_ids).values('reservation_id'))
+            .order_by('pk').values_list('pk')
+        )
+        keys = {(bank_id, group) for _, bank_id, group in rows}
+        key_filter = Q()
+        for bank_id, group in keys:
+            key_filter |= Q(blood_bank_id=bank_id, blood_group=group)
+        list(BloodInventory.objects.select_for_update().filter(key_filter).order_by('pk').values_list('pk'))
+
+        # Re-read under the lock; a concurrent draw may have emptied some lots
+        lots = list(
+            BloodUnitLot.objects.select_for_update()
+            .filter(pk__in=lot_ids, units_remaining__gt=0).order_by('pk')
+        )
+        expired = defaultdict(int)
+        held = defaultdict(int)
+        for lot in lots:
+            key = (lot.blood_bank_id, lot.blood_group)
+            expired[key] += lot.units_remaining
+            held[key] += lot.units_reserved
+            lot.units_expired += lot.units_remaining
+            lot.units_remaining = lot.units_reserved = 0
+            lot.retired_at = now
+        BloodUnitLot.objects.bulk_update(lots, ['units_remaining', 'units_reserved', 'units_expired', 'retired_at'])
+        if any(held.values()):
+            shrink_holds([lot.pk for lot in lots], now)
+
+        for key, units in expired.items():
+            bank_id, group = key
+            # Totals edited by hand may already be below the tracked units
+            BloodInventory.objects.filter(blood_bank_id=bank_id, blood_group=group).update(
+                units_available=Greatest(F('units_available') - (units - held[key]), 0),
+                units_reserved=Greatest(F('units_reserved') - held[key], 0),
+                last_updated=now,
+            )
+        if expired:
+            transaction.on_commit(bump_inventory_version, using=using)
+    return dict(expired)
+
+
+def shrink_holds(lot_ids, now):
+    """
+    Take the units pinned in the expired ``lot_ids`` off the holds that
+    pinned them; a hold left with nothing is closed as expired.
+    """
+    pins = ReservationLot.objects.filter(lot_id__in=lot_ids)
+    lost = defaultdict(int)
+    for reservation_id, units in pins.values_list('reservation_id', 'units'):
+        lost[reservation_id] += units
+    for reservation_id, units in sorted(lost.items()):
+        Reservation.objects.filter(pk=reservation_id).update(units=Greatest(F('units') - units, 0), updated_at=now)
+    Reservation.objects.filter(pk__in=list(lost), status='held', units=0).update(status='expired')
+    pins.delete()
+
+
+def sweep(today=None, batch_size=None, max_batches=None, on_batch=None):
+    """
+    Retire expired lots batch by batch, each in its own transaction, until
+    none are left or ``max_batches`` have run. Returns the units retired.
+    """
+    batch_size = batch_size or get_lot_setting('SWEEP_BATCH_SIZE', 500)
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        expired = retire_expired(today, batch_size)
+        batches += 1
+        if not expired:
+            break
+        total += sum(expired.values())
+        if on_batch is not None:
+            on_batch(expired, total)
+    return total
+
+
+def expired_units_by_group(today=None):
+    """
+    Units in expired lots the sweeper hasn't retired yet, per blood group.
+    Only unpinned units count; pinned ones are in ``units_reserved``, not
+    ``units_available``.
+    """
+    return dict(
+        expired_lots(today).order_by().values('blood_group')
+        .annotate(total=Sum(F('units_remaining') - F('units_reserved'))).values_list('blood_group', 'total')
+    )
+
+
+def expired_units_by_bank(blood_bank_ids, today=None):
+    """
+    Like ``expired_units_by_group``, per ``(bank_id, blood_group)``.
+    """
+    return {
+        (bank_id, group): total
+        for bank_id, group, total in expired_lots(today).filter(blood_bank_id__in=blood_bank_ids)
+        .order_by().values('blood_bank_id', 'blood_group')
+        .annotate(total=Sum(F('units_remaining') - F('units_reserved')))
+        .values_list('blood_bank_id', 'blood_group', 'total')
+    }
+
+
+def expiring_units_by_group(days=None, today=None):
+    """
+    Units in live lots expiring within ``days``, per blood group.
+    """
+    today = today or timezone.localdate()
+    days = get_lot_setting('EXPIRY_WARNING_DAYS', 7) if days is None else days
+    return dict(
+        BloodUnitLot.objects.filter(
+            units_remaining__gt=0, expiry_date__gte=today, expiry_date__lte=today + timedelta(days=days),
+        ).order_by().values('blood_group').annotate(total=Sum('units_remaining'))
+        .values_list('blood_group', 'total')
+    )
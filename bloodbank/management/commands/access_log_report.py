@@ -0,0 +1,185 @@
+import glob
+import gzip
+import json
+import os
+import re
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+
+from blood_management.access_log import backups, get_access_log_setting
+from blood_management.metrics import percentile
+
+
+_duration_re = re.compile(r'^(\d+)([smhd])$')
+_units = {'s': 'seconds', 'm': 'minutes', 'h': 'hours', 'd': 'days'}
+
+
+def parse_moment(value, now):
+    """
+    ``15m``/``2h``/``7d`` before ``now``, or an ISO 8601 timestamp.
+    """
+    match = _duration_re.match(value)
+    if match:
+        return now - timedelta(**{_units[match.group(2)]: int(match.group(1))})
+    try:
+        moment = datetime.fromisoformat(value)
+    except ValueError:
+        raise CommandError(f'Expected a duration like 15m/2h/7d or an ISO timestamp, got {value!r}')
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def open_log(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8')
+    return open(path, encoding='utf-8')
+
+
+class RouteStats:
+    def __init__(self):
+        self.durations = []
+        self.client_errors = 0
+        self.server_errors = 0
+        self.queries = 0
+        self.bytes = 0
+
+    def add(self, record):
+        self.durations.append(record['duration_ms'])
+        status = record.get('status') or 0
+        if status >= 500:
+            self.server_errors += 1
+        elif status >= 400:
+            self.client_errors += 1
+        self.queries += record.get('queries') or 0
+        self.bytes += record.get('bytes') or 0
+
+    def summary(self):
+        timings = sorted(self.durations)
+        count = len(timings)
+        return {
+            'count': count,
+            'error_rate': round(self.server_errors / count, 4),
+            'client_error_rate': round(self.client_errors / count, 4),
+            'p50_ms': percentile(timings, 0.5),
+            'p95_ms': percentile(timings, 0.95),
+            'p99_ms': percentile(timings, 0.99),
+            'max_ms': timings[-1],
+            'avg_queries': round(self.queries / count, 1),
+            'avg_bytes': round(self.bytes / count),
+        }
+
+
+class Command(BaseCommand):
+    help = (
+        'Summarise the JSONL access log per route over a time window: request '
+        'count, p50/p95/p99 latency, error rates, queries and bytes per call. '
+        'Reads rotated and gzipped files line by line.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*',
+                            help='Log files or globs (default: ACCESS_LOG["PATH"] with its rotated copies)')
+        parser.add_argument('--since', default=None, help='Start of the window, e.g. 15m, 2h, 7d or an ISO timestamp')
+        parser.add_argument('--until', default=None, help='End of the window, same formats')
+        parser.add_argument('--route', action='append', default=[], help='Only these routes (repeatable)')
+        parser.add_argument('--method', action='append', default=[], help='Only these HTTP methods (repeatable)')
+        parser.add_argument('--sort', choices=('count', 'p99', 'errors'), default='count')
+        parser.add_argument('--limit', type=int, default=None, help='Show only the first N routes')
+        parser.add_argument('--json', action='store_true', help='Print the summary as JSON')
+
+    def handle(self, *args, **options):
+        now = timezone.now()
+        since = parse_moment(options['since'], now) if options['since'] else None
+        until = parse_moment(options['until'], now) if options['until'] else None
+        routes = set(options['route'])
+        methods = {method.upper() for method in options['method']}
+
+        stats = defaultdict(RouteStats)
+        malformed = dropped = 0
+        for path in self.log_files(options['paths']):
+            with open_log(path) as handle:
+                for line in handle:
+                    try:
+                        record = json.loads(line)
+                        moment = datetime.fromisoformat(record['ts'])
+                    except (ValueError, KeyError, TypeError):
+                        malformed += 1
+                        continue
+                    if (since and moment < since) or (until and moment >= until):
+                        continue
+                    if 'dropped' in record:
+                        dropped += record['dropped']
+                        continue
+                    if routes and record.get('route') not in routes:
+                        continue
+                    if methods and record.get('method') not in methods:
+                        continue
+                    try:
+                        stats[record.get('route', 'unresolved')].add(record)
+                    except (KeyError, TypeError):
+                        malformed += 1
+
+        summary = {route: route_stats.summary() for route, route_stats in stats.items()}
+        sort_key = {
+            'count': lambda item: item[1]['count'],
+            'p99': lambda item: item[1]['p99_ms'],
+            'errors': lambda item: item[1]['error_rate'],
+        }[options['sort']]
+        ordered = sorted(summary.items(), key=sort_key, reverse=True)[:options['limit']]
+
+        if options['json']:
+            self.stdout.write(json.dumps({
+                'since': since.isoformat() if since else None,
+                'until': until.isoformat() if until else None,
+                'routes': dict(ordered),
+                'dropped': dropped,
+                'malformed': malformed,
+            }, indent=2))
+            return
+
+        self.stdout.write(
+            f'  {"route":<32}{"count":>8}{"5xx %":>8}{"4xx %":>8}'
+            + ''.join(f'{name:>9}' for name in ('p50 ms', 'p95 ms', 'p99 ms', 'max ms'))
+            + f'{"queries":>9}{"bytes":>9}'
+        )
+        for route, row in ordered:
+            self.stdout.write(
+                f'  {route:<32}{row["count"]:>8}{row["error_rate"] * 100:>8.1f}{row["client_error_rate"] * 100:>8.1f}'
+                + ''.join(f'{row[name]:>9.1f}' for name in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms'))
+                + f'{row["avg_queries"]:>9.1f}{row["avg_bytes"]:>9}'
+            )
+        total = sum(row['count'] for row in summary.values())
+        self.stdout.write(f'{total} requests on {len(summary)} routes')
+        if dropped:
+            self.stdout.write(self.style.WARNING(f'{dropped} records were dropped by a full buffer'))
+        if malformed:
+            self.stdout.write(self.style.WARNING(f'Skipped {malformed} malformed lines'))
+
+    def log_files(self, patterns):
+        """
+        Existing files matching ``patterns``, each base log preceded by its
+        rotated copies so records come out roughly oldest first.
+        """
+        if not patterns:
+            path = get_access_log_setting('PATH')
+            if not path:
+                raise CommandError('No log files given and ACCESS_LOG["PATH"] is not set')
+            backup_count = get_access_log_setting('BACKUP_COUNT', 5)
+            patterns = [
+                name
+                for base in sorted(glob.glob(str(path).replace('{pid}', '*').replace('{worker}', '*')))
+                for name in [*backups(base, backup_count), base]
+            ] or [str(path)]
+
+        files = []
+        for pattern in patterns:
+            for name in sorted(glob.glob(pattern)) if glob.has_magic(pattern) else [pattern]:
+                if os.path.isfile(name) and name not in files:
+                    files.append(name)
+        if not files:
+            raise CommandError(f'No access log found at {", ".join(patterns)}')
+        return files
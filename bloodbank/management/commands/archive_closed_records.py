@@ -0,0 +1,54 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+
+from blood_management.sharding import is_sharded, shard_aliases, use_shard
+from bloodbank.archival import SPECS, archivable, archive, conflicting, get_cutoff
+
+
+class Command(BaseCommand):
+    help = (
+        'Move closed blood requests and donations older than ARCHIVAL["CLOSED_AFTER"] '
+        'into the archive tables, one batch per transaction, on every shard. Safe to '
+        'interrupt and rerun.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--older-than-days', type=int, default=None,
+                            help='Override ARCHIVAL["CLOSED_AFTER"]')
+        parser.add_argument('--batch-size', type=int, default=None)
+        parser.add_argument('--max-batches', type=int, default=None,
+                            help='Stop after this many batches per table')
+        parser.add_argument('--dry-run', action='store_true', help='Only count the rows that would move')
+
+    def handle(self, *args, **options):
+        older_than = None
+        if options['older_than_days'] is not None:
+            older_than = timedelta(days=options['older_than_days'])
+        cutoff = get_cutoff(older_than)
+
+        for alias in shard_aliases():
+            with use_shard(alias):
+                self.archive_shard(cutoff, options, prefix=f'{alias}: ' if is_sharded() else '')
+
+    def archive_shard(self, cutoff, options, prefix=''):
+        for spec in SPECS.values():
+            if options['dry_run']:
+                count = archivable(spec, cutoff).count()
+                self.stdout.write(f'{prefix}{spec.label}: {count} rows closed before {cutoff:%Y-%m-%d}')
+                continue
+
+            def report(moved, total, label=spec.label):
+                if options['verbosity'] >= 2:
+                    self.stdout.write(f'{prefix}{label}: moved {moved} (total {total})')
+
+            total = archive(
+                spec, cutoff, batch_size=options['batch_size'],
+                max_batches=options['max_batches'], on_batch=report,
+            )
+            self.stdout.write(self.style.SUCCESS(f'{prefix}{spec.label}: archived {total} rows'))
+            stuck = conflicting(spec, cutoff).count()
+            if stuck:
+                self.stdout.write(self.style.WARNING(
+                    f'{prefix}{spec.label}: {stuck} rows kept because their id is already archived'
+                ))
@@ -0,0 +1,112 @@
+import asyncio
+import statistics
+import time
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.db.backends.signals import connection_created
+from django.test import AsyncClient, Client
+
+from accounts.models import DonorProfile, User
+from blood_management.authentication import token_pair
+from blood_management.throttling import get_throttle_setting
+from bloodbank import dashboards
+from bloodbank.management.sample_data import create_sample_data
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the sync dashboards, which query their sections one after another, '
+        'with the async ones, which query them concurrently. Runs on a freshly '
+        'migrated test database, since the concurrent sections read it over '
+        'separate connections.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sample', type=int, default=500,
+                            help='Synthetic rows per model to create first')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--latency-ms', type=float, default=0,
+                            help='Add this much simulated network round trip to every query, '
+                                 'as with a database on another host')
+
+    def handle(self, *args, **options):
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True)
+        try:
+            self.run(options)
+        finally:
+            connection_created.disconnect(self.add_latency_wrapper)
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, options):
+        create_sample_data(options['sample'])
+        admin = User.objects.create(username='dashboard-benchmark-admin', role='admin', is_staff=True)
+        donor = User.objects.create(username='dashboard-benchmark-donor', role='donor')
+        DonorProfile.objects.create(user=donor, blood_group='A+', city='Pune')
+
+        self.latency = options['latency_ms'] / 1000
+        if self.latency:
+            connection_created.connect(self.add_latency_wrapper)
+            self.add_latency_wrapper(connection=connection)
+
+        repeat = options['repeat']
+        self.stdout.write(
+            f'{options["sample"]} sample rows, {options["latency_ms"]:g} ms added per query, '
+            f'median of {repeat} runs in ms'
+        )
+        for label, sections, user, url in (
+            ('admin', dashboards.admin_sections(), admin, '/api/dashboard/admin/'),
+            ('donor', dashboards.donor_sections(donor), donor, '/api/dashboard/donor/'),
+        ):
+            self.stdout.write(self.style.MIGRATE_HEADING(f'{label} dashboard'))
+            slowest = 0
+            for key, section in sections:
+                elapsed = self.time(section, repeat)
+                slowest = max(slowest, elapsed)
+                self.stdout.write(f'  section {key:<30} {elapsed:8.2f}')
+
+            sequential = self.time(lambda: dashboards.build(sections), repeat)
+            concurrent = self.time(lambda: asyncio.run(dashboards.abuild(sections)), repeat)
+            self.stdout.write(f'  sections one after another         {sequential:8.2f}')
+            self.stdout.write(
+                f'  sections concurrently              {concurrent:8.2f}  '
+                f'({sequential / concurrent:.1f}x, slowest section {slowest:.2f})'
+            )
+
+            headers = {'Authorization': f'Bearer {token_pair(user)["access"]}'}
+            sync_client = Client()
+            async_client = AsyncClient()
+            sync_view = self.time(lambda: self.get(sync_client, url, headers), repeat)
+            async_view = self.time(lambda: asyncio.run(self.aget(async_client, f'{url}async/', headers)), repeat)
+            self.stdout.write(f'  GET {url:<30} {sync_view:8.2f}  (WSGI handler)')
+            self.stdout.write(f'  GET {url + "async/":<30} {async_view:8.2f}  (ASGI handler)')
+
+    def add_latency_wrapper(self, sender=None, connection=None, **kwargs):
+        def delay(execute, sql, params, many, context):
+            time.sleep(self.latency)
+            return execute(sql, params, many, context)
+        connection.execute_wrappers.append(delay)
+
+    def reset_throttles(self):
+        caches[get_throttle_setting('CACHE', 'default')].clear()
+
+    def get(self, client, url, headers):
+        self.reset_throttles()
+        response = client.get(url, headers=headers)
+        assert response.status_code == 200, response.content
+
+    async def aget(self, client, url, headers):
+        self.reset_throttles()
+        response = await client.get(url, headers=headers)
+        assert response.status_code == 200, response.content
+
+    def time(self, func, repeat):
+        func()  # warm-up
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
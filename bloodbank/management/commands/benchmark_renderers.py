@@ -0,0 +1,78 @@
+import gzip
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+
+from accounts.models import DonorProfile
+from accounts.serializers import DonorProfileSerializer
+from blood_management import renderers
+from bloodbank.management.sample_data import create_sample_data
+from bloodbank.models import BloodInventory, BloodRequest, Donation
+from bloodbank.serializers import BloodInventorySerializer, BloodRequestSerializer, DonationSerializer
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare the stdlib JSON renderer with the fast renderer, plus gzip/brotli '
+        'sizes, on payloads built by the real serializers.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sample', type=int, default=0,
+                            help='Create this many synthetic rows per model first (rolled back afterwards)')
+        parser.add_argument('--repeat', type=int, default=20)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['sample']:
+                create_sample_data(options['sample'])
+            payloads = self.build_payloads()
+            transaction.set_rollback(True)
+
+        self.stdout.write(f'Fast renderer backend: {renderers.BACKEND or "none (stdlib fallback)"}')
+        stdlib = JSONRenderer()
+        fast = renderers.FastJSONRenderer()
+
+        for label, data in payloads:
+            baseline, stdlib_time = self.time_render(stdlib, data, options['repeat'])
+            rendered, fast_time = self.time_render(fast, data, options['repeat'])
+            if rendered != baseline:
+                self.stdout.write(self.style.WARNING(f'{label}: fast renderer output differs from stdlib'))
+
+            sizes = f'raw {len(baseline)} B, gzip {len(gzip.compress(baseline, 6))} B'
+            if brotli is not None:
+                sizes += f', br {len(brotli.compress(baseline, quality=4))} B'
+            self.stdout.write(
+                f'{label}: stdlib {stdlib_time * 1000:.2f} ms, fast {fast_time * 1000:.2f} ms '
+                f'({stdlib_time / fast_time:.1f}x); {sizes}'
+            )
+
+    def build_payloads(self):
+        requests = BloodRequest.objects.select_related('requester', 'blood_bank').order_by('-created_at')
+        donations = Donation.objects.select_related('donor', 'blood_bank').order_by('-created_at')
+        return [
+            ('dashboard (all requests + donations)', {
+                'my_requests': BloodRequestSerializer(requests, many=True).data,
+                'my_donations': DonationSerializer(donations, many=True).data,
+            }),
+            ('blood-inventory page', BloodInventorySerializer(
+                BloodInventory.objects.select_related('blood_bank')[:10], many=True).data),
+            ('search-donors', DonorProfileSerializer(
+                DonorProfile.objects.select_related('user'), many=True).data),
+        ]
+
+    def time_render(self, renderer, data, repeat):
+        best = None
+        for _ in range(repeat):
+            start = time.perf_counter()
+            rendered = renderer.render(data)
+            elapsed = time.perf_counter() - start
+            best = elapsed if best is None else min(best, elapsed)
+        return rendered, best
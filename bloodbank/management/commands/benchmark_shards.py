@@ -0,0 +1,171 @@
+import statistics
+import time
+
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import Client
+
+from accounts.models import DonorProfile, User
+from blood_management.authentication import token_pair
+from blood_management.sharding import (
+    GLOBAL_DB, get_sharding_setting, is_sharded, shard_aliases, shard_for_pk, shard_for_state, use_shard,
+)
+from blood_management.throttling import get_throttle_setting
+from bloodbank import dashboards
+from bloodbank.allocation import compatible_groups, compatible_stock, inventory_snapshot
+from bloodbank.management.sample_data import create_sample_data
+from bloodbank.models import BloodRequest
+
+
+class Command(BaseCommand):
+    help = (
+        'Check regional sharding end to end and time the cross-region reads, '
+        'sequential per shard against scatter-gather. Runs on freshly migrated '
+        'test copies of every database in SHARDING, e.g. with '
+        '--settings=blood_management.settings_sharded.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sample', type=int, default=200,
+                            help='Synthetic rows per model to create in each shard')
+        parser.add_argument('--repeat', type=int, default=20)
+        parser.add_argument('--latency-ms', type=float, default=0,
+                            help='Add this much simulated network round trip to every query, '
+                                 'as with shards on other hosts')
+
+    def handle(self, *args, **options):
+        if not is_sharded():
+            raise CommandError(
+                'SHARDING["SHARDS"] is empty; run with --settings=blood_management.settings_sharded'
+            )
+        aliases = list(dict.fromkeys([GLOBAL_DB, *shard_aliases()]))
+        old_names = {}
+        try:
+            for alias in aliases:
+                old_names[alias] = connections[alias].settings_dict['NAME']
+                connections[alias].creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+            self.run(options)
+        finally:
+            connection_created.disconnect(self.add_latency_wrapper)
+            for alias, old_name in old_names.items():
+                connections[alias].creation.destroy_test_db(old_name, verbosity=0)
+
+    def run(self, options):
+        sample = options['sample']
+        states = {}
+        for alias in shard_aliases():
+            states[alias] = self.state_for(alias)
+            with use_shard(alias):
+                create_sample_data(sample, state=states[alias], prefix=alias)
+
+        # Before any scatter, as shard threads keep their test connections open
+        self.latency = options['latency_ms'] / 1000
+        if self.latency:
+            connection_created.connect(self.add_latency_wrapper)
+            for connection in connections.all():
+                self.add_latency_wrapper(connection=connection)
+
+        self.check_placement(sample, states)
+
+        repeat = options['repeat']
+        self.stdout.write(
+            f'{len(states)} shards of {sample} sample rows, {options["latency_ms"]:g} ms added per query, '
+            f'median of {repeat} runs in ms'
+        )
+        groups = compatible_groups('AB+')
+        for label, per_shard, gathered in (
+            ('blood availability', dashboards.shard_availability, dashboards.blood_availability),
+            ('compatible stock for AB+', lambda: inventory_snapshot(groups), lambda: compatible_stock('AB+')),
+            ('admin dashboard', None, lambda: dashboards.build(dashboards.admin_sections())),
+        ):
+            self.stdout.write(self.style.MIGRATE_HEADING(label))
+            gathered_ms = self.time(gathered, repeat)
+            if per_shard is not None:
+                sequential_ms = self.time(lambda: self.each_shard(per_shard), repeat)
+                self.stdout.write(f'  shards one after another  {sequential_ms:8.2f}')
+                self.stdout.write(
+                    f'  scatter-gather            {gathered_ms:8.2f}  ({sequential_ms / gathered_ms:.1f}x)'
+                )
+            else:
+                self.stdout.write(f'  scatter-gather            {gathered_ms:8.2f}')
+
+    def state_for(self, alias):
+        listed = get_sharding_setting('SHARDS', {}).get(alias)
+        if listed:
+            return listed[0]
+        return 'MH' if shard_for_state('MH') == alias else ''
+
+    def check_placement(self, sample, states):
+        for alias in states:
+            with use_shard(alias):
+                highest = BloodRequest.objects.order_by('-pk').values_list('pk', flat=True).first()
+            if shard_for_pk(highest) != alias:
+                raise CommandError(f'Request {highest} on {alias} is outside its id block')
+
+        expected = sample * len(states)
+        gathered = dashboards.total_blood_requests()
+        if gathered != expected:
+            raise CommandError(f'Dashboard counted {gathered} requests across shards, expected {expected}')
+        regions = compatible_stock('AB+')['regions']
+        if set(regions) != set(states):
+            raise CommandError(f'Compatible stock covered {sorted(regions)}, expected {sorted(states)}')
+
+        admin = User.objects.create(username='shard-benchmark-admin', role='admin', is_staff=True)
+        client = Client()
+        response = self.get(client, admin, '/api/blood-requests/?page=2')
+        if response.json()['count'] != expected:
+            raise CommandError(f'Admin request list counted {response.json()["count"]}, expected {expected}')
+
+        # A donor's request lands in their own region and lists from there
+        alias = shard_aliases()[-1]
+        donor = User.objects.create(username='shard-benchmark-donor', role='donor')
+        DonorProfile.objects.create(user=donor, blood_group='A+', state=states[alias])
+        self.reset_throttles()
+        response = client.post(
+            '/api/blood-requests/', {'blood_group': 'A+', 'units_required': 1, 'reason': 'Benchmark'},
+            content_type='application/json', headers=self.auth(donor),
+        )
+        assert response.status_code == 201, response.content
+        if shard_for_pk(response.json()['id']) != alias:
+            raise CommandError(f'Request {response.json()["id"]} from a donor in {alias} was stored elsewhere')
+        if self.get(client, donor, '/api/blood-requests/').json()['count'] != 1:
+            raise CommandError('Donor request list did not read their own region')
+        self.stdout.write(self.style.SUCCESS(
+            f'Rows and ids stay in their shards; {expected} requests gathered across {len(states)} shards'
+        ))
+
+    def each_shard(self, func):
+        results = []
+        for alias in shard_aliases():
+            with use_shard(alias):
+                results.append(func())
+        return results
+
+    def add_latency_wrapper(self, sender=None, connection=None, **kwargs):
+        def delay(execute, sql, params, many, context):
+            time.sleep(self.latency)
+            return execute(sql, params, many, context)
+        connection.execute_wrappers.append(delay)
+
+    def reset_throttles(self):
+        caches[get_throttle_setting('CACHE', 'default')].clear()
+
+    def auth(self, user):
+        return {'Authorization': f'Bearer {token_pair(user)["access"]}'}
+
+    def get(self, client, user, url):
+        self.reset_throttles()
+        response = client.get(url, headers=self.auth(user))
+        assert response.status_code == 200, response.content
+        return response
+
+    def time(self, func, repeat):
+        func()  # warm-up
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append((time.perf_counter() - start) * 1000)
+        return statistics.median(timings)
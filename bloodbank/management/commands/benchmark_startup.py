@@ -0,0 +1,156 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Runs in a fresh interpreter, so nothing is imported before the clock starts
+PROBE = r'''
+import json, sys, time
+start = time.perf_counter()
+config = json.loads(sys.argv[1])
+marks = []
+
+def mark(name):
+    marks.append((name, (time.perf_counter() - start) * 1000))
+
+import django
+django.setup()
+mark('django.setup')
+
+from django.core.wsgi import get_wsgi_application
+application = get_wsgi_application()
+mark('wsgi application')
+
+from django.urls import get_resolver
+get_resolver().url_patterns
+mark('urlconf')
+
+if config['preload']:
+    from blood_management.startup import warm_up
+    warm_up()
+    mark('warm up')
+
+from io import BytesIO
+from wsgiref.util import setup_testing_defaults
+
+def call(path):
+    environ = {
+        'PATH_INFO': path, 'REQUEST_METHOD': 'GET', 'SERVER_NAME': 'localhost',
+        'HTTP_HOST': 'localhost', 'HTTP_ACCEPT': 'application/json',
+        'HTTP_X_FORWARDED_PROTO': 'https', 'wsgi.input': BytesIO(),
+    }
+    setup_testing_defaults(environ)
+    statuses = []
+    body = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+    b''.join(body)
+    if hasattr(body, 'close'):
+        body.close()
+    return statuses[0].split()[0]
+
+heavy = ('rest_framework_simplejwt', 'PIL', 'pkg_resources')
+loaded = [name for name in heavy if name in sys.modules]
+
+fork = time.perf_counter()
+for index, path in enumerate(config['paths']):
+    before = time.perf_counter()
+    status = call(path)
+    marks.append((f'request {index + 1} {path} [{status}]', (time.perf_counter() - before) * 1000))
+marks.append(('after fork to last response', (time.perf_counter() - fork) * 1000))
+
+print(json.dumps({'marks': marks, 'heavy_loaded_before_requests': loaded}))
+'''
+
+DEFAULT_PATHS = ['/', '/api/blood-banks/', '/api/blood-banks/']
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure cold start in fresh interpreters: django.setup, WSGI app and URLconf '
+        'load, then the first requests as a forked worker would serve them, with and '
+        'without the pre-fork warm-up the production launcher does.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--settings-module', default=None,
+                            help='DJANGO_SETTINGS_MODULE for the probe (default: the current one)')
+        parser.add_argument('--path', action='append', dest='paths',
+                            help=f'Request path, repeatable (default: {" ".join(DEFAULT_PATHS)})')
+        parser.add_argument('--imports', type=int, default=0,
+                            help='Also list the N slowest imports during start-up')
+        parser.add_argument('--budget-ms', type=float, default=None,
+                            help='Fail if the median first request after the warm-up exceeds this')
+
+    def handle(self, *args, **options):
+        settings_module = options['settings_module'] or os.environ.get(
+            'DJANGO_SETTINGS_MODULE', settings.SETTINGS_MODULE,
+        )
+        paths = options['paths'] or DEFAULT_PATHS
+        env = {
+            **os.environ,
+            'DJANGO_SETTINGS_MODULE': settings_module,
+            # Production settings refuse to start without one
+            'DJANGO_SECRET_KEY': os.environ.get('DJANGO_SECRET_KEY') or 'startup-benchmark',
+            # A single process, so the memory cache is fine without DJANGO_CACHE_URL
+            'GUNICORN_WORKERS': '1',
+        }
+        self.stdout.write(
+            f'Settings: {settings_module}; median of {options["runs"]} runs in ms. Boot phases are '
+            f'cumulative from interpreter start, requests are timed one by one.'
+        )
+
+        first_requests = {}
+        for preload in (False, True):
+            runs = [self.probe(env, paths, preload) for _ in range(options['runs'])]
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                'Preloaded (warm-up before fork)' if preload else 'Lazy (no warm-up)'
+            ))
+            for index, (name, _) in enumerate(runs[0]['marks']):
+                median = statistics.median(run['marks'][index][1] for run in runs)
+                self.stdout.write(f'  {name:<45} {median:9.1f}')
+            loaded = runs[0]['heavy_loaded_before_requests']
+            self.stdout.write(f'  heavy modules loaded before the first request: {", ".join(loaded) or "none"}')
+            first_requests[preload] = statistics.median(
+                next(mark for mark in run['marks'] if mark[0].startswith('request 1 '))[1] for run in runs
+            )
+
+        if options['imports']:
+            self.show_imports(env, options['imports'])
+
+        if options['budget_ms'] is not None and first_requests[True] > options['budget_ms']:
+            raise CommandError(
+                f'First request after warm-up took {first_requests[True]:.1f} ms '
+                f'(budget {options["budget_ms"]:.1f} ms)'
+            )
+
+    def probe(self, env, paths, preload):
+        config = json.dumps({'preload': preload, 'paths': paths})
+        result = subprocess.run(
+            [sys.executable, '-c', PROBE, config], env=env, cwd=settings.BASE_DIR,
+            capture_output=True, text=True,
+        )
+        if result.returncode:
+            raise CommandError(f'Start-up probe failed:\n{result.stderr}')
+        return json.loads(result.stdout.strip().splitlines()[-1])
+
+    def show_imports(self, env, limit):
+        script = 'import django; django.setup(); from django.urls import get_resolver; get_resolver().url_patterns'
+        result = subprocess.run(
+            [sys.executable, '-X', 'importtime', '-c', script], env=env, cwd=settings.BASE_DIR,
+            capture_output=True, text=True,
+        )
+        timings = []
+        for line in result.stderr.splitlines():
+            # "import time: <self us> | <cumulative us> | <indented module name>"
+            if not line.startswith('import time:') or 'cumulative' in line:
+                continue
+            self_us, _, name = line[len('import time:'):].split('|')
+            timings.append((int(self_us), name.strip()))
+        self.stdout.write(self.style.MIGRATE_HEADING('Slowest imports (self time, ms)'))
+        for self_us, name in sorted(timings, reverse=True)[:limit]:
+            self.stdout.write(f'  {name:<60} {self_us / 1000:7.1f}')
@@ -0,0 +1,110 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from accounts.models import DonorProfile
+from accounts.projections import DONOR_PROFILE_PROJECTION
+from accounts.serializers import DonorProfileSerializer
+from bloodbank.management.sample_data import create_sample_data
+from bloodbank.models import BloodBank, BloodInventory, BloodRequest, Donation, Reservation
+from bloodbank.projections import (
+    BLOOD_BANK_PROJECTION, BLOOD_INVENTORY_PROJECTION,
+    BLOOD_REQUEST_PROJECTION, DONATION_PROJECTION, RESERVATION_PROJECTION
+)
+from blood_management.fieldsets import get_fieldset
+from bloodbank.serializers import (
+    BloodBankSerializer, BloodInventorySerializer,
+    BloodRequestSerializer, DonationSerializer, ReservationSerializer
+)
+
+
+CASES = [
+    ('BloodBank', BloodBank, BloodBankSerializer, BLOOD_BANK_PROJECTION),
+    ('BloodInventory', BloodInventory, BloodInventorySerializer, BLOOD_INVENTORY_PROJECTION),
+    ('BloodRequest', BloodRequest, BloodRequestSerializer, BLOOD_REQUEST_PROJECTION),
+    ('Donation', Donation, DonationSerializer, DONATION_PROJECTION),
+    ('Reservation', Reservation, ReservationSerializer, RESERVATION_PROJECTION),
+    ('DonorProfile', DonorProfile, DonorProfileSerializer, DONOR_PROFILE_PROJECTION),
+]
+
+# Query strings checked against every model on top of the full representation
+FIELDSETS = [
+    'fields=id,status,blood_group',
+    'fields=id,blood_bank_name&expand=blood_bank',
+    'expand=requester,donor,blood_bank',
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Verify that the values() projections render byte-identical JSON to the '
+        'DRF serializers, and optionally compare their speed.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=500, help='Rows compared per model')
+        parser.add_argument('--sample', type=int, default=0,
+                            help='Create this many synthetic rows per model first (rolled back afterwards)')
+        parser.add_argument('--benchmark', action='store_true', help='Also time both serialization paths')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            if options['sample']:
+                create_sample_data(options['sample'])
+            failures = self.compare(options['limit'], options['benchmark'])
+            transaction.set_rollback(True)
+
+        if failures:
+            raise CommandError(f'{failures} case(s) differ between serializer and projection')
+        self.stdout.write(self.style.SUCCESS('All projections match their serializers'))
+
+    def compare(self, limit, benchmark):
+        failures = 0
+        for label, model, serializer_class, projection in CASES:
+            queryset = model.objects.order_by('pk')[:limit]
+            failures += self.compare_case(label, queryset, serializer_class, projection, benchmark)
+
+            for query_string in FIELDSETS:
+                request = Request(APIRequestFactory().get(f'/?{query_string}'))
+                failures += self.compare_case(
+                    f'{label}?{query_string}', queryset, serializer_class,
+                    projection.restrict(*get_fieldset(request)), False, request,
+                )
+        return failures
+
+    def compare_case(self, label, queryset, serializer_class, projection, benchmark, request=None):
+        renderer = JSONRenderer()
+        context = {'request': request} if request is not None else {}
+        expected = renderer.render(serializer_class(queryset, many=True, context=context).data)
+        actual = renderer.render(projection.serialize(queryset, request))
+        rows = queryset.count()
+
+        if expected != actual:
+            self.stdout.write(self.style.ERROR(f'{label}: MISMATCH over {rows} rows'))
+            self.stdout.write(f'  serializer: {expected[:300]!r}')
+            self.stdout.write(f'  projection: {actual[:300]!r}')
+            return 1
+
+        message = f'{label}: identical over {rows} rows'
+        if benchmark and rows:
+            serializer_time = self.best_of(lambda: serializer_class(queryset.all(), many=True).data)
+            projection_time = self.best_of(lambda: projection.serialize(queryset.all()))
+            message += (
+                f' (serializer {serializer_time / rows * 1e6:.1f} us/row, '
+                f'projection {projection_time / rows * 1e6:.1f} us/row, '
+                f'{serializer_time / projection_time:.1f}x)'
+            )
+        self.stdout.write(self.style.SUCCESS(message))
+        return 0
+
+    def best_of(self, func, repeat=3):
+        timings = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            func()
+            timings.append(time.perf_counter() - start)
+        return min(timings)
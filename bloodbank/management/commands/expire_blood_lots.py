@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db.models import Count, Sum
+from django.utils.dateparse import parse_date
+
+from blood_management.sharding import is_sharded, shard_aliases, use_shard
+from bloodbank.lots import expired_lots, sweep
+
+
+class Command(BaseCommand):
+    help = (
+        'Retire blood unit lots past their expiry date and take their units out of '
+        'the inventory totals, one batch per transaction, on every shard. Safe to '
+        'interrupt and rerun.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--date', default=None, help='Treat this day (YYYY-MM-DD) as today')
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Override BLOOD_LOTS["SWEEP_BATCH_SIZE"]')
+        parser.add_argument('--max-batches', type=int, default=None)
+        parser.add_argument('--dry-run', action='store_true', help='Only count the expired units')
+
+    def handle(self, *args, **options):
+        today = None
+        if options['date']:
+            today = parse_date(options['date'])
+            if today is None:
+                raise CommandError('--date must be YYYY-MM-DD')
+
+        for alias in shard_aliases():
+            with use_shard(alias):
+                self.expire_shard(today, options, prefix=f'{alias}: ' if is_sharded() else '')
+
+    def expire_shard(self, today, options, prefix=''):
+        if options['dry_run']:
+            counts = expired_lots(today).aggregate(lots=Count('pk'), units=Sum('units_remaining'))
+            self.stdout.write(f'{prefix}{counts["lots"]} expired lots holding {counts["units"] or 0} units')
+            return
+
+        def report(expired, total):
+            if options['verbosity'] >= 2:
+                for (bank_id, group), units in sorted(expired.items()):
+                    self.stdout.write(f'{prefix}bank {bank_id} {group}: retired {units} units')
+
+        total = sweep(today, batch_size=options['batch_size'], max_batches=options['max_batches'], on_batch=report)
+        self.stdout.write(self.style.SUCCESS(f'{prefix}Retired {total} expired units'))
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Count, Sum
+
+from blood_management.sharding import is_sharded, shard_aliases, use_shard
+from bloodbank.reservations import open_holds, sweep
+
+
+class Command(BaseCommand):
+    help = (
+        'Return inventory holds past their expiry to available stock, one batch '
+        'per transaction, on every shard. Safe to interrupt and rerun.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=None,
+                            help='Override RESERVATIONS["SWEEP_BATCH_SIZE"]')
+        parser.add_argument('--max-batches', type=int, default=None)
+        parser.add_argument('--dry-run', action='store_true', help='Only count the expired holds')
+
+    def handle(self, *args, **options):
+        for alias in shard_aliases():
+            with use_shard(alias):
+                self.expire_shard(options, prefix=f'{alias}: ' if is_sharded() else '')
+
+    def expire_shard(self, options, prefix=''):
+        if options['dry_run']:
+            counts = open_holds().aggregate(holds=Count('pk'), units=Sum('units'))
+            self.stdout.write(f'{prefix}{counts["holds"]} expired holds on {counts["units"] or 0} units')
+            return
+
+        def report(returned, total):
+            if options['verbosity'] >= 2:
+                for inventory_id, units in sorted(returned.items()):
+                    self.stdout.write(f'{prefix}inventory {inventory_id}: returned {units} units')
+
+        total = sweep(batch_size=options['batch_size'], max_batches=options['max_batches'], on_batch=report)
+        self.stdout.write(self.style.SUCCESS(f'{prefix}Returned {total} units from expired holds'))
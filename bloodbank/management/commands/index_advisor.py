@@ -0,0 +1,202 @@
+import re
+from collections import OrderedDict
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from accounts.models import User, DonorProfile
+from bloodbank.management.sample_data import create_sample_data
+from bloodbank.models import BloodBank, BloodRequest, Donation
+from blood_management.profiling import explain
+
+
+# (url name, query string, role, model whose first pk fills <pk>)
+SCENARIOS = [
+    ('blood_bank_list_create', '', 'admin', None),
+    ('blood_bank_list_create', 'city=Pune', 'admin', None),
+    ('blood_bank_detail', '', 'admin', BloodBank),
+    ('blood_inventory_list', '', 'admin', None),
+    ('blood_inventory_list', 'blood_group=A%2B', 'admin', None),
+    ('blood_inventory_list', 'blood_bank=1&blood_group=A%2B', 'admin', None),
+    ('blood_inventory_matrix', '', 'admin', None),
+    ('blood_request_list_create', '', 'admin', None),
+    ('blood_request_list_create', 'status=pending', 'admin', None),
+    ('blood_request_list_create', 'blood_group=A%2B', 'admin', None),
+    ('blood_request_list_create', 'status=pending&blood_group=A%2B', 'admin', None),
+    ('blood_request_list_create', 'status=pending', 'donor', None),
+    ('blood_request_list_create', 'include_archived=true&status=rejected', 'donor', None),
+    ('blood_request_detail', '', 'admin', BloodRequest),
+    ('blood_request_triage', '', 'admin', None),
+    ('blood_request_triage', 'unclaimed=true', 'admin', None),
+    ('reservation_list_create', '', 'admin', None),
+    ('reservation_list_create', 'status=held', 'admin', None),
+    ('reservation_list_create', 'blood_bank=1', 'admin', None),
+    ('donation_list_create', '', 'admin', None),
+    ('donation_list_create', 'status=pending', 'admin', None),
+    ('donation_list_create', 'blood_group=A%2B', 'admin', None),
+    ('donation_list_create', 'status=pending&blood_group=A%2B', 'admin', None),
+    ('donation_list_create', 'status=pending', 'donor', None),
+    ('donation_list_create', 'include_archived=true', 'donor', None),
+    ('donation_detail', '', 'admin', Donation),
+    ('search_donors', 'blood_group=A%2B', 'admin', None),
+    ('search_donors', 'blood_group=A%2B&is_available=true', 'admin', None),
+    ('search_donors', 'blood_group=A%2B&is_available=true&city=Pune', 'admin', None),
+    ('admin_dashboard', '', 'admin', None),
+    ('donor_dashboard', '', 'donor', None),
+    ('current_user', '', 'donor', None),
+    ('donor_profile', '', 'donor', None),
+    ('sync_changes', '', 'admin', None),
+    ('sync_changes', '', 'donor', None),
+    ('analytics_cube', 'dimensions=urgency,blood_group,month', 'admin', None),
+    ('analytics_cube', 'dimensions=state&from=2026-01-01', 'admin', None),
+]
+
+# Plans reviewed and accepted as they are: (scenario, table or 'sort') -> reason
+ACCEPTED = {
+    ('blood_bank_list_create', 'bloodbank_bloodbank'): 'one row per bank; nothing to filter on',
+    ('blood_bank_list_create?city=Pune', 'bloodbank_bloodbank'): 'city__icontains cannot use an index',
+    ('blood_inventory_list', 'bloodbank_bloodinventory'): 'unfiltered list of a small table',
+    ('blood_inventory_matrix', 'bloodbank_bloodbank'): 'every active bank is listed',
+    ('blood_inventory_matrix', 'sort'): 'sorts the per-bank pivot, one row per bank',
+    ('blood_request_list_create', 'bloodbank_bloodrequest'): 'unfiltered page count',
+    ('donation_list_create', 'bloodbank_donation'): 'unfiltered page count',
+    ('admin_dashboard', 'sort'): 'groups only the expired or expiring lots by blood group',
+    ('donor_dashboard', 'sort'): 'first() orders the single profile row by pk',
+    ('sync_changes', 'sort'): "a donor's own requests and donations, found by requester/donor index",
+    ('analytics_cube?dimensions=urgency,blood_group,month', 'bloodbank_bloodrequest'): 'aggregates all history without from/to',
+    ('analytics_cube?dimensions=urgency,blood_group,month', 'bloodbank_archivedbloodrequest'): 'aggregates all history without from/to',
+    ('analytics_cube?dimensions=urgency,blood_group,month', 'sort'): 'GROUP BY over computed month buckets',
+    ('analytics_cube?dimensions=state&from=2026-01-01', 'sort'): 'GROUP BY state of the joined bank, within the created_at range',
+}
+
+FINDINGS = {
+    'sqlite': [
+        ('scan', re.compile(r'\bSCAN (?:TABLE )?(\w+)$')),
+        ('sort', re.compile(r'\bUSE TEMP B-TREE FOR (?:ORDER BY|GROUP BY|DISTINCT|(?:LAST|RIGHT PART OF) ORDER BY)')),
+    ],
+    'postgresql': [
+        ('scan', re.compile(r'\bSeq Scan on (\w+)')),
+        ('sort', re.compile(r'^\s*(?:->\s*)?(?:Incremental )?Sort\b')),
+    ],
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Replay the queries behind each API endpoint, EXPLAIN them and report '
+        'full table scans and temporary sorts. Exits non-zero with --check.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sample', type=int, default=100,
+                            help='Create this many synthetic rows per model first (rolled back afterwards)')
+        parser.add_argument('--check', action='store_true',
+                            help='Fail when a plan has findings that are not in ACCEPTED')
+        parser.add_argument('--test-database', action='store_true',
+                            help='Run against a freshly migrated test database, as in CI')
+
+    def handle(self, *args, **options):
+        if connection.vendor not in FINDINGS:
+            raise CommandError(f'No plan rules for the {connection.vendor} backend')
+
+        if options['test_database']:
+            old_name = connection.settings_dict['NAME']
+            connection.creation.create_test_db(verbosity=0, autoclobber=True)
+            try:
+                findings = self.run(options)
+            finally:
+                connection.creation.destroy_test_db(old_name, verbosity=0)
+        else:
+            findings = self.run(options)
+
+        new = [finding for finding in findings if finding not in ACCEPTED]
+        if new:
+            message = f'{len(new)} unindexed query shape(s): ' + ', '.join(
+                f'{name} ({what})' for name, what in new
+            )
+            if options['check']:
+                raise CommandError(message)
+            self.stdout.write(self.style.WARNING(message))
+        else:
+            self.stdout.write(self.style.SUCCESS('All endpoint queries use an index'))
+
+    def run(self, options):
+        with transaction.atomic():
+            create_sample_data(options['sample'])
+            users = self.create_users()
+            queries = self.replay(users)
+            findings = self.analyse(queries, options['verbosity'])
+            transaction.set_rollback(True)
+        return findings
+
+    def create_users(self):
+        admin = User.objects.create(username='index-advisor-admin', role='admin', is_staff=True)
+        donor = User.objects.create(username='index-advisor-donor', role='donor')
+        DonorProfile.objects.create(user=donor, blood_group='A+', city='Pune')
+        return {'admin': admin, 'donor': donor}
+
+    def replay(self, users):
+        """
+        Request every scenario and collect its distinct SELECTs, per scenario.
+        """
+        queries = OrderedDict()
+        for url_name, query_string, role, model in SCENARIOS:
+            kwargs = {}
+            if model is not None:
+                kwargs['pk'] = model.objects.values_list('pk', flat=True).first()
+            path = reverse(url_name, kwargs=kwargs)
+            if query_string:
+                path = f'{path}?{query_string}'
+
+            client = APIClient()
+            client.force_authenticate(users[role])
+            captured = []
+
+            def capture(execute, sql, params, many, context):
+                if not many and sql.lstrip().upper().startswith('SELECT'):
+                    captured.append((sql, params))
+                return execute(sql, params, many, context)
+
+            with connection.execute_wrapper(capture):
+                response = client.get(path)
+            if response.status_code != 200:
+                raise CommandError(f'GET {path} as {role} returned {response.status_code}')
+
+            label = f'{url_name}?{query_string}' if query_string else url_name
+            seen = queries.setdefault(label, OrderedDict())
+            for sql, params in captured:
+                seen.setdefault(sql, (path, params))
+        return queries
+
+    def analyse(self, queries, verbosity):
+        rules = FINDINGS[connection.vendor]
+        # Scans of subqueries and CTEs are reported under their own names
+        tables = set(connection.introspection.table_names())
+        findings = []
+        for label, statements in queries.items():
+            for sql, (path, params) in statements.items():
+                plan = explain(connection, sql, params) or []
+                hits = []
+                for line in plan:
+                    for kind, pattern in rules:
+                        match = pattern.search(line)
+                        if match and (kind != 'scan' or match.group(1) in tables):
+                            hits.append((kind, match.group(1) if kind == 'scan' else 'sort', line))
+
+                if not hits and verbosity < 2:
+                    continue
+                self.stdout.write(f'{label}  GET {path}')
+                self.stdout.write(f'  {sql}')
+                for line in plan:
+                    self.stdout.write(f'    {line}')
+                for kind, what, _ in hits:
+                    finding = (label, what)
+                    if finding in ACCEPTED:
+                        self.stdout.write(f'  accepted {kind}: {what}')
+                    else:
+                        self.stdout.write(self.style.ERROR(f'  {kind}: {what}'))
+                    if finding not in findings:
+                        findings.append(finding)
+        return findings
@@ -0,0 +1,28 @@
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand
+
+from blood_management.sharding import GLOBAL_DB, shard_aliases, sync_users
+
+
+class Command(BaseCommand):
+    help = (
+        'Migrate the global database and every shard in SHARDING, move each shard\'s '
+        'id sequences into its block and bring its copy of the users up to date.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--skip-users', action='store_true', help='Only migrate')
+
+    def handle(self, *args, **options):
+        aliases = list(dict.fromkeys([GLOBAL_DB, *shard_aliases()]))
+        for alias in aliases:
+            self.stdout.write(self.style.MIGRATE_HEADING(f'Migrating {alias}'))
+            call_command('migrate', database=alias, interactive=False, verbosity=max(options['verbosity'] - 1, 0))
+
+        if options['skip_users']:
+            return
+        for alias in aliases:
+            if alias != GLOBAL_DB:
+                copied = sync_users(alias, get_user_model())
+                self.stdout.write(f'{alias}: {copied} users copied')
@@ -0,0 +1,38 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from blood_management.sharding import is_sharded, shard_aliases, use_shard
+from bloodbank.models import Tombstone
+from bloodbank.sync import get_sync_setting
+
+
+class Command(BaseCommand):
+    help = (
+        'Delete sync tombstones older than SYNC["TOMBSTONE_TTL"] in batches, on '
+        'every shard. Sync tokens that old are refused anyway.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - get_sync_setting('TOMBSTONE_TTL', timedelta(days=30))
+        for alias in shard_aliases():
+            with use_shard(alias):
+                deleted = self.purge_shard(cutoff, options['batch_size'])
+            prefix = f'{alias}: ' if is_sharded() else ''
+            self.stdout.write(self.style.SUCCESS(f'{prefix}Deleted {deleted} expired tombstones'))
+
+    def purge_shard(self, cutoff, batch_size):
+        deleted = 0
+        while True:
+            ids = list(
+                Tombstone.objects.filter(deleted_at__lt=cutoff)
+                .order_by('deleted_at', 'pk').values_list('pk', flat=True)[:batch_size]
+            )
+            if not ids:
+                break
+            deleted += Tombstone.objects.filter(pk__in=ids).delete()[0]
+        return deleted
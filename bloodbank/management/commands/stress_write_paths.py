@@ -0,0 +1,357 @@
+import logging
+import multiprocessing
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.signals import got_request_exception
+from django.db import OperationalError, connection, connections
+from django.test import Client
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from accounts.models import DonorProfile, User
+from blood_management.authentication import token_pair
+from blood_management.metrics import percentile
+from bloodbank.models import BloodAllocation, BloodBank, BloodInventory, BloodRequest, Donation
+
+
+OPERATIONS = ('approve_request', 'approve_donation', 'update_inventory')
+
+DEFAULT_MIX = 'approve_request=45,approve_donation=45,update_inventory=10'
+
+OUTCOMES = ('ok', 'refused', 'conflict', 'locked', 'error')
+
+
+@dataclass
+class Task:
+    operation: str
+    pk: int
+    blood_bank_id: int
+    units: int
+
+
+@dataclass
+class Result:
+    operation: str
+    outcome: str
+    ms: float
+    # Units the response says went into (+) or out of (-) stock
+    units: int = 0
+
+
+def parse_mix(value):
+    weights = {}
+    for part in value.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in OPERATIONS:
+            raise CommandError(f'Unknown operation {name!r} in --mix. Use any of: {", ".join(OPERATIONS)}')
+        try:
+            weights[name] = int(weight)
+        except ValueError:
+            raise CommandError(f'--mix weight for {name} must be an integer')
+    if not any(weights.values()):
+        raise CommandError('--mix needs at least one operation with a positive weight')
+    return weights
+
+
+# The exception behind the last 500 on this thread. Test clients re-raise
+# whichever exception any thread's request signalled, so they can't tell.
+_failure = threading.local()
+
+
+def remember_failure(sender, **kwargs):
+    _failure.exception = sys.exc_info()[1]
+
+
+def is_lock_error(exception):
+    message = str(exception).lower()
+    return isinstance(exception, OperationalError) and any(word in message for word in ('locked', 'busy', 'timeout'))
+
+
+def classify(response):
+    if response.status_code < 300:
+        return 'ok'
+    if response.status_code == 409:
+        return 'conflict'
+    if response.status_code == 400:
+        return 'refused'
+    if response.status_code >= 500 and is_lock_error(getattr(_failure, 'exception', None)):
+        return 'locked'
+    return 'error'
+
+
+def perform(client, headers, task):
+    """
+    Send one task's request; returns ``(outcome, units moved)``.
+    """
+    if task.operation == 'approve_request':
+        response = client.patch(
+            f'/api/blood-requests/{task.pk}/approve-reject/',
+            {'action': 'approve', 'blood_bank_id': task.blood_bank_id},
+            content_type='application/json', headers=headers,
+        )
+        outcome = classify(response)
+        return outcome, -task.units if outcome == 'ok' else 0
+    if task.operation == 'approve_donation':
+        response = client.patch(
+            f'/api/donations/{task.pk}/approve-reject/',
+            {'action': 'approve', 'blood_bank_id': task.blood_bank_id, 'donation_date': str(timezone.localdate())},
+            content_type='application/json', headers=headers,
+        )
+        outcome = classify(response)
+        return outcome, task.units if outcome == 'ok' else 0
+
+    # Read-modify-write, as a client of the absolute-valued update view must.
+    # It overwrites any approval committed in between, so the units it moved
+    # are unknown and edited rows are left out of the stock check.
+    current = BloodInventory.objects.filter(pk=task.pk).values_list('units_available', flat=True).get()
+    response = client.patch(
+        f'/api/blood-inventory/{task.pk}/', {'units_available': max(current + task.units, 0)},
+        content_type='application/json', headers=headers,
+    )
+    return classify(response), 0
+
+
+def run_tasks(tasks, token):
+    """
+    Work through ``tasks`` on this thread's or process's own connection.
+    """
+    client = Client(raise_request_exception=False)
+    headers = {'Authorization': f'Bearer {token}'}
+    results = []
+    try:
+        for task in tasks:
+            _failure.exception = None
+            start = time.perf_counter()
+            units = 0
+            try:
+                outcome, units = perform(client, headers, task)
+            except Exception as e:
+                outcome = 'locked' if is_lock_error(e) else 'error'
+            results.append(Result(task.operation, outcome, (time.perf_counter() - start) * 1000, units))
+    finally:
+        connections.close_all()
+    return results
+
+
+class Command(BaseCommand):
+    help = (
+        'Approve blood requests and donations and edit inventory from concurrent '
+        'threads or processes through the API against a real database file, then '
+        'report throughput, latency percentiles and lock errors, and check that no '
+        'units were created or lost. Exits non-zero with --check.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=8)
+        parser.add_argument('--operations', type=int, default=50, help='Operations per worker')
+        parser.add_argument('--mode', choices=('thread', 'process'), default='thread')
+        parser.add_argument('--mix', default=DEFAULT_MIX,
+                            help=f'Relative weight of each operation (default "{DEFAULT_MIX}")')
+        parser.add_argument('--banks', type=int, default=2,
+                            help='Banks the operations are spread over; fewer means more contention')
+        parser.add_argument('--units', type=int, default=20, help='Starting units per bank and blood group')
+        parser.add_argument('--seed', type=int, default=0, help='Seed for the operation plan')
+        parser.add_argument('--database-file', default=None,
+                            help='SQLite file to run against (default: a new temporary file)')
+        parser.add_argument('--timeout', type=float, default=None,
+                            help='SQLite busy timeout in seconds (default: the driver\'s 5)')
+        parser.add_argument('--keep', action='store_true', help='Keep the database afterwards')
+        parser.add_argument('--check', action='store_true', help='Fail when the unit count does not add up')
+
+    def handle(self, *args, **options):
+        if options['workers'] < 1 or options['operations'] < 1:
+            raise CommandError('--workers and --operations must be at least 1')
+        if options['mode'] == 'process' and 'fork' not in multiprocessing.get_all_start_methods():
+            raise CommandError('--mode process needs fork(); use --mode thread on this platform')
+
+        settings_dict = connection.settings_dict
+        if connection.vendor == 'sqlite':
+            # Workers must share one file; the in-memory test database is per connection
+            if options['database_file'] and os.path.exists(options['database_file']):
+                # create_test_db() would clobber it and destroy_test_db() delete it
+                raise CommandError(f'{options["database_file"]} already exists; pass a path to a new file')
+            path = options['database_file'] or os.path.join(tempfile.mkdtemp(), 'stress.sqlite3')
+            settings_dict['TEST']['NAME'] = path
+            if options['timeout'] is not None:
+                settings_dict['OPTIONS'] = {**settings_dict.get('OPTIONS', {}), 'timeout': options['timeout']}
+        old_name = settings_dict['NAME']
+        connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        self.stdout.write(f'Database: {connection.settings_dict["NAME"]}')
+        # Every worker acts as the same admin; only the write paths are measured
+        throttling = {**getattr(settings, 'THROTTLING', {}), 'RATES': {}, 'ENDPOINT_RATES': {}}
+        # Failures are counted in the report rather than logged one by one
+        request_logger = logging.getLogger('django.request')
+        level = request_logger.level
+        request_logger.setLevel(logging.CRITICAL)
+        got_request_exception.connect(remember_failure)
+        try:
+            with override_settings(THROTTLING=throttling):
+                failed = self.run(options)
+        finally:
+            got_request_exception.disconnect(remember_failure)
+            request_logger.setLevel(level)
+            connections.close_all()
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=options['keep'])
+        if failed and options['check']:
+            raise CommandError('Units were created or lost under concurrency')
+
+    def run(self, options):
+        tasks = self.seed(options)
+        starting = self.stock_by_row()
+        token = token_pair(User.objects.get(username='stress-admin'))['access']
+
+        workers = options['workers']
+        chunks = [tasks[index::workers] for index in range(workers)]
+        start = time.perf_counter()
+        if options['mode'] == 'thread':
+            with ThreadPoolExecutor(max_workers=workers) as executor:
+                batches = list(executor.map(run_tasks, chunks, [token] * workers))
+        else:
+            # Children must not share the parent's open connection
+            connections.close_all()
+            with multiprocessing.get_context('fork').Pool(workers) as pool:
+                batches = pool.starmap(run_tasks, [(chunk, token) for chunk in chunks])
+        elapsed = time.perf_counter() - start
+        results = [result for batch in batches for result in batch]
+
+        self.report(results, elapsed, options)
+        edited = {task.pk for task in tasks if task.operation == 'update_inventory'}
+        return not self.check_conservation(results, starting, edited)
+
+    def seed(self, options):
+        rng = random.Random(options['seed'])
+        weights = parse_mix(options['mix'])
+        groups = [choice for choice, _ in BloodInventory.BLOOD_GROUP_CHOICES]
+
+        User.objects.create(username='stress-admin', role='admin', is_staff=True)
+        donor = User.objects.create(username='stress-donor', role='donor')
+        DonorProfile.objects.create(user=donor, blood_group='O+', city='Pune')
+        banks = [
+            BloodBank.objects.create(
+                name=f'Stress Bank {index}', address='1 Test Road', city='Pune', state='MH', phone='0000000000',
+            )
+            for index in range(max(options['banks'], 1))
+        ]
+        inventory = BloodInventory.objects.bulk_create([
+            BloodInventory(blood_bank=bank, blood_group=group, units_available=options['units'])
+            for bank in banks for group in groups
+        ])
+        # Edited rows drop out of the stock check, so keep the edits to one
+        # bank and leave the others' stock checkable
+        editable = [row for row in inventory if len(banks) == 1 or row.blood_bank == banks[-1]]
+
+        plan = rng.choices(list(weights), weights=list(weights.values()), k=options['workers'] * options['operations'])
+        tasks = []
+        for operation in plan:
+            bank = rng.choice(banks)
+            group = rng.choice(groups)
+            if operation == 'approve_request':
+                units = rng.randint(1, 4)
+                pk = BloodRequest.objects.create(
+                    requester=donor, blood_group=group, units_required=units, reason='Stress test',
+                ).pk
+            elif operation == 'approve_donation':
+                units = rng.randint(1, 2)
+                pk = Donation.objects.create(donor=donor, blood_group=group, units_donated=units).pk
+            else:
+                units = rng.randint(-3, 3)
+                pk = rng.choice(editable).pk
+            tasks.append(Task(operation, pk, bank.pk, units))
+        return tasks
+
+    def stock_by_row(self):
+        """
+        ``{pk: (blood_bank_id, blood_group, units held)}`` per inventory row.
+        """
+        return {
+            pk: (blood_bank_id, blood_group, available + reserved)
+            for pk, blood_bank_id, blood_group, available, reserved in BloodInventory.objects.values_list(
+                'pk', 'blood_bank_id', 'blood_group', 'units_available', 'units_reserved',
+            )
+        }
+
+    def report(self, results, elapsed, options):
+        self.stdout.write(
+            f'{options["workers"]} {options["mode"]} workers, {len(results)} operations over '
+            f'{options["banks"]} banks in {elapsed:.2f} s ({len(results) / elapsed:.1f} ops/s)'
+        )
+        self.stdout.write(
+            f'  {"operation":<18}{"count":>7}' + ''.join(f'{name:>10}' for name in OUTCOMES)
+            + ''.join(f'{name:>9}' for name in ('p50 ms', 'p95 ms', 'p99 ms', 'max ms'))
+        )
+        by_operation = defaultdict(list)
+        for result in results:
+            by_operation[result.operation].append(result)
+        for operation in OPERATIONS:
+            rows = by_operation.get(operation)
+            if not rows:
+                continue
+            counts = defaultdict(int)
+            for result in rows:
+                counts[result.outcome] += 1
+            timings = sorted(result.ms for result in rows)
+            self.stdout.write(
+                f'  {operation:<18}{len(rows):>7}' + ''.join(f'{counts[name]:>10}' for name in OUTCOMES)
+                + ''.join(f'{percentile(timings, fraction):>9.1f}' for fraction in (0.5, 0.95, 0.99, 1))
+            )
+
+    def check_conservation(self, results, starting, edited):
+        """
+        Stock on rows no inventory edit touched must equal what it started
+        with plus the donations credited to it, minus the units allocated
+        from it; the totals on record must match what the API reported.
+        """
+        donated = sum(result.units for result in results if result.operation == 'approve_donation')
+        issued = -sum(result.units for result in results if result.operation == 'approve_request')
+
+        credited = defaultdict(int)
+        for bank, group, units in Donation.objects.filter(status='completed').values_list(
+            'blood_bank_id', 'blood_group', 'units_donated',
+        ):
+            credited[bank, group] += units
+        allocated = defaultdict(int)
+        for bank, group, units in BloodAllocation.objects.values_list('blood_bank_id', 'blood_group', 'units'):
+            allocated[bank, group] += units
+
+        final = self.stock_by_row()
+        checked = [pk for pk in starting if pk not in edited]
+        start = sum(starting[pk][2] for pk in checked)
+        row_donated = sum(credited[starting[pk][:2]] for pk in checked)
+        row_issued = sum(allocated[starting[pk][:2]] for pk in checked)
+        expected = start + row_donated - row_issued
+        actual = sum(final[pk][2] for pk in checked)
+        self.stdout.write(
+            f'Units on {len(checked)} unedited rows: start {start} + donated {row_donated} - issued {row_issued} '
+            f'= {expected}; final {actual}'
+        )
+        edits = [result for result in results if result.operation == 'update_inventory']
+        if edits:
+            self.stdout.write(
+                f'Inventory edits: {sum(result.outcome == "ok" for result in edits)} of {len(edits)} applied '
+                f'to {len(edited)} rows, which hold {sum(final[pk][2] for pk in edited)} units; '
+                f'absolute values, so not checked'
+            )
+
+        problems = []
+        if actual != expected:
+            problems.append(f'final stock is off by {actual - expected} units')
+        if sum(allocated.values()) != issued:
+            problems.append(f'{sum(allocated.values())} units allocated to requests, but {issued} reported issued')
+        if sum(credited.values()) != donated:
+            problems.append(f'{sum(credited.values())} units on completed donations, but {donated} reported donated')
+        if problems:
+            self.stdout.write(self.style.ERROR('Conservation invariant broken: ' + '; '.join(problems)))
+        else:
+            self.stdout.write(self.style.SUCCESS('Conservation invariant held'))
+        return not problems
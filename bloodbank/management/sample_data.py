@@ -0,0 +1,42 @@
+"""
+Synthetic rows for the parity and benchmark commands, meant to be created
+inside a transaction that is rolled back afterwards.
+"""
+from accounts.models import User, DonorProfile
+from bloodbank.models import BloodBank, BloodInventory, BloodRequest, Donation
+from bloodbank.reservations import hold
+
+
+def create_sample_data(count, state='MH', prefix='sample'):
+    banks = [
+        BloodBank.objects.create(
+            name=f'{prefix.title()} Bank {i}', address='1 Test Road', city='Pune',
+            state=state, phone='0000000000', email=f'bank{i}@example.com',
+        )
+        for i in range(max(count // 10, 1))
+    ]
+    groups = [choice for choice, _ in BloodInventory.BLOOD_GROUP_CHOICES]
+    urgencies = list(BloodRequest.URGENCY_RANKS)
+    for bank in banks:
+        for group in groups:
+            BloodInventory.objects.get_or_create(
+                blood_bank=bank, blood_group=group, defaults={'units_available': 7}
+            )
+
+    for i in range(count):
+        user = User.objects.create(username=f'{prefix}-donor-{i}', email=f'donor{i}@example.com')
+        DonorProfile.objects.create(
+            user=user, blood_group=groups[i % len(groups)], city='Pune', state=state,
+            profile_photo=f'donor_photos/sample-{i}.jpg' if i % 2 else '',
+        )
+        bank = banks[i % len(banks)] if i % 3 else None
+        blood_request = BloodRequest.objects.create(
+            requester=user, blood_group=groups[i % len(groups)], reason='Sample data', blood_bank=bank,
+            urgency=urgencies[i % len(urgencies)],
+        )
+        if bank is not None and i % 5 == 1:
+            hold(bank.pk, blood_request.blood_group, 1, blood_request=blood_request, notes='Sample hold')
+        Donation.objects.create(
+            donor=user, blood_group=groups[i % len(groups)], blood_bank=bank,
+            donation_date='2024-01-15' if i % 2 else None,
+        )
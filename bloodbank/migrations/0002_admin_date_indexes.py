@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:54
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bloodbank', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['created_at'], name='bloodrequest_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['created_at'], name='donation_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['donation_date'], name='donation_date_idx'),
+        ),
+    ]
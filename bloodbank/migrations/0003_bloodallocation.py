@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7 on 2026-10-19 18:55
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bloodbank', '0002_admin_date_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BloodAllocation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_group', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-')], max_length=5)),
+                ('units', models.PositiveIntegerField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('blood_bank', models.ForeignKey(on_delete=django.db.models.deletion.PROTECT, related_name='allocations', to='bloodbank.bloodbank')),
+                ('blood_request', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='allocations', to='bloodbank.bloodrequest')),
+            ],
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bloodbank', '0004_idempotencyrecord'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='bloodinventory',
+            index=models.Index(fields=['blood_group', 'units_available'], name='inventory_group_units_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['status', 'blood_group', 'created_at'], name='bloodrequest_status_group_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['status', 'created_at'], name='bloodrequest_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['blood_group', 'created_at'], name='bloodrequest_group_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['requester', 'created_at'], name='bloodrequest_requester_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['status', 'blood_group', 'created_at'], name='donation_status_group_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['status', 'created_at'], name='donation_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['blood_group', 'created_at'], name='donation_group_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['donor', 'created_at'], name='donation_donor_idx'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:05
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bloodbank', '0005_endpoint_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedDonation',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('blood_group', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-')], max_length=5)),
+                ('units_donated', models.PositiveIntegerField(default=1)),
+                ('donation_date', models.DateField(blank=True, null=True)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('completed', 'Completed')], max_length=20)),
+                ('admin_notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('blood_bank', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='bloodbank.bloodbank')),
+                ('donor', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='archiveddonation_created_idx'), models.Index(fields=['donor', 'created_at'], name='archiveddonation_user_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchivedBloodRequest',
+            fields=[
+                ('id', models.BigIntegerField(primary_key=True, serialize=False)),
+                ('blood_group', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-')], max_length=5)),
+                ('units_required', models.PositiveIntegerField(default=1)),
+                ('reason', models.TextField()),
+                ('urgency', models.CharField(default='medium', max_length=20)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('approved', 'Approved'), ('rejected', 'Rejected'), ('fulfilled', 'Fulfilled')], max_length=20)),
+                ('admin_notes', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField()),
+                ('allocations', models.JSONField(blank=True, default=list)),
+                ('archived_at', models.DateTimeField(auto_now_add=True)),
+                ('blood_bank', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='bloodbank.bloodbank')),
+                ('requester', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['created_at'], name='archivedrequest_created_idx'), models.Index(fields=['requester', 'created_at'], name='archivedrequest_user_idx')],
+            },
+        ),
+    ]
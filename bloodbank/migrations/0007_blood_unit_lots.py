@@ -0,0 +1,34 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:14
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bloodbank', '0006_archive_tables'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BloodUnitLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_group', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-')], max_length=5)),
+                ('component', models.CharField(choices=[('whole_blood', 'Whole Blood'), ('red_cells', 'Red Cells'), ('platelets', 'Platelets'), ('plasma', 'Plasma')], default='whole_blood', max_length=20)),
+                ('collection_date', models.DateField(blank=True, null=True)),
+                ('expiry_date', models.DateField(blank=True, null=True)),
+                ('units_received', models.PositiveIntegerField()),
+                ('units_remaining', models.PositiveIntegerField()),
+                ('units_expired', models.PositiveIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('retired_at', models.DateTimeField(blank=True, null=True)),
+                ('blood_bank', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lots', to='bloodbank.bloodbank')),
+                ('donation', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='lots', to='bloodbank.donation')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['blood_bank', 'blood_group', 'expiry_date'], name='lot_fefo_idx'), models.Index(condition=models.Q(('units_remaining__gt', 0)), fields=['expiry_date'], name='lot_live_expiry_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:33
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bloodbank', '0007_blood_unit_lots'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tombstone',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('collection', models.CharField(max_length=30)),
+                ('object_id', models.BigIntegerField()),
+                ('deleted_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='bloodbank',
+            index=models.Index(fields=['updated_at', 'id'], name='bloodbank_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodinventory',
+            index=models.Index(fields=['last_updated', 'id'], name='inventory_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(fields=['updated_at', 'id'], name='bloodrequest_updated_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='donation',
+            index=models.Index(fields=['updated_at', 'id'], name='donation_updated_idx'),
+        ),
+        migrations.AddField(
+            model_name='tombstone',
+            name='owner',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='tombstone',
+            index=models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_idx'),
+        ),
+    ]
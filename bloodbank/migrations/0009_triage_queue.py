@@ -0,0 +1,46 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:41
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+URGENCY_RANKS = {'low': 1, 'medium': 2, 'high': 3, 'critical': 4}
+
+
+def set_urgency_rank(apps, schema_editor):
+    BloodRequest = apps.get_model('bloodbank', 'BloodRequest')
+    requests = BloodRequest.objects.using(schema_editor.connection.alias)
+    for urgency, rank in URGENCY_RANKS.items():
+        requests.filter(urgency=urgency).update(urgency_rank=rank)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bloodbank', '0008_sync_feed'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bloodrequest',
+            name='claim_expires_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='bloodrequest',
+            name='claimed_by',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddField(
+            model_name='bloodrequest',
+            name='urgency_rank',
+            field=models.PositiveSmallIntegerField(default=2, editable=False),
+        ),
+        migrations.RunPython(set_urgency_rank, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='bloodrequest',
+            index=models.Index(condition=models.Q(('status', 'pending')), fields=['-urgency_rank', 'created_at'], name='bloodrequest_triage_idx'),
+        ),
+    ]
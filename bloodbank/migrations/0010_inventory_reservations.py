@@ -0,0 +1,41 @@
+# Generated by Django 4.2.7 on 2026-10-19 19:48
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('bloodbank', '0009_triage_queue'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bloodinventory',
+            name='units_reserved',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='Reservation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('blood_group', models.CharField(choices=[('A+', 'A+'), ('A-', 'A-'), ('B+', 'B+'), ('B-', 'B-'), ('AB+', 'AB+'), ('AB-', 'AB-'), ('O+', 'O+'), ('O-', 'O-')], max_length=5)),
+                ('units', models.PositiveIntegerField()),
+                ('notes', models.CharField(blank=True, max_length=255)),
+                ('status', models.CharField(choices=[('held', 'Held'), ('fulfilled', 'Fulfilled'), ('released', 'Released'), ('expired', 'Expired')], default='held', max_length=20)),
+                ('expires_at', models.DateTimeField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('blood_bank', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='bloodbank.bloodbank')),
+                ('blood_request', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='reservations', to='bloodbank.bloodrequest')),
+                ('inventory', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reservations', to='bloodbank.bloodinventory')),
+                ('reserved_by', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('status', 'held')), fields=['expires_at'], name='reservation_expiry_idx'), models.Index(fields=['created_at'], name='reservation_created_idx'), models.Index(fields=['status', 'created_at'], name='reservation_status_idx'), models.Index(fields=['blood_bank', 'created_at'], name='reservation_bank_idx')],
+            },
+        ),
+    ]
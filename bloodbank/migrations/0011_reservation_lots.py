@@ -0,0 +1,28 @@
+# Generated by Django 4.2.7 on 2026-10-19 20:25
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bloodbank', '0010_inventory_reservations'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bloodunitlot',
+            name='units_reserved',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='ReservationLot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('units', models.PositiveIntegerField()),
+                ('lot', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holds', to='bloodbank.bloodunitlot')),
+                ('reservation', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lots', to='bloodbank.reservation')),
+            ],
+        ),
+    ]
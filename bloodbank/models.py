@@ -13,6 +13,12 @@ class BloodBank(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            # Change feed order for /api/sync/
+            models.Index(fields=['updated_at', 'id'], name='bloodbank_updated_idx'),
+        ]
+
     def __str__(self):
         return self.name
 
@@ -32,11 +38,18 @@ class BloodInventory(models.Model):
     blood_bank = models.ForeignKey(BloodBank, on_delete=models.CASCADE, related_name='inventory')
     blood_group = models.CharField(max_length=5, choices=BLOOD_GROUP_CHOICES)
     units_available = models.PositiveIntegerField(default=0)
+    # Held back by open reservations; already taken out of units_available
+    units_reserved = models.PositiveIntegerField(default=0)
     last_updated = models.DateTimeField(auto_now=True)
 
     class Meta:
         unique_together = ('blood_bank', 'blood_group')
         verbose_name_plural = 'Blood Inventories'
+        indexes = [
+            # Covers the per-group SUM on both dashboards
+            models.Index(fields=['blood_group', 'units_available'], name='inventory_group_units_idx'),
+            models.Index(fields=['last_updated', 'id'], name='inventory_updated_idx'),
+        ]
 
     def __str__(self):
         return f"{self.blood_bank.name} - {self.blood_group}: {self.units_available} units"
@@ -71,15 +84,44 @@ class BloodRequest(models.Model):
         ('high', 'High'),
         ('critical', 'Critical'),
     ], default='medium')
+    # Higher is more urgent; kept in step with urgency by save() for the triage queue
+    urgency_rank = models.PositiveSmallIntegerField(default=2, editable=False)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
     blood_bank = models.ForeignKey(BloodBank, on_delete=models.SET_NULL, null=True, blank=True, related_name='requests')
     admin_notes = models.TextField(blank=True)
+    # Triage lease: the admin working on this request, until claim_expires_at
+    claimed_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    claim_expires_at = models.DateTimeField(null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    URGENCY_RANKS = {'low': 1, 'medium': 2, 'high': 3, 'critical': 4}
+
+    class Meta:
+        indexes = [
+            # Only pending requests are triaged, so only they are indexed
+            models.Index(
+                fields=['-urgency_rank', 'created_at'], name='bloodrequest_triage_idx',
+                condition=models.Q(status='pending'),
+            ),
+            models.Index(fields=['created_at'], name='bloodrequest_created_idx'),
+            models.Index(fields=['status', 'blood_group', 'created_at'], name='bloodrequest_status_group_idx'),
+            models.Index(fields=['status', 'created_at'], name='bloodrequest_status_idx'),
+            models.Index(fields=['blood_group', 'created_at'], name='bloodrequest_group_idx'),
+            models.Index(fields=['requester', 'created_at'], name='bloodrequest_requester_idx'),
+            models.Index(fields=['updated_at', 'id'], name='bloodrequest_updated_idx'),
+        ]
+
     def __str__(self):
         return f"{self.requester.username} - {self.blood_group} - {self.status}"
 
+    def save(self, *args, **kwargs):
+        self.urgency_rank = self.URGENCY_RANKS.get(self.urgency, self.URGENCY_RANKS['medium'])
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None and 'urgency' in update_fields:
+            kwargs['update_fields'] = {*update_fields, 'urgency_rank'}
+        super().save(*args, **kwargs)
+
 
 class Donation(models.Model):
     STATUS_CHOICES = [
@@ -99,6 +141,234 @@ class Donation(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='donation_created_idx'),
+            models.Index(fields=['donation_date'], name='donation_date_idx'),
+            models.Index(fields=['status', 'blood_group', 'created_at'], name='donation_status_group_idx'),
+            models.Index(fields=['status', 'created_at'], name='donation_status_idx'),
+            models.Index(fields=['blood_group', 'created_at'], name='donation_group_idx'),
+            models.Index(fields=['donor', 'created_at'], name='donation_donor_idx'),
+            models.Index(fields=['updated_at', 'id'], name='donation_updated_idx'),
+        ]
+
     def __str__(self):
         return f"{self.donor.username} - {self.blood_group} - {self.status}"
 
+
+class ArchivedBloodRequest(models.Model):
+    """
+    Closed ``BloodRequest`` moved out of the hot table by ``archive_closed_records``.
+
+    Keeps the original primary key; ``allocations`` holds the request's
+    ``BloodAllocation`` rows, which are deleted with the hot row.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    requester = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    blood_group = models.CharField(max_length=5, choices=BloodRequest.BLOOD_GROUP_CHOICES)
+    units_required = models.PositiveIntegerField(default=1)
+    reason = models.TextField()
+    urgency = models.CharField(max_length=20, default='medium')
+    status = models.CharField(max_length=20, choices=BloodRequest.STATUS_CHOICES)
+    blood_bank = models.ForeignKey(BloodBank, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    admin_notes = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    allocations = models.JSONField(default=list, blank=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='archivedrequest_created_idx'),
+            models.Index(fields=['requester', 'created_at'], name='archivedrequest_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.requester_id} - {self.blood_group} - {self.status} (archived)"
+
+
+class ArchivedDonation(models.Model):
+    """
+    Closed ``Donation`` moved out of the hot table by ``archive_closed_records``.
+    """
+    id = models.BigIntegerField(primary_key=True)
+    donor = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+    blood_group = models.CharField(max_length=5, choices=DonorProfile.BLOOD_GROUP_CHOICES)
+    units_donated = models.PositiveIntegerField(default=1)
+    donation_date = models.DateField(null=True, blank=True)
+    blood_bank = models.ForeignKey(BloodBank, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    status = models.CharField(max_length=20, choices=Donation.STATUS_CHOICES)
+    admin_notes = models.TextField(blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['created_at'], name='archiveddonation_created_idx'),
+            models.Index(fields=['donor', 'created_at'], name='archiveddonation_user_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.donor_id} - {self.blood_group} - {self.status} (archived)"
+
+
+
+class BloodAllocation(models.Model):
+    """
+    Units issued from one bank's inventory towards an approved blood request.
+    """
+    blood_request = models.ForeignKey(BloodRequest, on_delete=models.CASCADE, related_name='allocations')
+    blood_bank = models.ForeignKey(BloodBank, on_delete=models.PROTECT, related_name='allocations')
+    blood_group = models.CharField(max_length=5, choices=BloodInventory.BLOOD_GROUP_CHOICES)
+    units = models.PositiveIntegerField()
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"Request #{self.blood_request_id} - {self.blood_bank.name} - {self.blood_group}: {self.units} units"
+
+
+class BloodUnitLot(models.Model):
+    """
+    Units of one component collected together, with their expiry date.
+
+    ``BloodInventory.units_available`` stays the aggregate per (bank, group)
+    and is adjusted alongside the lots; stock added before lots existed, or
+    edited directly, is simply untracked. Lots without an expiry date are
+    drawn last and never swept.
+
+    ``units_reserved`` of ``units_remaining`` are pinned by open holds
+    (``ReservationLot``); approvals only draw the rest.
+    """
+    COMPONENT_CHOICES = [
+        ('whole_blood', 'Whole Blood'),
+        ('red_cells', 'Red Cells'),
+        ('platelets', 'Platelets'),
+        ('plasma', 'Plasma'),
+    ]
+
+    blood_bank = models.ForeignKey(BloodBank, on_delete=models.CASCADE, related_name='lots')
+    blood_group = models.CharField(max_length=5, choices=BloodInventory.BLOOD_GROUP_CHOICES)
+    component = models.CharField(max_length=20, choices=COMPONENT_CHOICES, default='whole_blood')
+    donation = models.ForeignKey(Donation, on_delete=models.SET_NULL, null=True, blank=True, related_name='lots')
+    collection_date = models.DateField(null=True, blank=True)
+    expiry_date = models.DateField(null=True, blank=True)
+    units_received = models.PositiveIntegerField()
+    units_remaining = models.PositiveIntegerField()
+    units_reserved = models.PositiveIntegerField(default=0)
+    units_expired = models.PositiveIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    retired_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # First-expiry-first-out draw-down within one bank and group
+            models.Index(fields=['blood_bank', 'blood_group', 'expiry_date'], name='lot_fefo_idx'),
+            # The expiry sweeper only ever reads lots that still hold units
+            models.Index(fields=['expiry_date'], condition=models.Q(units_remaining__gt=0), name='lot_live_expiry_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.blood_bank.name} - {self.blood_group} {self.component}: {self.units_remaining} units, expires {self.expiry_date}"
+
+
+class Reservation(models.Model):
+    """
+    Units of one bank's stock held back until ``expires_at``.
+
+    Holding moves the units from ``BloodInventory.units_available`` to
+    ``units_reserved``; fulfilling debits them for good, and releasing or
+    expiring moves them back.
+    """
+    STATUS_CHOICES = [
+        ('held', 'Held'),
+        ('fulfilled', 'Fulfilled'),
+        ('released', 'Released'),
+        ('expired', 'Expired'),
+    ]
+
+    inventory = models.ForeignKey(BloodInventory, on_delete=models.CASCADE, related_name='reservations')
+    blood_bank = models.ForeignKey(BloodBank, on_delete=models.CASCADE, related_name='reservations')
+    blood_group = models.CharField(max_length=5, choices=BloodInventory.BLOOD_GROUP_CHOICES)
+    units = models.PositiveIntegerField()
+    blood_request = models.ForeignKey(BloodRequest, on_delete=models.SET_NULL, null=True, blank=True, related_name='reservations')
+    reserved_by = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    notes = models.CharField(max_length=255, blank=True)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='held')
+    expires_at = models.DateTimeField()
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # The expiry sweeper only ever reads holds that are still open
+            models.Index(fields=['expires_at'], condition=models.Q(status='held'), name='reservation_expiry_idx'),
+            models.Index(fields=['created_at'], name='reservation_created_idx'),
+            models.Index(fields=['status', 'created_at'], name='reservation_status_idx'),
+            models.Index(fields=['blood_bank', 'created_at'], name='reservation_bank_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.blood_bank.name} - {self.blood_group}: {self.units} units {self.status}"
+
+
+class ReservationLot(models.Model):
+    """
+    Units of one lot pinned by an open hold, so they are issued when the
+    hold is fulfilled and nothing else draws them first. Removed when the
+    hold closes; units a hold took from untracked stock have no row.
+    """
+    reservation = models.ForeignKey(Reservation, on_delete=models.CASCADE, related_name='lots')
+    lot = models.ForeignKey(BloodUnitLot, on_delete=models.CASCADE, related_name='holds')
+    units = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"Reservation {self.reservation_id}: {self.units} units of lot {self.lot_id}"
+
+
+class IdempotencyRecord(models.Model):
+    """
+    Stored response for a write made with an ``Idempotency-Key`` header.
+
+    A row without ``status_code`` marks a request that is still in flight.
+    """
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='idempotency_records')
+    key = models.CharField(max_length=255)
+    fingerprint = models.CharField(max_length=64)
+    status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+    response_body = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    expires_at = models.DateTimeField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'key'], name='idempotency_user_key_uniq'),
+        ]
+        indexes = [
+            models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.user_id} - {self.key}"
+
+
+class Tombstone(models.Model):
+    """
+    A row deleted through the API, kept so the ``/api/sync/`` change feed
+    can tell clients to drop it. Purged after ``SYNC['TOMBSTONE_TTL']``.
+
+    ``owner`` is the donor a deleted request or donation belonged to, who
+    is the only donor told about it.
+    """
+    collection = models.CharField(max_length=30)
+    object_id = models.BigIntegerField()
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, null=True, blank=True, related_name='+')
+    deleted_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['deleted_at', 'id'], name='tombstone_deleted_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.collection} #{self.object_id} deleted"
@@ -0,0 +1,84 @@
+from accounts.projections import USER_PROJECTION
+from blood_management.projections import Projection
+
+
+# Each projection mirrors the serializer of the same name, key order included
+BLOOD_BANK_PROJECTION = Projection([
+    ('id', 'id', None),
+    ('name', 'name', None),
+    ('address', 'address', None),
+    ('city', 'city', None),
+    ('state', 'state', None),
+    ('phone', 'phone', None),
+    ('email', 'email', None),
+    ('is_active', 'is_active', None),
+    ('created_at', 'created_at', 'datetime'),
+    ('updated_at', 'updated_at', 'datetime'),
+])
+
+BLOOD_INVENTORY_PROJECTION = Projection([
+    ('id', 'id', None),
+    ('blood_bank_name', 'blood_bank__name', None),
+    ('blood_group', 'blood_group', None),
+    ('units_available', 'units_available', None),
+    ('units_reserved', 'units_reserved', None),
+    ('last_updated', 'last_updated', 'datetime'),
+    ('blood_bank', 'blood_bank', None),
+], expandable={'blood_bank': BLOOD_BANK_PROJECTION})
+
+BLOOD_REQUEST_PROJECTION = Projection([
+    ('id', 'id', None),
+    ('requester_name', 'requester__username', None),
+    ('requester_email', 'requester__email', None),
+    ('blood_bank_name', 'blood_bank__name', None),
+    ('blood_group', 'blood_group', None),
+    ('units_required', 'units_required', None),
+    ('reason', 'reason', None),
+    ('urgency', 'urgency', None),
+    ('status', 'status', None),
+    ('admin_notes', 'admin_notes', None),
+    ('created_at', 'created_at', 'datetime'),
+    ('updated_at', 'updated_at', 'datetime'),
+    ('requester', 'requester', None),
+    ('blood_bank', 'blood_bank', None),
+], expandable={'requester': USER_PROJECTION, 'blood_bank': BLOOD_BANK_PROJECTION})
+
+# Triage queue rows: a request plus who holds its lease
+TRIAGE_PROJECTION = Projection([
+    *BLOOD_REQUEST_PROJECTION.columns,
+    ('urgency_rank', 'urgency_rank', None),
+    ('claimed_by', 'claimed_by', None),
+    ('claim_expires_at', 'claim_expires_at', 'datetime'),
+], expandable=BLOOD_REQUEST_PROJECTION.expandable)
+
+DONATION_PROJECTION = Projection([
+    ('id', 'id', None),
+    ('donor_name', 'donor__username', None),
+    ('donor_email', 'donor__email', None),
+    ('blood_bank_name', 'blood_bank__name', None),
+    ('blood_group', 'blood_group', None),
+    ('units_donated', 'units_donated', None),
+    ('donation_date', 'donation_date', 'date'),
+    ('status', 'status', None),
+    ('admin_notes', 'admin_notes', None),
+    ('created_at', 'created_at', 'datetime'),
+    ('updated_at', 'updated_at', 'datetime'),
+    ('donor', 'donor', None),
+    ('blood_bank', 'blood_bank', None),
+], expandable={'donor': USER_PROJECTION, 'blood_bank': BLOOD_BANK_PROJECTION})
+
+RESERVATION_PROJECTION = Projection([
+    ('id', 'id', None),
+    ('blood_bank_name', 'blood_bank__name', None),
+    ('blood_group', 'blood_group', None),
+    ('units', 'units', None),
+    ('notes', 'notes', None),
+    ('status', 'status', None),
+    ('expires_at', 'expires_at', 'datetime'),
+    ('created_at', 'created_at', 'datetime'),
+    ('updated_at', 'updated_at', 'datetime'),
+    ('inventory', 'inventory', None),
+    ('blood_bank', 'blood_bank', None),
+    ('blood_request', 'blood_request', None),
+    ('reserved_by', 'reserved_by', None),
+], expandable={'blood_bank': BLOOD_BANK_PROJECTION})
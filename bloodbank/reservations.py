@@ -0,0 +1,250 @@
+"""
+Time-limited holds on blood inventory.
+
+A hold moves units from ``BloodInventory.units_available`` to
+``units_reserved`` with one conditional UPDATE that only succeeds while the
+row still has the units, so concurrent holds can never oversubscribe a
+bank and ``units_available`` stays the number that can still be promised.
+Fulfilling a hold debits its units for good, like an approval does;
+releasing it, or letting it run past ``expires_at``, puts them back.
+
+A hold also pins its units in the bank's lots, earliest expiry first, so
+approvals can't draw them and fulfilling it issues exactly those. A pinned
+lot that expires takes its units off the hold.
+
+Expired holds are returned in batches by ``expire_reservations``, reading
+the partial index on open holds. A new hold on the same stock returns the
+expired holds there first, so a sweep that runs late never blocks it.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import router, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .allocation import AllocationLine, InsufficientStock, compatible_groups, get_allocation_setting
+from .cache import bump_inventory_version
+from .lots import pin, retire_expired, unpin
+from .models import BloodAllocation, BloodInventory, Reservation
+
+
+def get_reservation_setting(name, default=None):
+    return getattr(settings, 'RESERVATIONS', {}).get(name, default)
+
+
+class ReservationError(Exception):
+    pass
+
+
+def expiry_for(ttl=None, now=None):
+    """
+    When a hold taken ``now`` runs out, capped at ``RESERVATIONS['MAX_TTL']``.
+    """
+    ttl = ttl or get_reservation_setting('DEFAULT_TTL', timedelta(minutes=30))
+    ttl = min(ttl, get_reservation_setting('MAX_TTL', timedelta(hours=24)))
+    return (now or timezone.now()) + ttl
+
+
+def open_holds(now=None):
+    # Matches reservation_expiry_idx, so fulfilled and returned holds are never scanned
+    return Reservation.objects.filter(status='held', expires_at__lte=now or timezone.now())
+
+
+def hold(blood_bank_id, blood_group, units, user=None, blood_request=None, ttl=None, notes=''):
+    """
+    Reserve ``units`` of ``blood_group`` at a bank of the current shard.
+
+    Raises ``InsufficientStock`` when the bank can't spare them.
+    """
+    if units < 1:
+        raise ReservationError('Reserve at least one unit')
+    if blood_request is not None:
+        if blood_request.status != 'pending':
+            raise ReservationError('Only pending requests can have units reserved')
+        allow_substitutes = get_allocation_setting('ALLOW_COMPATIBLE_GROUPS', True)
+        if blood_group not in compatible_groups(blood_request.blood_group, allow_substitutes):
+            raise ReservationError(f'{blood_group} is not compatible with {blood_request.blood_group}')
+
+    now = timezone.now()
+    using = router.db_for_write(Reservation)
+    with transaction.atomic(using=using):
+        inventory_id = BloodInventory.objects.filter(
+            blood_bank_id=blood_bank_id, blood_group=blood_group,
+        ).values_list('pk', flat=True).first()
+        if inventory_id is None:
+            raise ReservationError(f'No inventory found for {blood_group} in selected blood bank')
+        # Neither expired lots nor expired holds may count towards what can be held
+        retire_expired(blood_bank_ids=[blood_bank_id], blood_groups=[blood_group])
+        expire_holds(now, inventory_ids=[inventory_id])
+
+        held = BloodInventory.objects.filter(pk=inventory_id, units_available__gte=units).update(
+            units_available=F('units_available') - units,
+            units_reserved=F('units_reserved') + units,
+            last_updated=now,
+        )
+        if not held:
+            available = BloodInventory.objects.filter(pk=inventory_id).values_list('units_available', flat=True).first()
+            raise InsufficientStock(available or 0, units)
+
+        reservation = Reservation.objects.create(
+            inventory_id=inventory_id,
+            blood_bank_id=blood_bank_id,
+            blood_group=blood_group,
+            units=units,
+            blood_request=blood_request,
+            reserved_by=user,
+            notes=notes,
+            expires_at=expiry_for(ttl, now),
+        )
+        pin(reservation)
+        transaction.on_commit(bump_inventory_version, using=using)
+    return reservation
+
+
+def _close(reservation, status, now, **changes):
+    """
+    Move ``reservation`` out of ``held``. Only one caller can ever win.
+    """
+    queryset = Reservation.objects.filter(pk=reservation.pk, status='held')
+    if status == 'fulfilled':
+        queryset = queryset.filter(expires_at__gt=now)
+    if not queryset.update(status=status, updated_at=now, **changes):
+        current = Reservation.objects.filter(pk=reservation.pk).values_list('status', flat=True).first()
+        if current == 'held':
+            raise ReservationError('Reservation has expired')
+        raise ReservationError(f'Reservation is already {current}')
+    reservation.status = status
+    reservation.updated_at = now
+    for name, value in changes.items():
+        setattr(reservation, name, value)
+
+
+def fulfil(reservation, blood_request=None, units=None):
+    """
+    Issue ``units`` (all of them by default) from a hold, recording them
+    against ``blood_request`` if given, and return what is left to stock.
+    Returns the ``AllocationLine`` issued.
+    """
+    # Pinned units in lots that have expired since come off the hold first
+    retire_expired(blood_bank_ids=[reservation.blood_bank_id], blood_groups=[reservation.blood_group])
+    reservation.refresh_from_db(fields=['units', 'status'])
+    if reservation.status != 'held':
+        raise ReservationError(f'Reservation is already {reservation.status}')
+    units = reservation.units if units is None else units
+    if not 0 < units <= reservation.units:
+        raise ReservationError(f'Reservation holds {reservation.units} units')
+    if blood_request is not None:
+        if reservation.blood_request_id not in (None, blood_request.pk):
+            raise ReservationError('Reservation is held for another blood request')
+        allow_substitutes = get_allocation_setting('ALLOW_COMPATIBLE_GROUPS', True)
+        if reservation.blood_group not in compatible_groups(blood_request.blood_group, allow_substitutes):
+            raise ReservationError(f'{reservation.blood_group} is not compatible with {blood_request.blood_group}')
+
+    now = timezone.now()
+    held = reservation.units
+    using = reservation._state.db or router.db_for_write(Reservation)
+    with transaction.atomic(using=using):
+        changes = {'units': units}
+        if blood_request is not None:
+            changes['blood_request'] = blood_request
+        _close(reservation, 'fulfilled', now, **changes)
+        BloodInventory.objects.filter(pk=reservation.inventory_id).update(
+            units_reserved=F('units_reserved') - held,
+            units_available=F('units_available') + (held - units),
+            last_updated=now,
+        )
+        unpin([reservation.pk], issue=units)
+        if blood_request is not None:
+            BloodAllocation.objects.create(
+                blood_request=blood_request,
+                blood_bank_id=reservation.blood_bank_id,
+                blood_group=reservation.blood_group,
+                units=units,
+            )
+        transaction.on_commit(bump_inventory_version, using=using)
+    return AllocationLine(
+        inventory_id=reservation.inventory_id,
+        blood_bank_id=reservation.blood_bank_id,
+        blood_bank_name=reservation.blood_bank.name,
+        blood_group=reservation.blood_group,
+        units=units,
+    )
+
+
+def release(reservation):
+    """
+    Give a hold's units back to available stock before it runs out.
+    """
+    now = timezone.now()
+    using = reservation._state.db or router.db_for_write(Reservation)
+    with transaction.atomic(using=using):
+        _close(reservation, 'released', now)
+        BloodInventory.objects.filter(pk=reservation.inventory_id).update(
+            units_reserved=F('units_reserved') - reservation.units,
+            units_available=F('units_available') + reservation.units,
+            last_updated=now,
+        )
+        unpin([reservation.pk])
+        transaction.on_commit(bump_inventory_version, using=using)
+
+
+def expire_holds(now=None, batch_size=None, inventory_ids=None):
+    """
+    Return one batch of expired holds to stock, earliest expiry first.
+    Returns ``{inventory_id: units}``.
+
+    ``inventory_ids`` narrows it to the stock a new hold is about to take;
+    without ``batch_size`` every match goes.
+    """
+    now = now or timezone.now()
+    candidates = open_holds(now)
+    if inventory_ids:
+        candidates = candidates.filter(inventory_id__in=inventory_ids)
+    candidates = candidates.order_by('expires_at', 'pk').values_list('pk', flat=True)
+    if batch_size:
+        candidates = candidates[:batch_size]
+
+    using = router.db_for_write(Reservation)
+    with transaction.atomic(using=using):
+        # Locked and re-read; a concurrent fulfil or release may have closed some
+        holds = list(
+            Reservation.objects.select_for_update()
+            .filter(pk__in=list(candidates), status='held').values_list('pk', 'inventory_id', 'units')
+        )
+        if not holds:
+            return {}
+        Reservation.objects.filter(pk__in=[pk for pk, _, _ in holds]).update(status='expired', updated_at=now)
+
+        returned = defaultdict(int)
+        for _, inventory_id, units in holds:
+            returned[inventory_id] += units
+        for inventory_id, units in sorted(returned.items()):
+            BloodInventory.objects.filter(pk=inventory_id).update(
+                units_reserved=F('units_reserved') - units,
+                units_available=F('units_available') + units,
+                last_updated=now,
+            )
+        unpin([pk for pk, _, _ in holds])
+        transaction.on_commit(bump_inventory_version, using=using)
+    return dict(returned)
+
+
+def sweep(now=None, batch_size=None, max_batches=None, on_batch=None):
+    """
+    Expire holds batch by batch, each in its own transaction, until none
+    are left or ``max_batches`` have run. Returns the units returned.
+    """
+    batch_size = batch_size or get_reservation_setting('SWEEP_BATCH_SIZE', 500)
+    total = 0
+    batches = 0
+    while max_batches is None or batches < max_batches:
+        returned = expire_holds(now, batch_size)
+        batches += 1
+        if not returned:
+            break
+        total += sum(returned.values())
+        if on_batch is not None:
+            on_batch(returned, total)
+    return total
@@ -1,40 +1,46 @@
 from rest_framework import serializers
-from .models import BloodBank, BloodInventory, BloodRequest, Donation
+from .models import BloodBank, BloodInventory, BloodRequest, Donation, Reservation
 from accounts.serializers import UserSerializer
+from blood_management.fieldsets import SparseFieldsetMixin
 
 
-class BloodBankSerializer(serializers.ModelSerializer):
+class BloodBankSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     class Meta:
         model = BloodBank
         fields = '__all__'
         read_only_fields = ('created_at', 'updated_at')
 
 
-class BloodInventorySerializer(serializers.ModelSerializer):
+class BloodInventorySerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     blood_bank_name = serializers.CharField(source='blood_bank.name', read_only=True)
+    expandable_fields = {'blood_bank': BloodBankSerializer}
     
     class Meta:
         model = BloodInventory
         fields = '__all__'
-        read_only_fields = ('last_updated',)
+        read_only_fields = ('units_reserved', 'last_updated')
 
 
-class BloodRequestSerializer(serializers.ModelSerializer):
+class BloodRequestSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     requester_name = serializers.CharField(source='requester.username', read_only=True)
     requester_email = serializers.EmailField(source='requester.email', read_only=True)
     blood_bank_name = serializers.CharField(source='blood_bank.name', read_only=True, allow_null=True)
+    expandable_fields = {'requester': UserSerializer, 'blood_bank': BloodBankSerializer}
     
     class Meta:
         model = BloodRequest
-        fields = '__all__'
+        # Triage bookkeeping is served by the triage endpoints
+        exclude = ('urgency_rank', 'claimed_by', 'claim_expires_at')
         read_only_fields = ('requester', 'created_at', 'updated_at')
+        extra_kwargs = {'units_required': {'min_value': 1}}
 
 
-class DonationSerializer(serializers.ModelSerializer):
+class DonationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     donor_name = serializers.CharField(source='donor.username', read_only=True)
     donor_email = serializers.EmailField(source='donor.email', read_only=True)
     blood_bank_name = serializers.CharField(source='blood_bank.name', read_only=True, allow_null=True)
     blood_group = serializers.CharField(required=False)  # Set from donor profile in view
+    expandable_fields = {'donor': UserSerializer, 'blood_bank': BloodBankSerializer}
     
     class Meta:
         model = Donation
@@ -42,6 +48,17 @@ class DonationSerializer(serializers.ModelSerializer):
         read_only_fields = ('donor', 'created_at', 'updated_at')
 
 
+class ReservationSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    blood_bank_name = serializers.CharField(source='blood_bank.name', read_only=True)
+    ttl_minutes = serializers.IntegerField(write_only=True, required=False, min_value=1)
+    expandable_fields = {'blood_bank': BloodBankSerializer}
+
+    class Meta:
+        model = Reservation
+        fields = '__all__'
+        read_only_fields = ('inventory', 'reserved_by', 'status', 'expires_at', 'created_at', 'updated_at')
+
+
 class DashboardStatsSerializer(serializers.Serializer):
     total_donors = serializers.IntegerField()
     total_blood_requests = serializers.IntegerField()
@@ -0,0 +1,32 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_migrate, post_save
+from django.dispatch import receiver
+
+from accounts.models import User
+from blood_management import sharding
+from .cache import bump_inventory_version
+from .models import BloodBank, BloodInventory
+
+
+@receiver([post_save, post_delete], sender=BloodInventory)
+@receiver([post_save, post_delete], sender=BloodBank)
+def invalidate_inventory_cache(sender, **kwargs):
+    # After commit, so a concurrent read can't cache pre-commit rows under the new version
+    transaction.on_commit(bump_inventory_version, using=kwargs.get('using'))
+
+
+# Every shard keeps a copy of the users its requests and donations point at
+@receiver(post_save, sender=User)
+def replicate_user(sender, instance, using, **kwargs):
+    sharding.replicate_user(instance, using)
+
+
+@receiver(post_delete, sender=User)
+def remove_user_copies(sender, instance, using, **kwargs):
+    sharding.remove_user(instance, using)
+
+
+@receiver(post_migrate)
+def reserve_shard_id_block(sender, using, **kwargs):
+    if sender.name == 'bloodbank':
+        sharding.reserve_id_block(using, sender.get_models())
@@ -0,0 +1,226 @@
+"""
+Change feed for clients that keep a local copy of their lists.
+
+``changes()`` returns the rows of each feed whose timestamp moved past the
+caller's ``since`` token, plus the ids deleted through the API since then,
+and a new token to send next time. Without a token it starts from scratch.
+Every feed is read in ``(timestamp, id)`` order through an index on those
+columns, so a resync costs what changed rather than what exists.
+
+The token is signed and holds one cursor per feed and shard. Cursors only
+move forward. They never pass ``now - SYNC['SETTLE']``: a transaction that
+commits after rows with later timestamps would otherwise be skipped. Rows
+newer than that are still sent, and sent again next time, so clients must
+apply changes as upserts by id. Large change sets come in pages of
+``SYNC['PAGE_SIZE']`` per feed, with ``has_more`` set until all are in.
+"""
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from accounts.models import DonorProfile
+from accounts.projections import DONOR_PROFILE_PROJECTION
+from blood_management.projections import Projection
+from blood_management.sharding import GLOBAL_DB, current_db, is_sharded_model, scatter
+from .models import BloodBank, BloodInventory, BloodRequest, Donation, Tombstone
+from .projections import (
+    BLOOD_BANK_PROJECTION, BLOOD_INVENTORY_PROJECTION, BLOOD_REQUEST_PROJECTION, DONATION_PROJECTION
+)
+
+
+TOKEN_SALT = 'bloodbank.sync'
+
+TOMBSTONE_PROJECTION = Projection([
+    ('id', 'id', None),
+    ('collection', 'collection', None),
+    ('object_id', 'object_id', None),
+    ('deleted_at', 'deleted_at', 'datetime'),
+])
+
+
+class SyncError(Exception):
+    pass
+
+
+class SyncTokenExpired(SyncError):
+    def __init__(self):
+        super().__init__('Sync token expired; sync again without "since"')
+
+
+def get_sync_setting(name, default=None):
+    return getattr(settings, 'SYNC', {}).get(name, default)
+
+
+@dataclass(frozen=True)
+class Feed:
+    name: str
+    model: type
+    projection: Projection
+    timestamp: str = 'updated_at'
+    admin_only: bool = False
+    # Donors only get their own rows; with ``own_only`` admins do too
+    owner: str = None
+    own_only: bool = False
+
+    def visible_to(self, user):
+        return user.role == 'admin' or not self.admin_only
+
+    def owned_only(self, user):
+        return self.owner is not None and (self.own_only or user.role != 'admin')
+
+    def queryset(self, user):
+        queryset = self.model.objects.all()
+        if self.owned_only(user):
+            queryset = queryset.filter(**{self.owner: user})
+        return queryset
+
+
+FEEDS = [
+    Feed('blood_banks', BloodBank, BLOOD_BANK_PROJECTION, admin_only=True),
+    Feed('blood_inventory', BloodInventory, BLOOD_INVENTORY_PROJECTION, timestamp='last_updated'),
+    Feed('blood_requests', BloodRequest, BLOOD_REQUEST_PROJECTION, owner='requester'),
+    Feed('donations', Donation, DONATION_PROJECTION, owner='donor'),
+    Feed('donor_profile', DonorProfile, DONOR_PROFILE_PROJECTION, owner='user', own_only=True),
+]
+
+
+def record_deletion(collection, object_ids, owner_id=None):
+    """
+    Leave tombstones for rows about to be deleted, in the current shard.
+    """
+    Tombstone.objects.bulk_create([
+        Tombstone(collection=collection, object_id=object_id, owner_id=owner_id) for object_id in object_ids
+    ])
+
+
+def encode_token(cursors, issued):
+    return signing.dumps({'c': cursors, 'i': issued.isoformat()}, salt=TOKEN_SALT, compress=True)
+
+
+def decode_token(token, now):
+    try:
+        payload = signing.loads(token, salt=TOKEN_SALT)
+    except signing.BadSignature:
+        raise SyncError('Invalid sync token')
+    issued = parse_datetime(payload['i'])
+    # Older tombstones may be gone, so deletes since then can't be reported
+    if issued < now - get_sync_setting('TOMBSTONE_TTL', timedelta(days=30)):
+        raise SyncTokenExpired()
+    return {
+        key: (parse_datetime(timestamp), pk)
+        for key, (timestamp, pk) in payload['c'].items()
+    }
+
+
+def _later(a, b):
+    """
+    The later of two ``(timestamp, id)`` cursors; an id of ``None`` is past
+    every row at that timestamp.
+    """
+    if a is None or b is None:
+        return a or b
+    if a[0] != b[0]:
+        return max(a, b, key=lambda cursor: cursor[0])
+    return a if a[1] is None or (b[1] is not None and a[1] >= b[1]) else b
+
+
+def read_feed(queryset, field, cursor, settle, limit, lookups):
+    """
+    Up to ``limit`` rows past ``cursor`` in ``(field, id)`` order. Returns
+    ``(rows, next_cursor, has_more)``.
+    """
+    if cursor is not None:
+        timestamp, pk = cursor
+        past = Q(**{f'{field}__gt': timestamp})
+        if pk is not None:
+            past |= Q(**{field: timestamp, 'pk__gt': pk})
+        queryset = queryset.filter(past)
+    rows = queryset.order_by(field, 'pk').values(*dict.fromkeys([*lookups, field, 'id']))
+
+    settled = list(rows.filter(**{f'{field}__lte': settle})[:limit + 1])
+    if len(settled) > limit:
+        settled = settled[:limit]
+        return settled, (settled[-1][field], settled[-1]['id']), True
+    recent = list(rows.filter(**{f'{field}__gt': settle})[:limit])
+    return settled + recent, (settle, None), False
+
+
+def _read_feeds(feeds, user, cursors, alias, settle, limit):
+    changes = {}
+    next_cursors = {}
+    has_more = False
+    for feed in feeds:
+        key = f'{alias}:{feed.name}'
+        rows, cursor, more = read_feed(
+            feed.queryset(user), feed.timestamp, cursors.get(key), settle, limit, feed.projection.lookups(),
+        )
+        changes[feed.name] = rows
+        next_cursors[key] = _later(cursors.get(key), cursor)
+        has_more = has_more or more
+    return changes, next_cursors, has_more
+
+
+def _read_tombstones(feeds, user, cursors, alias, settle, limit):
+    visible = Q(pk__in=[])
+    for feed in feeds:
+        if is_sharded_model(feed.model):
+            scope = Q(owner=user) if feed.owned_only(user) else Q()
+            visible |= Q(collection=feed.name) & scope
+    key = f'{alias}:deleted'
+    rows, cursor, more = read_feed(
+        Tombstone.objects.filter(visible), 'deleted_at', cursors.get(key), settle, limit,
+        TOMBSTONE_PROJECTION.lookups(),
+    )
+    return rows, {key: _later(cursors.get(key), cursor)}, more
+
+
+def changes(user, since=None, shards=None, request=None):
+    """
+    What changed for ``user`` since the ``since`` token, read from
+    ``shards`` (all by default) in parallel.
+    """
+    now = timezone.now()
+    cursors = decode_token(since, now) if since else {}
+    settle = now - get_sync_setting('SETTLE', timedelta(seconds=5))
+    limit = get_sync_setting('PAGE_SIZE', 500)
+    feeds = [feed for feed in FEEDS if feed.visible_to(user)]
+    sharded = [feed for feed in feeds if is_sharded_model(feed.model)]
+
+    collected, next_cursors, has_more = _read_feeds(
+        [feed for feed in feeds if feed not in sharded], user, cursors, GLOBAL_DB, settle, limit,
+    )
+    deleted = {feed.name: [] for feed in sharded}
+
+    def read_shard():
+        alias = current_db()
+        shard_changes, shard_cursors, more = _read_feeds(sharded, user, cursors, alias, settle, limit)
+        tombstones, tombstone_cursors, more_tombstones = _read_tombstones(
+            sharded, user, cursors, alias, settle, limit,
+        )
+        return shard_changes, {**shard_cursors, **tombstone_cursors}, more or more_tombstones, tombstones
+
+    for shard_changes, shard_cursors, more, tombstones in scatter(read_shard, aliases=shards).values():
+        for name, rows in shard_changes.items():
+            collected.setdefault(name, []).extend(rows)
+        next_cursors.update(shard_cursors)
+        has_more = has_more or more
+        for row in tombstones:
+            deleted[row['collection']].append(row['object_id'])
+
+    # Cursors of shards not read this time carry over unchanged
+    cursors.update(next_cursors)
+    return {
+        'changes': {
+            feed.name: feed.projection.to_dicts(collected[feed.name], request) for feed in feeds
+        },
+        'deleted': deleted,
+        'has_more': has_more,
+        'next': encode_token(
+            {key: [timestamp.isoformat(), pk] for key, (timestamp, pk) in cursors.items()}, now,
+        ),
+    }
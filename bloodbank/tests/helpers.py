@@ -0,0 +1,43 @@
+from django.core.cache import caches
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from accounts.models import DonorProfile, User
+from bloodbank.models import BloodBank, BloodInventory
+
+
+@override_settings(
+    ACCESS_LOG={'ENABLED': False},
+    PASSWORD_HASHERS=['django.contrib.auth.hashers.MD5PasswordHasher'],
+)
+class APITestCase(TestCase):
+    """
+    Requests go through the full middleware stack, minus the access log
+    file and slow password hashing, with fresh throttle buckets for every
+    test.
+    """
+
+    def setUp(self):
+        caches['throttle'].clear()
+
+    @classmethod
+    def make_admin(cls, username='admin'):
+        return User.objects.create_user(username, f'{username}@example.com', 'pw', role='admin', is_staff=True)
+
+    @classmethod
+    def make_donor(cls, username='donor', blood_group='O+', state='MH'):
+        donor = User.objects.create_user(username, f'{username}@example.com', 'pw', role='donor')
+        DonorProfile.objects.create(user=donor, blood_group=blood_group, city='Pune', state=state)
+        return donor
+
+    @classmethod
+    def make_bank(cls, name='Bank', units=0, groups=('O+',)):
+        bank = BloodBank.objects.create(name=name, address='1 Test Road', city='Pune', state='MH', phone='0')
+        for group in groups:
+            BloodInventory.objects.create(blood_bank=bank, blood_group=group, units_available=units)
+        return bank
+
+    def client_for(self, user):
+        client = APIClient()
+        client.force_authenticate(user)
+        return client
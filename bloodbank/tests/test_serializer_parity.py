@@ -0,0 +1,44 @@
+from django.test import TestCase
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+
+from blood_management.fieldsets import get_fieldset
+from bloodbank.management.commands.check_serializer_parity import CASES, FIELDSETS
+from bloodbank.management.sample_data import create_sample_data
+
+
+class SerializerParityTests(TestCase):
+    """
+    The values() projections must render the same JSON as the serializers
+    they stand in for, in full and restricted by ?fields= / ?expand=.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        create_sample_data(30)
+
+    def assertSameJSON(self, queryset, serializer_class, projection, request=None):
+        renderer = JSONRenderer()
+        context = {'request': request} if request is not None else {}
+        self.assertEqual(
+            renderer.render(projection.serialize(queryset, request)),
+            renderer.render(serializer_class(queryset, many=True, context=context).data),
+        )
+
+    def test_full_representation(self):
+        for label, model, serializer_class, projection in CASES:
+            with self.subTest(label):
+                queryset = model.objects.order_by('pk')
+                self.assertTrue(queryset.exists())
+                self.assertSameJSON(queryset, serializer_class, projection)
+
+    def test_fieldsets(self):
+        for label, model, serializer_class, projection in CASES:
+            for query_string in FIELDSETS:
+                with self.subTest(f'{label}?{query_string}'):
+                    request = Request(APIRequestFactory().get(f'/?{query_string}'))
+                    self.assertSameJSON(
+                        model.objects.order_by('pk'), serializer_class,
+                        projection.restrict(*get_fieldset(request)), request,
+                    )
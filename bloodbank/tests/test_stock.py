@@ -0,0 +1,178 @@
+from datetime import timedelta
+from unittest import mock
+
+from django.db.models import Sum
+from django.utils import timezone
+
+from bloodbank import lots, reservations
+from bloodbank.models import (
+    BloodAllocation, BloodInventory, BloodRequest, BloodUnitLot, Donation, Reservation, ReservationLot,
+)
+from bloodbank.tests.helpers import APITestCase
+
+
+class StockTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = cls.make_admin()
+        cls.donor = cls.make_donor()
+        cls.bank = cls.make_bank()
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.admin)
+        self.today = timezone.localdate()
+
+    def inventory(self):
+        return BloodInventory.objects.get(blood_bank=self.bank, blood_group='O+')
+
+    def donate(self, units, collected):
+        donation = Donation.objects.create(donor=self.donor, blood_group='O+', units_donated=units)
+        response = self.client.patch(f'/api/donations/{donation.pk}/approve-reject/', {
+            'action': 'approve', 'blood_bank_id': self.bank.pk, 'donation_date': str(collected),
+        }, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        return donation
+
+    def request_units(self, units):
+        return BloodRequest.objects.create(requester=self.donor, blood_group='O+', units_required=units, reason='Test')
+
+    def approve(self, blood_request, **extra):
+        return self.client.patch(f'/api/blood-requests/{blood_request.pk}/approve-reject/', {
+            'action': 'approve', 'blood_bank_id': self.bank.pk, **extra,
+        }, format='json')
+
+    def hold(self, units):
+        response = self.client.post('/api/reservations/', {
+            'blood_bank': self.bank.pk, 'blood_group': 'O+', 'units': units,
+        }, format='json')
+        self.assertEqual(response.status_code, 201, response.data)
+        return Reservation.objects.get(pk=response.data['id'])
+
+
+class ConservationTests(StockTestCase):
+    """
+    All stock here comes from donations, so the lots account for every unit:
+    what was donated, minus what was issued or expired, is on the shelf,
+    and what is on hold is exactly what the open holds pin.
+    """
+
+    def assertConserved(self, donated, issued, expired):
+        inventory = self.inventory()
+        lot_totals = BloodUnitLot.objects.aggregate(remaining=Sum('units_remaining'), reserved=Sum('units_reserved'))
+        held = Reservation.objects.filter(status='held').aggregate(total=Sum('units'))['total'] or 0
+
+        self.assertEqual(inventory.units_available + inventory.units_reserved, donated - issued - expired)
+        self.assertEqual(lot_totals['remaining'] or 0, donated - issued - expired)
+        self.assertEqual(inventory.units_reserved, held)
+        self.assertEqual(lot_totals['reserved'] or 0, held)
+        self.assertEqual(BloodAllocation.objects.aggregate(total=Sum('units'))['total'] or 0, issued)
+
+    def test_approve_donate_hold_expire_release(self):
+        # Lot A expires in 5 days, lot B in 35
+        self.donate(4, self.today - timedelta(days=30))
+        self.donate(4, self.today)
+        self.assertConserved(donated=8, issued=0, expired=0)
+
+        first = self.hold(3)
+        self.assertEqual(self.inventory().units_available, 5)
+        self.assertConserved(donated=8, issued=0, expired=0)
+
+        # The approval must leave lot A's pinned units alone
+        response = self.approve(self.request_units(2))
+        self.assertEqual(response.status_code, 200, response.data)
+        lot_a, lot_b = BloodUnitLot.objects.order_by('expiry_date')
+        self.assertEqual((lot_a.units_remaining, lot_a.units_reserved), (3, 3))
+        self.assertEqual(lot_b.units_remaining, 3)
+        self.assertConserved(donated=8, issued=2, expired=0)
+
+        # Lot A expiring takes its units off the hold, not off available stock
+        lots.retire_expired(today=self.today + timedelta(days=6))
+        first.refresh_from_db()
+        self.assertEqual((first.units, first.status), (0, 'expired'))
+        self.assertEqual(self.inventory().units_available, 3)
+        self.assertConserved(donated=8, issued=2, expired=3)
+
+        second = self.hold(2)
+        response = self.client.post(f'/api/reservations/{second.pk}/release/')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(self.inventory().units_available, 3)
+        self.assertFalse(ReservationLot.objects.exists())
+        self.assertConserved(donated=8, issued=2, expired=3)
+
+        self.hold(1)
+        reservations.sweep(now=timezone.now() + timedelta(days=2))
+        self.assertEqual(self.inventory().units_available, 3)
+        self.assertConserved(donated=8, issued=2, expired=3)
+
+    def test_fulfil_issues_pinned_units_and_returns_the_rest(self):
+        self.donate(4, self.today - timedelta(days=30))
+        self.donate(4, self.today)
+        reservation = self.hold(3)
+
+        response = self.client.post(f'/api/reservations/{reservation.pk}/fulfil/', {'units': 2}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        lot_a, lot_b = BloodUnitLot.objects.order_by('expiry_date')
+        self.assertEqual((lot_a.units_remaining, lot_a.units_reserved), (2, 0))
+        self.assertEqual(lot_b.units_remaining, 4)
+        self.assertEqual(self.inventory().units_available, 6)
+        self.assertEqual(self.inventory().units_reserved, 0)
+
+    def test_fulfil_refuses_a_hold_whose_lot_expired(self):
+        self.donate(3, self.today - timedelta(days=34))
+        reservation = self.hold(2)
+        BloodUnitLot.objects.update(expiry_date=self.today - timedelta(days=1))
+
+        response = self.client.post(f'/api/reservations/{reservation.pk}/fulfil/')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(BloodUnitLot.objects.get().units_expired, 3)
+        inventory = self.inventory()
+        self.assertEqual((inventory.units_available, inventory.units_reserved), (0, 0))
+
+
+class DoubleApprovalTests(StockTestCase):
+    def setUp(self):
+        super().setUp()
+        BloodInventory.objects.filter(blood_bank=self.bank).update(units_available=10)
+
+    def test_request_approved_twice(self):
+        blood_request = self.request_units(3)
+        self.assertEqual(self.approve(blood_request).status_code, 200)
+        self.assertEqual(self.approve(blood_request).status_code, 409)
+        self.assertEqual(self.inventory().units_available, 7)
+
+    def test_request_approved_from_a_stale_read(self):
+        # A concurrent approval committed after this one read the request
+        blood_request = self.request_units(3)
+        stale = BloodRequest.objects.get(pk=blood_request.pk)
+        self.assertEqual(self.approve(blood_request).status_code, 200)
+        with mock.patch.object(BloodRequest.objects, 'get', return_value=stale):
+            self.assertEqual(self.approve(blood_request).status_code, 409)
+        self.assertEqual(self.inventory().units_available, 7)
+        self.assertEqual(BloodAllocation.objects.count(), 1)
+
+    def test_donation_approved_twice(self):
+        donation = self.donate(2, self.today)
+        response = self.client.patch(f'/api/donations/{donation.pk}/approve-reject/', {
+            'action': 'approve', 'blood_bank_id': self.bank.pk, 'donation_date': str(self.today),
+        }, format='json')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.inventory().units_available, 12)
+
+    def test_donation_approved_from_a_stale_read(self):
+        donation = Donation.objects.create(donor=self.donor, blood_group='O+', units_donated=2)
+        stale = Donation.objects.get(pk=donation.pk)
+        body = {'action': 'approve', 'blood_bank_id': self.bank.pk, 'donation_date': str(self.today)}
+        url = f'/api/donations/{donation.pk}/approve-reject/'
+        self.assertEqual(self.client.patch(url, body, format='json', HTTP_IDEMPOTENCY_KEY='first').status_code, 200)
+        with mock.patch.object(Donation.objects, 'get', return_value=stale):
+            response = self.client.patch(url, body, format='json', HTTP_IDEMPOTENCY_KEY='second')
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(self.inventory().units_available, 12)
+        self.assertEqual(BloodUnitLot.objects.count(), 1)
+
+    def test_zero_unit_request_is_not_approved(self):
+        blood_request = self.request_units(0)
+        self.assertEqual(self.approve(blood_request).status_code, 400)
+        blood_request.refresh_from_db()
+        self.assertEqual(blood_request.status, 'pending')
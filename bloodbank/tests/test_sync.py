@@ -0,0 +1,82 @@
+from datetime import timedelta
+
+from django.test import override_settings
+from django.utils import timezone
+
+from bloodbank.models import BloodRequest
+from bloodbank.tests.helpers import APITestCase
+
+
+@override_settings(SYNC={'PAGE_SIZE': 2, 'SETTLE': timedelta(0), 'TOMBSTONE_TTL': timedelta(days=30)})
+class SyncFeedTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = cls.make_admin()
+        cls.donor = cls.make_donor()
+        cls.other = cls.make_donor('other')
+        cls.requests = [
+            BloodRequest.objects.create(requester=cls.donor, blood_group='O+', units_required=1, reason='Test')
+            for _ in range(5)
+        ]
+        BloodRequest.objects.create(requester=cls.other, blood_group='A+', units_required=1, reason='Test')
+        # Identical timestamps, so paging has to break ties on the id
+        BloodRequest.objects.update(updated_at=timezone.now() - timedelta(minutes=1))
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.donor)
+
+    def sync(self, since=None):
+        response = self.client.get('/api/sync/', {'since': since} if since else {})
+        self.assertEqual(response.status_code, 200, response.data)
+        return response.data
+
+    def sync_all(self, since=None):
+        """
+        Follow ``next`` while ``has_more``; returns the ids seen per page,
+        the tombstones and the last token.
+        """
+        pages, deleted = [], []
+        while True:
+            data = self.sync(since)
+            pages.append([row['id'] for row in data['changes']['blood_requests']])
+            deleted.extend(data['deleted']['blood_requests'])
+            since = data['next']
+            if not data['has_more']:
+                return pages, deleted, since
+
+    def test_pages_cover_every_row_once(self):
+        pages, deleted, _ = self.sync_all()
+        self.assertTrue(all(len(page) <= 2 for page in pages))
+        seen = [pk for page in pages for pk in page]
+        self.assertEqual(seen, sorted(request.pk for request in self.requests))
+        self.assertEqual(deleted, [])
+
+    def test_changes_and_deletions_since_token(self):
+        _, _, token = self.sync_all()
+
+        changed, removed = self.requests[1], self.requests[3]
+        self.client_for(self.admin).patch(f'/api/blood-requests/{changed.pk}/', {'reason': 'Edited'}, format='json')
+        response = self.client.delete(f'/api/blood-requests/{removed.pk}/')
+        self.assertEqual(response.status_code, 204)
+
+        pages, deleted, token = self.sync_all(token)
+        self.assertEqual([pk for page in pages for pk in page], [changed.pk])
+        self.assertEqual(deleted, [removed.pk])
+
+        # Nothing new: the tombstone is not sent again
+        pages, deleted, _ = self.sync_all(token)
+        self.assertEqual([pk for page in pages for pk in page], [])
+        self.assertEqual(deleted, [])
+
+    def test_other_donors_tombstones_are_not_sent(self):
+        _, _, token = self.sync_all()
+        theirs = BloodRequest.objects.get(requester=self.other)
+        self.client_for(self.admin).delete(f'/api/blood-requests/{theirs.pk}/')
+
+        _, deleted, _ = self.sync_all(token)
+        self.assertEqual(deleted, [])
+
+    def test_invalid_token(self):
+        response = self.client.get('/api/sync/', {'since': 'not-a-token'})
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,80 @@
+from django.core.cache import caches
+from django.test import override_settings
+from rest_framework.test import APIClient
+
+from blood_management.throttling import SlidingWindowBucket
+from bloodbank.tests.helpers import APITestCase
+
+
+def throttling(**overrides):
+    return override_settings(THROTTLING={
+        'CACHE': 'throttle',
+        'RATES': {'user': '1000/day', 'ip': '1000/day'},
+        'ENDPOINT_RATES': {},
+        'COSTS': {},
+        **overrides,
+    })
+
+
+class BucketTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.donors = [cls.make_donor(f'donor{index}') for index in range(4)]
+
+    def search(self, user):
+        return self.client_for(user).get('/api/search-donors/')
+
+    def user_bucket(self, user, limit):
+        return SlidingWindowBucket(caches['throttle'], f'throttle:user:{user.pk}', limit, 86400)
+
+    @throttling(ENDPOINT_RATES={'search_donors': '3/day'}, COSTS={'search_donors': 5})
+    def test_endpoint_bucket_counts_calls_not_cost(self):
+        # At 5 tokens a call the shared budget would be gone after none
+        statuses = [self.search(donor).status_code for donor in self.donors]
+        self.assertEqual(statuses, [200, 200, 200, 429])
+
+    @throttling(RATES={'user': '10/day', 'ip': '1000/day'}, COSTS={'search_donors': 5})
+    def test_user_bucket_spends_cost(self):
+        donor = self.donors[0]
+        statuses = [self.search(donor).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        # Another user's budget is untouched
+        self.assertEqual(self.search(self.donors[1]).status_code, 200)
+
+    @throttling(
+        RATES={'user': '10/day', 'ip': '1000/day'},
+        ENDPOINT_RATES={'search_donors': '2/day'}, COSTS={'search_donors': 5},
+    )
+    def test_refused_call_spends_nothing(self):
+        first, second = self.donors[:2]
+        self.assertEqual(self.search(first).status_code, 200)
+        self.assertEqual(self.search(second).status_code, 200)
+        # Refused by the endpoint bucket; the user's tokens are given back
+        self.assertEqual(self.search(first).status_code, 429)
+        bucket = self.user_bucket(first, 10)
+        self.assertEqual(bucket.peek(5), 0)
+        self.assertGreater(bucket.peek(6), 0)
+
+    def test_one_address_cannot_lock_everyone_out_of_login(self):
+        # Default settings: login costs 10 of the 300/min per-IP budget
+        attacker = APIClient(REMOTE_ADDR='203.0.113.7')
+        statuses = [
+            attacker.post('/api/auth/login/', {'username': 'x', 'password': 'y'}, format='json').status_code
+            for _ in range(35)
+        ]
+        self.assertIn(429, statuses)
+
+        hospital = APIClient(REMOTE_ADDR='198.51.100.20')
+        response = hospital.post('/api/auth/login/', {'username': 'donor0', 'password': 'pw'}, format='json')
+        self.assertEqual(response.status_code, 200)
+
+    @throttling(RATES={'user': '1000/day', 'ip': '2/day'})
+    def test_ip_bucket_only_limits_anonymous_clients(self):
+        donor = self.donors[0]
+        client = self.client_for(donor)
+        statuses = [client.get('/api/search-donors/', REMOTE_ADDR='203.0.113.9').status_code for _ in range(4)]
+        self.assertEqual(statuses, [200] * 4)
+
+        anonymous = APIClient(REMOTE_ADDR='203.0.113.9')
+        statuses = [anonymous.post('/api/auth/login/', {}, format='json').status_code for _ in range(3)]
+        self.assertEqual(statuses[-1], 429)
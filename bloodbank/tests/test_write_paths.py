@@ -0,0 +1,120 @@
+from django.test import override_settings
+
+from bloodbank.models import BloodInventory, BloodRequest, IdempotencyRecord
+from bloodbank.tests.helpers import APITestCase
+
+
+class WritePathTestCase(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = cls.make_admin()
+        cls.donor = cls.make_donor()
+        cls.bank = cls.make_bank(units=10)
+
+    def setUp(self):
+        super().setUp()
+        self.client = self.client_for(self.admin)
+
+    def request_units(self, units=2):
+        return BloodRequest.objects.create(requester=self.donor, blood_group='O+', units_required=units, reason='Test')
+
+    def units_available(self):
+        return BloodInventory.objects.get(blood_bank=self.bank, blood_group='O+').units_available
+
+
+class IdempotencyTests(WritePathTestCase):
+    def approve(self, blood_request, key, **extra):
+        return self.client.patch(f'/api/blood-requests/{blood_request.pk}/approve-reject/', {
+            'action': 'approve', 'blood_bank_id': self.bank.pk, **extra,
+        }, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_retry_replays_the_stored_response(self):
+        blood_request = self.request_units()
+        first = self.approve(blood_request, 'retry')
+        second = self.approve(blood_request, 'retry')
+        self.assertEqual(first.status_code, 200)
+        self.assertEqual(second.status_code, 200)
+        self.assertEqual(second['Idempotent-Replayed'], 'true')
+        self.assertEqual(second.data, first.data)
+        self.assertEqual(self.units_available(), 8)
+
+    def test_key_reused_for_another_body(self):
+        blood_request = self.request_units()
+        self.approve(blood_request, 'reused')
+        response = self.approve(blood_request, 'reused', admin_notes='Different')
+        self.assertEqual(response.status_code, 422)
+
+    def test_duplicate_while_in_flight_is_refused_at_once(self):
+        blood_request = self.request_units()
+        self.approve(blood_request, 'busy')
+        # As if the first attempt were still running
+        IdempotencyRecord.objects.filter(key='busy').update(status_code=None, response_body='')
+        response = self.approve(blood_request, 'busy')
+        self.assertEqual(response.status_code, 409)
+        self.assertIn('still being processed', response.data['error'])
+        self.assertEqual(self.units_available(), 8)
+
+
+class BulkReviewTests(WritePathTestCase):
+    url = '/api/blood-requests/bulk-approve-reject/'
+
+    def test_body_must_be_an_object(self):
+        response = self.client.post(self.url, [{'id': 1, 'action': 'approve'}], format='json')
+        self.assertEqual(response.status_code, 400)
+
+    def test_items_fail_independently(self):
+        approved, already, empty = self.request_units(3), self.request_units(1), self.request_units(0)
+        BloodRequest.objects.filter(pk=already.pk).update(status='rejected')
+        response = self.client.post(self.url, {'items': [
+            {'id': approved.pk, 'action': 'approve', 'blood_bank_id': self.bank.pk},
+            {'id': already.pk, 'action': 'approve', 'blood_bank_id': self.bank.pk},
+            {'id': empty.pk, 'action': 'approve', 'blood_bank_id': self.bank.pk},
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual([result['ok'] for result in response.data['results']], [True, False, False])
+        self.assertEqual(self.units_available(), 7)
+
+    def test_second_bulk_approval_changes_nothing(self):
+        blood_request = self.request_units(3)
+        body = {'items': [{'id': blood_request.pk, 'action': 'approve', 'blood_bank_id': self.bank.pk}]}
+        self.client.post(self.url, body, format='json')
+        response = self.client.post(self.url, body, format='json')
+        self.assertEqual(response.data['failed'], 1)
+        self.assertEqual(self.units_available(), 7)
+
+
+class BatchTests(WritePathTestCase):
+    def test_sub_requests_keep_the_callers_permissions(self):
+        response = self.client_for(self.donor).post('/api/batch/', {'requests': [
+            '/api/auth/me/', '/api/blood-banks/', '/api/batch/', 'https://example.com/api/auth/me/',
+        ]}, format='json')
+        self.assertEqual(response.status_code, 200)
+        statuses = [item['status'] for item in response.data['responses']]
+        self.assertEqual(statuses, [200, 403, 400, 400])
+        self.assertEqual(response.data['responses'][0]['body']['username'], 'donor')
+
+    @override_settings(BATCH={'MAX_REQUESTS': 2})
+    def test_batch_size_is_capped(self):
+        response = self.client.post('/api/batch/', {'requests': ['/api/auth/me/'] * 3}, format='json')
+        self.assertEqual(response.status_code, 400)
+
+
+class DonorRegionTests(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.donor = cls.make_donor()
+
+    def move_to(self, state):
+        # Only the routing table matters to the check; no second database is needed
+        with self.settings(SHARDING={'SHARDS': {'default': ['MH', 'GA'], 'south': ['KA']}}):
+            return self.client_for(self.donor).patch('/api/auth/donor-profile/', {'state': state}, format='json')
+
+    def test_state_in_another_region_is_refused(self):
+        response = self.move_to('KA')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('state', response.data)
+        self.donor.donor_profile.refresh_from_db()
+        self.assertEqual(self.donor.donor_profile.state, 'MH')
+
+    def test_state_in_the_same_region_is_allowed(self):
+        self.assertEqual(self.move_to('GA').status_code, 200)
@@ -0,0 +1,156 @@
+"""
+Triage queue of pending blood requests for admins.
+
+Requests are ranked by a priority score: urgency first, then hours waited,
+which lets a request that has waited long climb past fresher, more urgent
+ones, then how much of it compatible stock in its region could cover right
+now, as those can be dealt with at once. Weights are in ``TRIAGE``.
+Candidates are the oldest ``TRIAGE['CANDIDATES']`` pending requests of each
+urgency, read through the partial index on pending requests, so ranking
+costs the same however long the queue grows.
+
+Several admins can work the queue at once by claiming requests. A claim is
+a lease of ``TRIAGE['LEASE']`` taken with a conditional UPDATE that only
+succeeds while nobody else holds an unexpired lease, so ``claim_next`` never
+hands two admins the same request. A request whose lease runs out returns to
+the queue.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db.models import Q, Sum
+from django.utils import timezone
+
+from blood_management.sharding import scatter, shard_for_pk, use_shard
+from .allocation import compatible_groups, get_allocation_setting
+from .models import BloodInventory, BloodRequest
+from .projections import TRIAGE_PROJECTION
+
+
+def get_triage_setting(name, default=None):
+    return getattr(settings, 'TRIAGE', {}).get(name, default)
+
+
+class TriageError(Exception):
+    pass
+
+
+def stock_by_group():
+    """
+    Units per blood group at the current shard's active banks.
+    """
+    return dict(
+        BloodInventory.objects.filter(blood_bank__is_active=True, units_available__gt=0)
+        .order_by().values('blood_group').annotate(total=Sum('units_available'))
+        .values_list('blood_group', 'total')
+    )
+
+
+def priority(row, compatible_units, now):
+    hours = min((now - row['created_at']).total_seconds() / 3600, get_triage_setting('MAX_AGE_HOURS', 72))
+    coverage = min(compatible_units / row['units_required'], 1) if row['units_required'] else 1
+    return round(
+        row['urgency_rank'] * get_triage_setting('URGENCY_WEIGHT', 100)
+        + hours * get_triage_setting('AGE_WEIGHT', 2)
+        + coverage * get_triage_setting('STOCK_WEIGHT', 25),
+        2,
+    )
+
+
+def claimable(now):
+    # Unclaimed, or the lease ran out
+    return Q(claimed_by__isnull=True) | Q(claim_expires_at__lte=now)
+
+
+def shard_queue(limit, now, unclaimed_only=False):
+    """
+    The current shard's ``limit`` highest priority pending requests, as
+    projection rows with ``priority`` and ``compatible_units`` added.
+    """
+    queryset = BloodRequest.objects.filter(status='pending')
+    if unclaimed_only:
+        queryset = queryset.filter(claimable(now))
+    candidates = max(limit, get_triage_setting('CANDIDATES', 50))
+    rows = []
+    for rank in sorted(set(BloodRequest.URGENCY_RANKS.values()), reverse=True):
+        rows.extend(TRIAGE_PROJECTION.values(queryset.filter(urgency_rank=rank).order_by('created_at'))[:candidates])
+    if not rows:
+        return []
+
+    stock = stock_by_group()
+    allow_substitutes = get_allocation_setting('ALLOW_COMPATIBLE_GROUPS', True)
+    for row in rows:
+        groups = compatible_groups(row['blood_group'], allow_substitutes)
+        row['compatible_units'] = sum(stock.get(group, 0) for group in groups)
+        row['priority'] = priority(row, row['compatible_units'], now)
+    return sorted(rows, key=_queue_order)[:limit]
+
+
+def _queue_order(row):
+    return -row['priority'], row['created_at'], row['id']
+
+
+def queue(limit=20, shards=None, unclaimed_only=False, now=None):
+    """
+    Pending requests across ``shards`` (all by default), highest priority
+    first.
+    """
+    now = now or timezone.now()
+    results = scatter(lambda: shard_queue(limit, now, unclaimed_only), aliases=shards)
+    return sorted((row for rows in results.values() for row in rows), key=_queue_order)[:limit]
+
+
+def serialize(rows, request=None):
+    return [
+        {**data, 'priority': row['priority'], 'compatible_units': row['compatible_units']}
+        for data, row in zip(TRIAGE_PROJECTION.to_dicts(rows, request), rows)
+    ]
+
+
+def _take_lease(pk, user, condition, now):
+    expires = now + get_triage_setting('LEASE', timedelta(minutes=10))
+    with use_shard(shard_for_pk(pk)):
+        taken = BloodRequest.objects.filter(condition, pk=pk, status='pending').update(
+            claimed_by=user, claim_expires_at=expires,
+        )
+    return expires if taken else None
+
+
+def claim_next(user, shards=None):
+    """
+    Lease the highest priority request nobody holds to ``user``. Returns its
+    queue row, or ``None`` when every pending request is claimed.
+    """
+    now = timezone.now()
+    for row in queue(get_triage_setting('CANDIDATES', 50), shards, unclaimed_only=True, now=now):
+        # Another admin may have claimed it since the queue was read
+        expires = _take_lease(row['id'], user, claimable(now), now)
+        if expires is not None:
+            row.update(claimed_by=user.pk, claim_expires_at=expires)
+            return row
+    return None
+
+
+def claim(blood_request, user):
+    """
+    Lease ``blood_request`` to ``user``, or renew their lease on it.
+    """
+    now = timezone.now()
+    if blood_request.status != 'pending':
+        raise TriageError('Only pending requests can be claimed')
+    expires = _take_lease(blood_request.pk, user, claimable(now) | Q(claimed_by=user), now)
+    if expires is None:
+        raise TriageError('Claimed by another admin')
+    return expires
+
+
+def release(blood_request, user):
+    """
+    Give up ``user``'s lease on ``blood_request``.
+    """
+    with use_shard(shard_for_pk(blood_request.pk)):
+        released = BloodRequest.objects.filter(pk=blood_request.pk, claimed_by=user).update(
+            claimed_by=None, claim_expires_at=None,
+        )
+    if not released:
+        raise TriageError('You do not hold a claim on this request')
@@ -1,10 +1,13 @@
 from django.urls import path
 from .views import (
     BloodBankListCreateView, BloodBankDetailView,
-    BloodInventoryListView, BloodInventoryUpdateView,
+    BloodInventoryListView, BloodInventoryUpdateView, blood_inventory_matrix, blood_inventory_compatible,
     BloodRequestListCreateView, BloodRequestDetailView, approve_reject_blood_request,
+    bulk_approve_reject_blood_requests, blood_request_triage, claim_next_blood_request, claim_blood_request,
+    ReservationListCreateView, ReservationDetailView, fulfil_reservation, release_reservation,
     DonationListCreateView, DonationDetailView, approve_reject_donation,
-    search_donors, admin_dashboard, donor_dashboard,
+    bulk_approve_reject_donations,
+    search_donors, sync_changes, analytics_cube, admin_dashboard, donor_dashboard, admin_dashboard_async, donor_dashboard_async,
 )
 
 urlpatterns = [
@@ -14,23 +17,44 @@ urlpatterns = [
     
     # Blood Inventory
     path('blood-inventory/', BloodInventoryListView.as_view(), name='blood_inventory_list'),
+    path('blood-inventory/matrix/', blood_inventory_matrix, name='blood_inventory_matrix'),
+    path('blood-inventory/compatible/', blood_inventory_compatible, name='blood_inventory_compatible'),
     path('blood-inventory/<int:pk>/', BloodInventoryUpdateView.as_view(), name='blood_inventory_update'),
     
     # Blood Requests
     path('blood-requests/', BloodRequestListCreateView.as_view(), name='blood_request_list_create'),
+    path('blood-requests/bulk-approve-reject/', bulk_approve_reject_blood_requests, name='bulk_approve_reject_blood_requests'),
     path('blood-requests/<int:pk>/', BloodRequestDetailView.as_view(), name='blood_request_detail'),
     path('blood-requests/<int:pk>/approve-reject/', approve_reject_blood_request, name='approve_reject_blood_request'),
+    path('blood-requests/triage/', blood_request_triage, name='blood_request_triage'),
+    path('blood-requests/triage/claim/', claim_next_blood_request, name='claim_next_blood_request'),
+    path('blood-requests/<int:pk>/claim/', claim_blood_request, name='claim_blood_request'),
+    
+    # Reservations
+    path('reservations/', ReservationListCreateView.as_view(), name='reservation_list_create'),
+    path('reservations/<int:pk>/', ReservationDetailView.as_view(), name='reservation_detail'),
+    path('reservations/<int:pk>/fulfil/', fulfil_reservation, name='fulfil_reservation'),
+    path('reservations/<int:pk>/release/', release_reservation, name='release_reservation'),
     
     # Donations
     path('donations/', DonationListCreateView.as_view(), name='donation_list_create'),
+    path('donations/bulk-approve-reject/', bulk_approve_reject_donations, name='bulk_approve_reject_donations'),
     path('donations/<int:pk>/', DonationDetailView.as_view(), name='donation_detail'),
     path('donations/<int:pk>/approve-reject/', approve_reject_donation, name='approve_reject_donation'),
     
     # Search
     path('search-donors/', search_donors, name='search_donors'),
     
+    # Delta sync
+    path('sync/', sync_changes, name='sync_changes'),
+    
+    # Analytics
+    path('analytics/', analytics_cube, name='analytics_cube'),
+    
     # Dashboards
     path('dashboard/admin/', admin_dashboard, name='admin_dashboard'),
     path('dashboard/donor/', donor_dashboard, name='donor_dashboard'),
+    path('dashboard/admin/async/', admin_dashboard_async, name='admin_dashboard_async'),
+    path('dashboard/donor/async/', donor_dashboard_async, name='donor_dashboard_async'),
 ]
 
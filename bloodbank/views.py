@@ -1,15 +1,44 @@
 from rest_framework import generics, status, permissions
 from rest_framework.decorators import api_view, permission_classes
+from rest_framework.exceptions import ValidationError
 from rest_framework.response import Response
-from django.db.models import Q, Sum, Count
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.db.models.functions import Coalesce
 from django.utils import timezone
+from django.utils.dateparse import parse_date
 from datetime import timedelta
-from .models import BloodBank, BloodInventory, BloodRequest, Donation
+from .allocation import (
+    AllocationError, AllocationLine, StockChanged, apply_allocation, compatible_groups, compatible_stock,
+    plan_allocation,
+)
+from . import dashboards, reservations, triage
+from .analytics import AnalyticsError, evaluate, get_analytics_setting, parse_query
+from .bulk import BulkReviewError, normalize_items, review_blood_requests, review_by_shard, review_donations
+from .cache import get_inventory_version, inventory_cache_key
+from .idempotency import idempotent
+from .lots import LotError, build_lot, expired_units_by_bank, get_component, retire_expired
+from .models import (
+    ArchivedBloodRequest, ArchivedDonation, BloodBank, BloodInventory, BloodRequest, Donation, Reservation
+)
+from .sync import SyncError, SyncTokenExpired, changes, record_deletion
 from .serializers import (
     BloodBankSerializer, BloodInventorySerializer, 
-    BloodRequestSerializer, DonationSerializer, DashboardStatsSerializer
+    BloodRequestSerializer, DonationSerializer, ReservationSerializer
+)
+from .projections import (
+    BLOOD_BANK_PROJECTION, BLOOD_INVENTORY_PROJECTION,
+    BLOOD_REQUEST_PROJECTION, DONATION_PROJECTION, RESERVATION_PROJECTION
 )
 from accounts.models import DonorProfile
+from accounts.projections import DONOR_PROFILE_PROJECTION
+from blood_management.async_views import async_api_view
+from blood_management.fieldsets import get_fieldset, restrict_queryset
+from blood_management.sharding import (
+    ScatteredQuerySet, ShardedViewMixin, is_sharded, merge_rows, scatter, select_shard, shard_for_pk,
+    shard_for_request, shard_for_state, sharded,
+)
 
 
 class IsAdmin(permissions.BasePermission):
@@ -22,9 +51,78 @@ class IsDonor(permissions.BasePermission):
         return request.user and request.user.is_authenticated and request.user.role == 'donor'
 
 
+class ProjectedListMixin(ShardedViewMixin):
+    """
+    Serve ``list()`` from a ``values()`` projection instead of the serializer.
+
+    Writes still go through ``serializer_class``; the projection produces the
+    same JSON for reads without instantiating models. ``?fields=`` and
+    ``?expand=`` narrow or widen the projection, and with it the SQL.
+
+    Views with an ``archive_model`` also answer ``?include_archived=true`` by
+    unioning in archived rows; their ``get_queryset(model)`` must apply the
+    same filters to either model.
+
+    A list that resolves to no single shard reads every shard and merges the
+    pages in the queryset's ordering.
+    """
+    projection = None
+    archive_model = None
+
+    def get_projection(self):
+        return self.projection.restrict(*get_fieldset(self.request))
+
+    def include_archived(self):
+        value = self.request.query_params.get('include_archived', '')
+        return self.archive_model is not None and value.lower() in ('1', 'true', 'yes')
+
+    def list(self, request, *args, **kwargs):
+        projection = self.get_projection()
+        queryset = projection.values(self.filter_queryset(self.get_queryset()))
+        scattered = self.shard is None and is_sharded()
+        if scattered and not queryset.query.order_by:
+            queryset = queryset.order_by('id')
+        ordering = queryset.query.order_by
+        # Combined queries and merged shards can only order by selected columns
+        columns = [*projection.lookups()] + [
+            name.lstrip('-') for name in ordering
+            if name.lstrip('-') not in set(projection.lookups())
+        ]
+        if self.include_archived():
+            archived = self.filter_queryset(self.get_queryset(self.archive_model))
+            queryset = queryset.values(*columns).order_by().union(
+                archived.values(*columns).order_by(), all=True,
+            ).order_by(*ordering)
+        elif scattered:
+            queryset = queryset.values(*columns)
+        if scattered:
+            queryset = ScatteredQuerySet(queryset, ordering)
+
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(projection.to_dicts(page, request))
+
+        return Response(projection.to_dicts(queryset, request))
+
+
+class ProjectedDetailMixin(ShardedViewMixin):
+    """
+    Load only the columns and joins the requested fieldset needs on reads.
+    """
+    projection = None
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        if self.request.method in ('GET', 'HEAD'):
+            projection = self.projection.restrict(*get_fieldset(self.request))
+            queryset = restrict_queryset(queryset, projection)
+        return queryset
+
+
 # Blood Bank Views
-class BloodBankListCreateView(generics.ListCreateAPIView):
+class BloodBankListCreateView(ProjectedListMixin, generics.ListCreateAPIView):
     serializer_class = BloodBankSerializer
+    projection = BLOOD_BANK_PROJECTION
     permission_classes = [IsAdmin]
     
     def get_queryset(self):
@@ -39,15 +137,34 @@ class BloodBankListCreateView(generics.ListCreateAPIView):
         return queryset
 
 
-class BloodBankDetailView(generics.RetrieveUpdateDestroyAPIView):
+class BloodBankDetailView(ProjectedDetailMixin, generics.RetrieveUpdateDestroyAPIView):
     queryset = BloodBank.objects.all()
     serializer_class = BloodBankSerializer
+    projection = BLOOD_BANK_PROJECTION
     permission_classes = [IsAdmin]
 
+    def perform_update(self, serializer):
+        state = serializer.validated_data.get('state')
+        # Its stock, lots and requests would all have to move with it
+        if state is not None and shard_for_state(state) != self.shard:
+            raise ValidationError({'state': ['Moving a blood bank to another region is not supported']})
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic(using=instance._state.db):
+            record_deletion('blood_banks', [instance.pk])
+            record_deletion('blood_inventory', instance.inventory.values_list('pk', flat=True))
+            # SET_NULL doesn't touch updated_at, so the feed wouldn't resend them
+            now = timezone.now()
+            instance.requests.update(updated_at=now)
+            instance.donations.update(updated_at=now)
+            instance.delete()
+
 
 # Blood Inventory Views
-class BloodInventoryListView(generics.ListAPIView):
+class BloodInventoryListView(ProjectedListMixin, generics.ListAPIView):
     serializer_class = BloodInventorySerializer
+    projection = BLOOD_INVENTORY_PROJECTION
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
@@ -65,20 +182,126 @@ class BloodInventoryListView(generics.ListAPIView):
         return queryset
 
 
-class BloodInventoryUpdateView(generics.UpdateAPIView):
+INVENTORY_MATRIX_TIMEOUT = 300
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def blood_inventory_matrix(request):
+    """
+    Units per blood group for every active blood bank, in one pivot query.
+    """
+    state = request.query_params.get('state', '').strip()
+    city = request.query_params.get('city', '').strip()
+
+    # Lots expire at midnight without a version bump, so the date is part of the key
+    cache_key = inventory_cache_key('inventory-matrix', state, city, timezone.localdate())
+    data = cache.get(cache_key)
+    if data is None:
+        data = build_inventory_matrix(state, city)
+        cache.set(cache_key, data, INVENTORY_MATRIX_TIMEOUT)
+    return Response(data)
+
+
+def inventory_matrix_rows(aliases, state='', city=''):
+    queryset = BloodBank.objects.filter(is_active=True)
+    if state:
+        queryset = queryset.filter(state__iexact=state)
+    if city:
+        queryset = queryset.filter(city__iexact=city)
+
+    rows = list(queryset.annotate(**{
+        alias: Coalesce(Sum('inventory__units_available', filter=Q(inventory__blood_group=group)), 0)
+        for alias, group in aliases.items()
+    }).values('id', 'name', 'city', 'state', *aliases).order_by('name', 'id'))
+
+    # Expired lots the sweeper hasn't retired yet can't be issued, as on the dashboard
+    expired = expired_units_by_bank([row['id'] for row in rows])
+    if expired:
+        for row in rows:
+            for alias, group in aliases.items():
+                row[alias] = max(row[alias] - expired.get((row['id'], group), 0), 0)
+    return rows
+
+
+def build_inventory_matrix(state='', city=''):
+    blood_groups = [group for group, _ in BloodInventory.BLOOD_GROUP_CHOICES]
+    # Annotation names must be identifiers, so map 'AB+' -> 'units_0' etc.
+    aliases = {f'units_{index}': group for index, group in enumerate(blood_groups)}
+
+    # Only the region holding the state when one is given, else every region
+    shards = scatter(
+        lambda: inventory_matrix_rows(aliases, state, city),
+        aliases=[shard_for_state(state)] if state else None,
+    )
+    rows = merge_rows(shards.values(), ['name', 'id'])
+
+    totals = dict.fromkeys(blood_groups, 0)
+    banks = []
+    for row in rows:
+        units = {group: row[alias] for alias, group in aliases.items()}
+        for group, count in units.items():
+            totals[group] += count
+        banks.append({
+            'id': row['id'],
+            'name': row['name'],
+            'city': row['city'],
+            'state': row['state'],
+            'units': units,
+            'total': sum(units.values()),
+        })
+
+    return {
+        'blood_groups': blood_groups,
+        'banks': banks,
+        'totals': totals,
+        'inventory_version': get_inventory_version(),
+    }
+
+
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def blood_inventory_compatible(request):
+    """
+    Banks in every region holding stock a patient of ``blood_group`` can
+    receive, best matches first.
+    """
+    blood_group = request.query_params.get('blood_group', '')
+    if blood_group not in dict(BloodInventory.BLOOD_GROUP_CHOICES):
+        return Response({'error': 'Invalid blood_group'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        units = int(request.query_params.get('units', 1))
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+    except ValueError:
+        return Response({'error': 'units and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+    city = request.query_params.get('city', '').strip()
+    substitutes = request.query_params.get('substitutes')
+    allow_substitutes = None if substitutes is None else substitutes.lower() in ('1', 'true', 'yes')
+
+    cache_key = inventory_cache_key('compatible-stock', blood_group, units, city, allow_substitutes, limit)
+    data = cache.get(cache_key)
+    if data is None:
+        data = compatible_stock(blood_group, units, city=city, allow_substitutes=allow_substitutes, limit=limit)
+        cache.set(cache_key, data, INVENTORY_MATRIX_TIMEOUT)
+    return Response(data)
+
+
+class BloodInventoryUpdateView(ShardedViewMixin, generics.UpdateAPIView):
     queryset = BloodInventory.objects.all()
     serializer_class = BloodInventorySerializer
     permission_classes = [IsAdmin]
 
 
 # Blood Request Views
-class BloodRequestListCreateView(generics.ListCreateAPIView):
+class BloodRequestListCreateView(ProjectedListMixin, generics.ListCreateAPIView):
     serializer_class = BloodRequestSerializer
+    projection = BLOOD_REQUEST_PROJECTION
+    archive_model = ArchivedBloodRequest
     permission_classes = [permissions.IsAuthenticated]
     
-    def get_queryset(self):
+    def get_queryset(self, model=BloodRequest):
         user = self.request.user
-        queryset = BloodRequest.objects.all()
+        queryset = model.objects.all()
         
         # Donors can only see their own requests
         if user.role == 'donor':
@@ -96,12 +319,17 @@ class BloodRequestListCreateView(generics.ListCreateAPIView):
         
         return queryset.order_by('-created_at')
     
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
+    
     def perform_create(self, serializer):
         serializer.save(requester=self.request.user)
 
 
-class BloodRequestDetailView(generics.RetrieveUpdateDestroyAPIView):
+class BloodRequestDetailView(ProjectedDetailMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = BloodRequestSerializer
+    projection = BLOOD_REQUEST_PROJECTION
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
@@ -110,30 +338,64 @@ class BloodRequestDetailView(generics.RetrieveUpdateDestroyAPIView):
             return BloodRequest.objects.all()
         return BloodRequest.objects.filter(requester=user)
 
+    def perform_destroy(self, instance):
+        with transaction.atomic(using=instance._state.db):
+            record_deletion('blood_requests', [instance.pk], owner_id=instance.requester_id)
+            instance.delete()
+
 
 @api_view(['PATCH'])
 @permission_classes([IsAdmin])
+@idempotent
+@sharded
 def approve_reject_blood_request(request, pk):
     try:
         blood_request = BloodRequest.objects.get(pk=pk)
         action = request.data.get('action')  # 'approve' or 'reject'
         admin_notes = request.data.get('admin_notes', '')
         blood_bank_id = request.data.get('blood_bank_id', None)
+        # Without a bank, 'allocate' splits the request across the network
+        allocate = str(request.data.get('allocate', '')).lower() in ('1', 'true', 'yes')
+        allocation_policy = request.data.get('allocation_policy', None)
+        # Fulfils a hold taken earlier instead of debiting stock again
+        reservation_id = request.data.get('reservation_id', None)
+        reservation = None
+        lines = []
+
+        if blood_request.status != 'pending':
+            return Response({'error': f'Blood request is already {blood_request.status}'},
+                            status=status.HTTP_409_CONFLICT)
         
         if action == 'approve':
+            if blood_request.units_required < 1:
+                return Response({'error': 'A blood request must be for at least one unit'},
+                                status=status.HTTP_400_BAD_REQUEST)
             blood_request.status = 'approved'
-            if blood_bank_id:
+            if reservation_id:
+                try:
+                    reservation = Reservation.objects.select_related('blood_bank').get(pk=reservation_id)
+                except (Reservation.DoesNotExist, ValueError):
+                    return Response({'error': 'Reservation not found'}, status=status.HTTP_400_BAD_REQUEST)
+                blood_request.blood_bank_id = reservation.blood_bank_id
+            elif blood_bank_id:
                 blood_request.blood_bank_id = blood_bank_id
+                # Expired lots must not count towards what the bank can issue
+                retire_expired(blood_bank_ids=[blood_bank_id], blood_groups=[blood_request.blood_group])
                 
                 # Reduce blood inventory when request is approved
                 try:
-                    inventory = BloodInventory.objects.get(
+                    inventory = BloodInventory.objects.select_related('blood_bank').get(
                         blood_bank_id=blood_bank_id,
                         blood_group=blood_request.blood_group
                     )
                     if inventory.units_available >= blood_request.units_required:
-                        inventory.units_available -= blood_request.units_required
-                        inventory.save()
+                        lines = [AllocationLine(
+                            inventory_id=inventory.pk,
+                            blood_bank_id=inventory.blood_bank_id,
+                            blood_bank_name=inventory.blood_bank.name,
+                            blood_group=inventory.blood_group,
+                            units=blood_request.units_required,
+                        )]
                     else:
                         return Response({
                             'error': f'Insufficient blood units. Available: {inventory.units_available}, Required: {blood_request.units_required}'
@@ -142,6 +404,22 @@ def approve_reject_blood_request(request, pk):
                     return Response({
                         'error': f'No inventory found for {blood_request.blood_group} in selected blood bank'
                     }, status=status.HTTP_400_BAD_REQUEST)
+            elif allocate or allocation_policy:
+                city = request.data.get('city', None)
+                if city is None and hasattr(blood_request.requester, 'donor_profile'):
+                    city = blood_request.requester.donor_profile.city
+                retire_expired(blood_groups=compatible_groups(blood_request.blood_group))
+                try:
+                    lines = plan_allocation(
+                        blood_request.blood_group,
+                        blood_request.units_required,
+                        policy=allocation_policy,
+                        city=city,
+                    )
+                except AllocationError as e:
+                    return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+                if lines:
+                    blood_request.blood_bank_id = max(lines, key=lambda line: line.units).blood_bank_id
         elif action == 'reject':
             blood_request.status = 'rejected'
         else:
@@ -151,22 +429,216 @@ def approve_reject_blood_request(request, pk):
         if admin_notes:
             blood_request.admin_notes = admin_notes
         
-        blood_request.save()
-        serializer = BloodRequestSerializer(blood_request)
-        return Response(serializer.data)
+        try:
+            with transaction.atomic(using=blood_request._state.db):
+                # Only one review can win; a repeated approval would debit stock again
+                reviewed = BloodRequest.objects.filter(pk=blood_request.pk, status='pending').update(
+                    status=blood_request.status,
+                )
+                if not reviewed:
+                    current = BloodRequest.objects.filter(pk=blood_request.pk).values_list('status', flat=True).first()
+                    return Response({'error': f'Blood request is already {current}'},
+                                    status=status.HTTP_409_CONFLICT)
+                if reservation is not None:
+                    lines = [reservations.fulfil(reservation, blood_request, units=blood_request.units_required)]
+                elif lines:
+                    apply_allocation(blood_request, lines)
+                blood_request.save()
+        except (StockChanged, reservations.ReservationError) as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+
+        data = BloodRequestSerializer(blood_request).data
+        if lines:
+            data['allocations'] = [line.as_dict() for line in lines]
+        return Response(data)
     
     except BloodRequest.DoesNotExist:
         return Response({'error': 'Blood request not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+def bulk_review_response(request, review):
+    try:
+        items = normalize_items(request.data)
+    except BulkReviewError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+    results, inventory_changes = review_by_shard(review, items)
+    return Response({
+        'approved': sum(1 for result in results if result['ok'] and result['action'] == 'approve'),
+        'rejected': sum(1 for result in results if result['ok'] and result['action'] == 'reject'),
+        'failed': sum(1 for result in results if not result['ok']),
+        'results': results,
+        'inventory_changes': inventory_changes,
+    })
+
+
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def blood_request_triage(request):
+    """
+    Pending requests, highest priority first. ``?unclaimed=true`` hides those
+    another admin is working on.
+    """
+    try:
+        limit = min(max(int(request.query_params.get('limit', 20)), 1), 100)
+    except ValueError:
+        return Response({'error': 'limit must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    unclaimed = request.query_params.get('unclaimed', '').lower() in ('1', 'true', 'yes')
+    shard = shard_for_request(request)
+    rows = triage.queue(limit, shards=None if shard is None else [shard], unclaimed_only=unclaimed)
+    return Response(triage.serialize(rows, request))
+
+
+@api_view(['POST'])
+@permission_classes([IsAdmin])
+def claim_next_blood_request(request):
+    """
+    Lease the highest priority unclaimed request to the caller.
+    """
+    shard = shard_for_request(request)
+    row = triage.claim_next(request.user, shards=None if shard is None else [shard])
+    if row is None:
+        return Response(status=status.HTTP_204_NO_CONTENT)
+    return Response(triage.serialize([row], request)[0])
+
+
+@api_view(['POST', 'DELETE'])
+@permission_classes([IsAdmin])
+@sharded
+def claim_blood_request(request, pk):
+    """
+    POST claims a request or renews the caller's lease; DELETE releases it.
+    """
+    try:
+        blood_request = BloodRequest.objects.get(pk=pk)
+    except BloodRequest.DoesNotExist:
+        return Response({'error': 'Blood request not found'}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        if request.method == 'DELETE':
+            triage.release(blood_request, request.user)
+            return Response(status=status.HTTP_204_NO_CONTENT)
+        expires = triage.claim(blood_request, request.user)
+    except triage.TriageError as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+    return Response({'id': blood_request.pk, 'claimed_by': request.user.pk, 'claim_expires_at': expires})
+
+
+@api_view(['POST'])
+@permission_classes([IsAdmin])
+@idempotent
+def bulk_approve_reject_blood_requests(request):
+    return bulk_review_response(request, review_blood_requests)
+
+
+# Reservation Views
+class ReservationListCreateView(ProjectedListMixin, generics.ListCreateAPIView):
+    serializer_class = ReservationSerializer
+    projection = RESERVATION_PROJECTION
+    permission_classes = [IsAdmin]
+
+    def get_queryset(self):
+        queryset = Reservation.objects.all()
+
+        for name in ('status', 'blood_bank', 'blood_group', 'blood_request'):
+            value = self.request.query_params.get(name, None)
+            if value:
+                queryset = queryset.filter(**{name: value})
+
+        return queryset.order_by('-created_at')
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        # A hold lives in the shard of the bank it draws on
+        blood_bank_id = str(request.data.get('blood_bank', ''))
+        if blood_bank_id.isdigit():
+            select_shard(shard_for_pk(blood_bank_id))
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            reservation = reservations.hold(
+                data['blood_bank'].pk,
+                data['blood_group'],
+                data['units'],
+                user=request.user,
+                blood_request=data.get('blood_request'),
+                ttl=timedelta(minutes=data['ttl_minutes']) if 'ttl_minutes' in data else None,
+                notes=data.get('notes', ''),
+            )
+        except AllocationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+        except reservations.ReservationError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(reservation).data, status=status.HTTP_201_CREATED)
+
+
+class ReservationDetailView(ProjectedDetailMixin, generics.RetrieveAPIView):
+    queryset = Reservation.objects.all()
+    serializer_class = ReservationSerializer
+    projection = RESERVATION_PROJECTION
+    permission_classes = [IsAdmin]
+
+
+@api_view(['POST'])
+@permission_classes([IsAdmin])
+@idempotent
+@sharded
+def fulfil_reservation(request, pk):
+    """
+    Issue a hold's units, or ``units`` of them and return the rest. Holds
+    for a blood request are fulfilled by approving it with their
+    ``reservation_id``.
+    """
+    try:
+        reservation = Reservation.objects.select_related('blood_bank').get(pk=pk)
+    except Reservation.DoesNotExist:
+        return Response({'error': 'Reservation not found'}, status=status.HTTP_404_NOT_FOUND)
+    if reservation.blood_request_id:
+        return Response({
+            'error': f'Approve blood request #{reservation.blood_request_id} with this reservation_id instead'
+        }, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        # Omitted means the whole hold, as it stands once expired lots are taken off
+        units = request.data.get('units')
+        units = None if units is None else int(units)
+    except (TypeError, ValueError):
+        return Response({'error': 'units must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+    try:
+        reservations.fulfil(reservation, units=units)
+    except reservations.ReservationError as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+    return Response(ReservationSerializer(reservation).data)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdmin])
+@idempotent
+@sharded
+def release_reservation(request, pk):
+    """
+    Return a hold's units to available stock.
+    """
+    try:
+        reservation = Reservation.objects.select_related('blood_bank').get(pk=pk)
+    except Reservation.DoesNotExist:
+        return Response({'error': 'Reservation not found'}, status=status.HTTP_404_NOT_FOUND)
+    try:
+        reservations.release(reservation)
+    except reservations.ReservationError as e:
+        return Response({'error': str(e)}, status=status.HTTP_409_CONFLICT)
+    return Response(ReservationSerializer(reservation).data)
+
+
 # Donation Views
-class DonationListCreateView(generics.ListCreateAPIView):
+class DonationListCreateView(ProjectedListMixin, generics.ListCreateAPIView):
     serializer_class = DonationSerializer
+    projection = DONATION_PROJECTION
+    archive_model = ArchivedDonation
     permission_classes = [permissions.IsAuthenticated]
     
-    def get_queryset(self):
+    def get_queryset(self, model=Donation):
         user = self.request.user
-        queryset = Donation.objects.all()
+        queryset = model.objects.all()
         
         # Donors can only see their own donations
         if user.role == 'donor':
@@ -184,6 +656,7 @@ class DonationListCreateView(generics.ListCreateAPIView):
         
         return queryset.order_by('-created_at')
     
+    @idempotent
     def create(self, request, *args, **kwargs):
         user = request.user
         # Get blood group from donor profile
@@ -208,8 +681,9 @@ class DonationListCreateView(generics.ListCreateAPIView):
         return Response(serializer.data, status=status.HTTP_201_CREATED, headers=headers)
 
 
-class DonationDetailView(generics.RetrieveUpdateDestroyAPIView):
+class DonationDetailView(ProjectedDetailMixin, generics.RetrieveUpdateDestroyAPIView):
     serializer_class = DonationSerializer
+    projection = DONATION_PROJECTION
     permission_classes = [permissions.IsAuthenticated]
     
     def get_queryset(self):
@@ -218,9 +692,16 @@ class DonationDetailView(generics.RetrieveUpdateDestroyAPIView):
             return Donation.objects.all()
         return Donation.objects.filter(donor=user)
 
+    def perform_destroy(self, instance):
+        with transaction.atomic(using=instance._state.db):
+            record_deletion('donations', [instance.pk], owner_id=instance.donor_id)
+            instance.delete()
+
 
 @api_view(['PATCH'])
 @permission_classes([IsAdmin])
+@idempotent
+@sharded
 def approve_reject_donation(request, pk):
     try:
         donation = Donation.objects.get(pk=pk)
@@ -228,12 +709,25 @@ def approve_reject_donation(request, pk):
         admin_notes = request.data.get('admin_notes', '')
         blood_bank_id = request.data.get('blood_bank_id', None)
         donation_date = request.data.get('donation_date', None)
+        try:
+            component = get_component(request.data.get('component'))
+        except LotError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        
+        # Completed donations are already in stock; approving again would count them twice
+        if donation.status == 'completed':
+            return Response({'error': 'Donation is already completed'},
+                          status=status.HTTP_409_CONFLICT)
         
         if action == 'approve':
             donation.status = 'approved'
             if blood_bank_id:
                 donation.blood_bank_id = blood_bank_id
             if donation_date:
+                donation_date = parse_date(str(donation_date))
+                if donation_date is None:
+                    return Response({'error': 'Invalid donation_date. Use YYYY-MM-DD'},
+                                  status=status.HTTP_400_BAD_REQUEST)
                 donation.donation_date = donation_date
         elif action == 'reject':
             donation.status = 'rejected'
@@ -244,27 +738,41 @@ def approve_reject_donation(request, pk):
         if admin_notes:
             donation.admin_notes = admin_notes
         
-        donation.save()
-        
-        # If approved and completed, update inventory and donor profile
         if action == 'approve' and donation_date:
             donation.status = 'completed'
+        
+        # A completed donation must never be left without its units in stock
+        with transaction.atomic(using=donation._state.db):
+            # Only one review can complete it; a concurrent approval would credit stock again
+            reviewed = Donation.objects.filter(pk=donation.pk).exclude(status='completed').update(
+                status=donation.status,
+            )
+            if not reviewed:
+                return Response({'error': 'Donation is already completed'},
+                              status=status.HTTP_409_CONFLICT)
             donation.save()
             
-            # Update blood inventory
-            if blood_bank_id:
-                inventory, created = BloodInventory.objects.get_or_create(
-                    blood_bank_id=blood_bank_id,
-                    blood_group=donation.blood_group,
-                    defaults={'units_available': 0}
-                )
-                inventory.units_available += donation.units_donated
-                inventory.save()
-            
-            # Update donor's last donation date
-            if hasattr(donation.donor, 'donor_profile'):
-                donation.donor.donor_profile.last_donation_date = donation_date
-                donation.donor.donor_profile.save()
+            # If approved and completed, update inventory and donor profile
+            if donation.status == 'completed':
+                # Update blood inventory and record the units as a lot
+                if blood_bank_id:
+                    inventory, created = BloodInventory.objects.get_or_create(
+                        blood_bank_id=blood_bank_id,
+                        blood_group=donation.blood_group,
+                        defaults={'units_available': 0}
+                    )
+                    inventory.units_available = F('units_available') + donation.units_donated
+                    # Only the credited columns, so concurrent holds on units_reserved survive
+                    inventory.save(update_fields=['units_available', 'last_updated'])
+                    build_lot(
+                        blood_bank_id, donation.blood_group, donation.units_donated,
+                        donation_date, component=component, donation=donation,
+                    ).save()
+                
+                # Update donor's last donation date
+                if hasattr(donation.donor, 'donor_profile'):
+                    donation.donor.donor_profile.last_donation_date = donation_date
+                    donation.donor.donor_profile.save()
         
         serializer = DonationSerializer(donation)
         return Response(serializer.data)
@@ -273,6 +781,13 @@ def approve_reject_donation(request, pk):
         return Response({'error': 'Donation not found'}, status=status.HTTP_404_NOT_FOUND)
 
 
+@api_view(['POST'])
+@permission_classes([IsAdmin])
+@idempotent
+def bulk_approve_reject_donations(request):
+    return bulk_review_response(request, review_donations)
+
+
 # Search Donors
 @api_view(['GET'])
 @permission_classes([permissions.IsAuthenticated])
@@ -293,83 +808,71 @@ def search_donors(request):
         is_available_bool = is_available.lower() == 'true'
         queryset = queryset.filter(is_available=is_available_bool)
     
-    from accounts.serializers import DonorProfileSerializer
-    serializer = DonorProfileSerializer(queryset, many=True)
-    return Response(serializer.data)
+    projection = DONOR_PROFILE_PROJECTION.restrict(*get_fieldset(request))
+    return Response(projection.serialize(queryset))
+
+
+# Delta sync
+@api_view(['GET'])
+@permission_classes([permissions.IsAuthenticated])
+def sync_changes(request):
+    """
+    Rows changed and ids deleted since ``?since=<token>``, with the token
+    for next time in ``next``. Without ``since`` everything is sent.
+    """
+    shard = shard_for_request(request)
+    try:
+        data = changes(
+            request.user, since=request.query_params.get('since'),
+            shards=None if shard is None else [shard], request=request,
+        )
+    except SyncTokenExpired as e:
+        return Response({'error': str(e)}, status=status.HTTP_410_GONE)
+    except SyncError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(data)
+
+
+# Analytics
+@api_view(['GET'])
+@permission_classes([IsAdmin])
+def analytics_cube(request):
+    """
+    Measures of requests or donations grouped by the chosen dimensions, e.g.
+    ``?fact=requests&dimensions=urgency,blood_group,month&measures=count,units``.
+    """
+    shard = shard_for_request(request)
+    try:
+        query = parse_query(request.query_params)
+        cache_key = f'{query.cache_key()}:{shard}'
+        data = cache.get(cache_key)
+        if data is None:
+            data = evaluate(query, shards=None if shard is None else [shard])
+            cache.set(cache_key, data, get_analytics_setting('CACHE_TIMEOUT', 300))
+    except AnalyticsError as e:
+        return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+    return Response(data)
 
 
 # Dashboard Views
 @api_view(['GET'])
 @permission_classes([IsAdmin])
 def admin_dashboard(request):
-    # Total donors
-    total_donors = DonorProfile.objects.count()
-    
-    # Total blood requests
-    total_blood_requests = BloodRequest.objects.count()
-    pending_requests = BloodRequest.objects.filter(status='pending').count()
-    
-    # Total donations
-    total_donations = Donation.objects.count()
-    
-    # Blood availability by group
-    blood_availability = {}
-    for blood_group in ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']:
-        total_units = BloodInventory.objects.filter(blood_group=blood_group).aggregate(
-            total=Sum('units_available')
-        )['total'] or 0
-        blood_availability[blood_group] = total_units
-    
-    # Recent requests
-    recent_requests = BloodRequest.objects.all().order_by('-created_at')[:5]
-    
-    # Recent donations
-    recent_donations = Donation.objects.all().order_by('-created_at')[:5]
-    
-    data = {
-        'total_donors': total_donors,
-        'total_blood_requests': total_blood_requests,
-        'pending_requests': pending_requests,
-        'total_donations': total_donations,
-        'blood_availability': blood_availability,
-        'recent_requests': BloodRequestSerializer(recent_requests, many=True).data,
-        'recent_donations': DonationSerializer(recent_donations, many=True).data,
-    }
-    
-    return Response(data)
+    return Response(dashboards.build(dashboards.admin_sections()))
 
 
 @api_view(['GET'])
 @permission_classes([IsDonor])
 def donor_dashboard(request):
-    user = request.user
-    
-    # Get donor profile
-    donor_profile = None
-    if hasattr(user, 'donor_profile'):
-        from accounts.serializers import DonorProfileSerializer
-        donor_profile = DonorProfileSerializer(user.donor_profile).data
-    
-    # Blood availability by group
-    blood_availability = {}
-    for blood_group in ['A+', 'A-', 'B+', 'B-', 'AB+', 'AB-', 'O+', 'O-']:
-        total_units = BloodInventory.objects.filter(blood_group=blood_group).aggregate(
-            total=Sum('units_available')
-        )['total'] or 0
-        blood_availability[blood_group] = total_units
-    
-    # Donor's requests
-    my_requests = BloodRequest.objects.filter(requester=user).order_by('-created_at')
-    
-    # Donor's donations
-    my_donations = Donation.objects.filter(donor=user).order_by('-created_at')
-    
-    data = {
-        'donor_profile': donor_profile,
-        'blood_availability': blood_availability,
-        'my_requests': BloodRequestSerializer(my_requests, many=True).data,
-        'my_donations': DonationSerializer(my_donations, many=True).data,
-    }
-    
-    return Response(data)
+    return Response(dashboards.build(dashboards.donor_sections(request.user)))
+
+
+# Same payloads with the sections queried concurrently; best served over ASGI
+@async_api_view(permission_classes=[IsAdmin])
+async def admin_dashboard_async(request):
+    return await dashboards.abuild(dashboards.admin_sections())
+
 
+@async_api_view(permission_classes=[IsDonor])
+async def donor_dashboard_async(request):
+    return await dashboards.abuild(dashboards.donor_sections(request.user))
@@ -0,0 +1,59 @@
+"""
+Production launcher config: ``gunicorn -c gunicorn.conf.py``.
+
+The Django application is imported and warmed up once in the master
+(``preload_app``), then workers are forked from it. Every setting can be
+overridden from the environment.
+"""
+import itertools
+import multiprocessing
+import os
+
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'blood_management.settings_production')
+
+# For ASGI: GUNICORN_APP=blood_management.asgi:application and
+# GUNICORN_WORKER_CLASS=uvicorn.workers.UvicornWorker
+wsgi_app = os.environ.get('GUNICORN_APP', 'blood_management.wsgi:application')
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+
+preload_app = True
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+threads = int(os.environ.get('GUNICORN_THREADS', '4'))
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', '30'))
+graceful_timeout = 30
+keepalive = 5
+
+# Recycle workers now and then so slow leaks can't accumulate; the jitter
+# keeps them from all restarting at once
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', '2000'))
+max_requests_jitter = 200
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    from blood_management.startup import warm_up
+
+    server.log.info('Application warmed up in %.1f ms', warm_up() * 1000)
+
+
+def pre_fork(server, worker):
+    # The lowest slot no live worker holds, so a recycled worker's replacement
+    # reuses its access log file instead of starting one per PID
+    taken = {getattr(other, 'slot', None) for other in server.WORKERS.values()}
+    worker.slot = next(slot for slot in itertools.count() if slot not in taken)
+
+
+def post_fork(server, worker):
+    # Never share a database socket inherited from the master
+    from django.db import connections
+
+    from blood_management import access_log
+
+    connections.close_all()
+    access_log.writer().worker = worker.slot
@@ -0,0 +1,8 @@
+#!/bin/bash
+# Production server: gunicorn with the app preloaded (see gunicorn.conf.py).
+# Requires DJANGO_SECRET_KEY, DJANGO_ALLOWED_HOSTS and DJANGO_CACHE_URL in the environment.
+export DJANGO_SETTINGS_MODULE=${DJANGO_SETTINGS_MODULE:-blood_management.settings_production}
+echo "Starting production server..."
+python manage.py migrate --noinput && \
+python manage.py collectstatic --noinput && \
+exec gunicorn -c gunicorn.conf.py